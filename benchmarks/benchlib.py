@@ -0,0 +1,118 @@
+import json
+import math
+import platform
+import subprocess
+import time
+
+
+# ---------------------------------------------------
+# RESUMEN DE LATENCIAS
+# ---------------------------------------------------
+def percentile(samples, p):
+    """
+    Percentil por rango más cercano de una lista ya ordenada.
+    """
+    if not samples:
+        return None
+    rank = max(1, math.ceil(p / 100 * len(samples)))
+    return samples[rank - 1]
+
+
+def summarize(latencies, elapsed):
+    """
+    Latencias en segundos -> resultado en milisegundos con p50/p95/p99 y throughput (ops/s).
+    """
+    samples = sorted(latencies)
+    return {
+        "count": len(samples),
+        "p50": percentile(samples, 50) * 1000,
+        "p95": percentile(samples, 95) * 1000,
+        "p99": percentile(samples, 99) * 1000,
+        "mean": sum(samples) / len(samples) * 1000,
+        "throughput": len(samples) / elapsed if elapsed else None
+    }
+
+
+def measure(function, iterations=1000, warmup=50):
+    for _ in range(warmup):
+        function()
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(iterations):
+        begin = time.perf_counter()
+        function()
+        latencies.append(time.perf_counter() - begin)
+    return summarize(latencies, time.perf_counter() - start)
+
+
+async def ameasure(function, iterations=1000, warmup=50):
+    for _ in range(warmup):
+        await function()
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(iterations):
+        begin = time.perf_counter()
+        await function()
+        latencies.append(time.perf_counter() - begin)
+    return summarize(latencies, time.perf_counter() - start)
+
+
+# ---------------------------------------------------
+# RESULTADOS Y COMPARACIÓN CONTRA BASELINE
+# ---------------------------------------------------
+def metadata():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": int(time.time())
+    }
+
+
+def load_results(path):
+    with open(path) as file:
+        return json.load(file)
+
+
+def save_results(path, results):
+    with open(path, "w") as file:
+        json.dump(results, file, indent=2, sort_keys=True)
+        file.write("\n")
+
+
+def compare(results, baseline, tolerance):
+    """
+    Compara cada benchmark presente en ambos resultados.
+    Es regresión si el p95 crece o el throughput cae más que `tolerance` (fracción) respecto del baseline.
+    Devuelve las filas de la comparación y la lista de regresiones.
+    """
+    rows, regressions = [], []
+    for name, current in sorted(results.items()):
+        base = baseline.get(name)
+        if base is None:
+            rows.append((name, None, current["p95"], None, current.get("throughput"), "nuevo"))
+            continue
+        problems = []
+        if base.get("p95") and current["p95"] > base["p95"] * (1 + tolerance):
+            problems.append("p95")
+        if base.get("throughput") and current.get("throughput") is not None \
+                and current["throughput"] < base["throughput"] * (1 - tolerance):
+            problems.append("throughput")
+        status = "REGRESIÓN " + "+".join(problems) if problems else "ok"
+        rows.append((name, base["p95"], current["p95"], base.get("throughput"), current.get("throughput"), status))
+        if problems:
+            regressions.append(name)
+    return rows, regressions
+
+
+def format_table(rows):
+    def number(value):
+        return "-" if value is None else f"{value:.2f}"
+    lines = [f"{'benchmark':<48} {'p95 base':>10} {'p95':>10} {'ops/s base':>12} {'ops/s':>12}  estado"]
+    for name, base_p95, p95, base_throughput, throughput, status in rows:
+        lines.append(f"{name:<48} {number(base_p95):>10} {number(p95):>10} {number(base_throughput):>12} {number(throughput):>12}  {status}")
+    return "\n".join(lines)
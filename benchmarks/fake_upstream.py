@@ -0,0 +1,207 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+import zlib
+from collections import Counter
+from fastapi import Body, FastAPI, HTTPException
+from fastapi.responses import JSONResponse
+import uvicorn
+
+
+# ---------------------------------------------------
+# SIMULADOR DE UPSTREAM (OpenWeather / weatherstack)
+# ---------------------------------------------------
+# Perfil de fallas: latencia, errores, requests colgados y ventanas de caída.
+#   latency:  {"distribution": "fixed", "value": s} | {"distribution": "uniform", "min": s, "max": s}
+#             | {"distribution": "lognormal", "median": s, "sigma": x} | {"distribution": "exponential", "mean": s}
+#   error_rate / error_status: fracción de requests que responden con ese código
+#   timeout_rate / timeout_seconds: fracción de requests que quedan colgados (el cliente corta por timeout)
+#   outages: [{"start": s, "end": s, "status": 503}] en segundos desde que se aplicó el perfil
+PROFILES = {
+    "healthy": {"latency": {"distribution": "lognormal", "median": 0.08, "sigma": 0.4}},
+    "flaky": {"latency": {"distribution": "lognormal", "median": 0.08, "sigma": 0.4}, "error_rate": 0.2, "error_status": 500},
+    "slow-tail": {"latency": {"distribution": "lognormal", "median": 0.08, "sigma": 1.2}},
+    "timeouts": {"latency": {"distribution": "lognormal", "median": 0.08, "sigma": 0.4}, "timeout_rate": 0.1, "timeout_seconds": 30},
+    "outage": {"latency": {"distribution": "lognormal", "median": 0.08, "sigma": 0.4}, "outages": [{"start": 5, "end": 20, "status": 503}]},
+    "rate-limited": {"latency": {"distribution": "fixed", "value": 0.05}, "error_rate": 0.3, "error_status": 429}
+}
+
+
+class FaultProfile:
+    def __init__(self, latency=None, error_rate=0.0, error_status=500, timeout_rate=0.0, timeout_seconds=30, outages=None):
+        self.latency = latency or {"distribution": "fixed", "value": 0}
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.timeout_rate = timeout_rate
+        self.timeout_seconds = timeout_seconds
+        self.outages = outages or []
+        self.applied_at = time.monotonic()
+
+    def delay(self):
+        latency = self.latency
+        distribution = latency.get("distribution", "fixed")
+        if distribution == "uniform":
+            return random.uniform(latency["min"], latency["max"])
+        if distribution == "lognormal":
+            return random.lognormvariate(0, latency.get("sigma", 0.5)) * latency["median"]
+        if distribution == "exponential":
+            return random.expovariate(1 / latency["mean"])
+        return latency.get("value", 0)
+
+    def outage_status(self):
+        elapsed = time.monotonic() - self.applied_at
+        for outage in self.outages:
+            if outage["start"] <= elapsed < outage["end"]:
+                return outage.get("status", 503)
+        return None
+
+    def to_dict(self):
+        return {
+            "latency": self.latency,
+            "error_rate": self.error_rate,
+            "error_status": self.error_status,
+            "timeout_rate": self.timeout_rate,
+            "timeout_seconds": self.timeout_seconds,
+            "outages": self.outages
+        }
+
+
+class Simulator:
+    def __init__(self, profile=None):
+        self.profile = profile or FaultProfile()
+        self.calls = Counter()
+
+    def apply(self, profile):
+        self.profile = profile
+        self.calls.clear()
+
+    async def respond(self, endpoint, payload):
+        """
+        Aplica el perfil al request y devuelve el cuerpo, o un error HTTP.
+        Cada request queda contado por endpoint y resultado.
+        """
+        profile = self.profile
+        status = profile.outage_status()
+        if status is not None:
+            self.calls[(endpoint, "outage")] += 1
+            return JSONResponse({"message": "simulated outage"}, status_code=status)
+        if random.random() < profile.timeout_rate:
+            self.calls[(endpoint, "timeout")] += 1
+            await asyncio.sleep(profile.timeout_seconds)
+            return JSONResponse({"message": "simulated timeout"}, status_code=504)
+        await asyncio.sleep(profile.delay())
+        if random.random() < profile.error_rate:
+            self.calls[(endpoint, "error")] += 1
+            return JSONResponse({"message": "simulated error"}, status_code=profile.error_status)
+        self.calls[(endpoint, "ok")] += 1
+        return payload
+
+    def stats(self):
+        result = {}
+        for (endpoint, outcome), count in self.calls.items():
+            result.setdefault(endpoint, {"total": 0})
+            result[endpoint][outcome] = count
+            result[endpoint]["total"] += count
+        return result
+
+
+def build_profile(spec):
+    """
+    `spec` es el nombre de un perfil predefinido o un dict con los campos de FaultProfile.
+    """
+    if isinstance(spec, str):
+        if spec not in PROFILES:
+            raise ValueError(f"Perfil desconocido: {spec} (disponibles: {', '.join(PROFILES)})")
+        spec = PROFILES[spec]
+    return FaultProfile(**spec)
+
+
+app = FastAPI(title="Weather upstream simulator")
+simulator = Simulator()
+
+
+def measurement(city, timestamp=None):
+    """
+    Valores deterministas por ciudad que varían suavemente con el tiempo (ahora o `timestamp`).
+    """
+    seed = zlib.crc32(city.encode())
+    drift = (int(time.time() if timestamp is None else timestamp) // 900) % 10
+    return {
+        "temperature": 10 + seed % 15 + drift / 10,
+        "humidity": 40 + seed % 50,
+        "pressure": 990 + seed % 40
+    }
+
+
+@app.get("/data/2.5/weather")
+async def openweather(q: str, appid: str = None, units: str = "metric"):
+    values = measurement(q)
+    return await simulator.respond("openweather", {
+        "name": q,
+        "dt": int(time.time()),
+        "main": {"temp": values["temperature"], "humidity": values["humidity"], "pressure": values["pressure"]}
+    })
+
+
+# Histórico por hora de OpenWeather: como el real, a lo sumo una semana por request
+HISTORY_MAX_SECONDS = 7 * 24 * 3600
+
+
+@app.get("/data/2.5/history/city")
+async def openweather_history(q: str, start: int, end: int, type: str = "hour", appid: str = None, units: str = "metric"):
+    if end <= start or end - start > HISTORY_MAX_SECONDS:
+        raise HTTPException(status_code=400, detail="El rango tiene que ser de hasta una semana")
+    points = []
+    first = -(-start // 3600) * 3600  # primera hora completa del rango
+    for dt in range(first, end + 1, 3600):
+        values = measurement(q, dt)
+        points.append({"dt": dt, "main": {"temp": values["temperature"], "humidity": values["humidity"], "pressure": values["pressure"]}})
+    return await simulator.respond("openweather_history", {"city_id": zlib.crc32(q.encode()), "cnt": len(points), "list": points})
+
+
+@app.get("/current")
+async def weatherstack(query: str, access_key: str = None, units: str = "m"):
+    values = measurement(query)
+    return await simulator.respond("weatherstack", {
+        "location": {"name": query},
+        "current": {"temperature": values["temperature"], "humidity": values["humidity"], "pressure": values["pressure"]}
+    })
+
+
+# ---------------------------------------------------
+# CONTROL DEL SIMULADOR
+# ---------------------------------------------------
+@app.put("/_sim/profile")
+def set_profile(spec=Body(...)):
+    """
+    Aplica un perfil (nombre o dict) y reinicia los contadores y las ventanas de caída.
+    """
+    try:
+        simulator.apply(build_profile(spec))
+    except (ValueError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return simulator.profile.to_dict()
+
+
+@app.get("/_sim/profile")
+def get_profile():
+    return simulator.profile.to_dict()
+
+
+@app.get("/_sim/stats")
+def get_stats():
+    return simulator.stats()
+
+
+# Uso: python benchmarks/fake_upstream.py [--profile flaky | --profile '{"error_rate": 0.5}']
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulador de OpenWeather/weatherstack con inyección de fallas")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8901)
+    parser.add_argument("--profile", default=None, help=f"Perfil inicial: {', '.join(PROFILES)} o JSON")
+    args = parser.parse_args()
+    if args.profile:
+        simulator.apply(build_profile(json.loads(args.profile) if args.profile.startswith("{") else args.profile))
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
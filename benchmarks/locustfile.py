@@ -0,0 +1,99 @@
+import json
+import os
+import random
+import time
+from locust import HttpUser, between, constant, events, task
+
+
+CITIES = os.getenv("BENCH_CITIES", "Buenos Aires,Cordoba,Rosario").split(",")
+# $type/$percentile no existen en el Mongo en memoria: /weather/stats solo con un Mongo real
+STATS_ENABLED = bool(os.getenv("BENCH_MONGO_URI"))
+
+
+# ---------------------------------------------------
+# ESCENARIOS MIXTOS
+# ---------------------------------------------------
+class DashboardUser(HttpUser):
+    """
+    Paneles que refrescan la medición actual y los promedios (la mayor parte del tráfico).
+    """
+    weight = 6
+    wait_time = between(0.5, 1.5)
+
+    def city(self):
+        return {"city": random.choice(CITIES)}
+
+    @task(3)
+    def current(self):
+        self.client.get("/weather/current", params=self.city(), name="/weather/current")
+
+    @task(3)
+    def summary(self):
+        self.client.get("/weather/summary", params=self.city(), name="/weather/summary")
+
+    @task(1)
+    def avg_day(self):
+        self.client.get("/weather/average/day", params=self.city(), name="/weather/average/day")
+
+    @task(1)
+    def avg_week(self):
+        self.client.get("/weather/average/week", params=self.city(), name="/weather/average/week")
+
+
+class AnalystUser(HttpUser):
+    """
+    Consultas de estadísticas sobre ventanas arbitrarias y exportaciones de histórico.
+    """
+    weight = 2
+    wait_time = between(1, 3)
+
+    if STATS_ENABLED:
+        @task(3)
+        def stats(self):
+            to = int(time.time())
+            params = {
+                "from": to - random.choice([6, 24, 72]) * 3600,
+                "to": to,
+                "bucket": random.choice(["15m", "1h"]),
+                "city": random.choice(CITIES)
+            }
+            self.client.get("/weather/stats", params=params, name="/weather/stats")
+
+    @task(1)
+    def history(self):
+        params = {"from": int(time.time()) - 24 * 3600, "format": random.choice(["ndjson", "csv"]), "city": random.choice(CITIES)}
+        self.client.get("/weather/history", params=params, name="/weather/history")
+
+
+class PrometheusScraper(HttpUser):
+    weight = 1
+    wait_time = constant(1)
+
+    @task
+    def metrics(self):
+        self.client.get("/metrics", name="/metrics")
+
+
+# ---------------------------------------------------
+# RESULTADOS EN JSON (BENCH_LOCUST_OUTPUT)
+# ---------------------------------------------------
+@events.quitting.add_listener
+def write_results(environment, **kwargs):
+    output = os.getenv("BENCH_LOCUST_OUTPUT")
+    if not output:
+        return
+    results = {}
+    for (name, method), entry in environment.stats.entries.items():
+        if not entry.num_requests:
+            continue
+        results[f"macro.{method} {name}"] = {
+            "count": entry.num_requests,
+            "failures": entry.num_failures,
+            "p50": entry.get_response_time_percentile(0.5),
+            "p95": entry.get_response_time_percentile(0.95),
+            "p99": entry.get_response_time_percentile(0.99),
+            "mean": entry.avg_response_time,
+            "throughput": entry.total_rps
+        }
+    with open(output, "w") as file:
+        json.dump(results, file)
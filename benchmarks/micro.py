@@ -0,0 +1,231 @@
+import argparse
+import asyncio
+import itertools
+import json
+import sys
+import time
+from benchlib import measure, ameasure, summarize
+from offline import CITIES, LOADER_PORT, offline_environment, use_service, seed
+
+
+# ---------------------------------------------------
+# MICRO-BENCHMARKS DE weather_loader (repositorio sobre el Mongo offline)
+# ---------------------------------------------------
+def loader_suite(iterations):
+    offline_environment()
+    use_service("weather_loader")
+    import repository
+    seed(repository)
+    city = CITIES[0]
+    batch = [{"city": name, "temperature": 20.0, "humidity": 50, "pressure": 1000} for name in CITIES]
+    timestamps = itertools.count(int(time.time()))
+
+    def save_batch():
+        timestamp = next(timestamps)
+        repository.save_many([{**data, "timestamp": timestamp} for data in batch])
+
+    import async_repository
+    return {
+        "event_loop_lag": asyncio.run(event_loop_lag(async_repository, city, iterations)),
+        "event_loop_lag_blocking": asyncio.run(event_loop_lag(BlockingRepository(repository), city, iterations)),
+        "avg_since_day": measure(lambda: repository.avg_since(24 * 3600, city), iterations),
+        "avg_since_week": measure(lambda: repository.avg_since(7 * 24 * 3600, city), iterations),
+        "get_snapshot": measure(lambda: repository.get_snapshot(city), iterations),
+        "get_latest": measure(lambda: repository.get_latest(city), iterations),
+        "save_many": measure(save_batch, iterations)
+    }
+
+
+class BlockingRepository:
+    """
+    El camino anterior a async_repository: las consultas de pymongo corren en el event loop.
+    Es el punto de comparación de event_loop_lag.
+    """
+
+    def __init__(self, repository):
+        self.repository = repository
+
+    async def get_snapshot(self, city):
+        return self.repository.get_snapshot(city)
+
+    async def avg_since(self, seconds, city):
+        return self.repository.avg_since(seconds, city)
+
+
+async def event_loop_lag(async_repository, city, iterations, concurrency=20, interval=0.005):
+    """
+    Retraso del event loop mientras `concurrency` clientes hacen consultas RPC-like (getSnapshot y
+    promedios) contra el repositorio async. Mide lo mismo que EventLoopLagMonitor, con un intervalo corto.
+    Con mongomock las consultas son CPU de Python: parte del retraso es contención del GIL con los
+    threads del pool, que no aparece contra un Mongo real (BENCH_MONGO_URI).
+    """
+    loop = asyncio.get_running_loop()
+    lags = []
+    done = asyncio.Event()
+
+    async def sampler():
+        while not done.is_set():
+            expected = loop.time() + interval
+            await asyncio.sleep(interval)
+            lags.append(max(0.0, loop.time() - expected))
+
+    async def client():
+        for _ in range(max(1, iterations // concurrency)):
+            await async_repository.get_snapshot(city)
+            await async_repository.avg_since(24 * 3600, city)
+
+    task = asyncio.create_task(sampler())
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    done.set()
+    await task
+    result = summarize(lags, elapsed)
+    # El throughput de muestras depende del intervalo, no del código medido
+    result["throughput"] = None
+    return result
+
+
+# ---------------------------------------------------
+# MICRO-BENCHMARKS DE weather_metrics
+# ---------------------------------------------------
+async def metrics_suite(iterations, loader_uri):
+    offline_environment()
+    use_service("weather_metrics")
+    from prometheus_client import generate_latest
+    from cache import ttl_cache
+    from rpc_pool import RpcConnectionPool
+    import api  # registra todas las series de Prometheus del servicio
+
+    @ttl_cache(seconds=3600, max_size=iterations * 2)
+    async def cached(key):
+        return key
+
+    await cached("hit")
+    keys = itertools.count()
+    results = {
+        **serialization_suite(iterations * 10),
+        **await middleware_suite(iterations * 10),
+        "ttl_cache_hit": await ameasure(lambda: cached("hit"), iterations * 10),
+        "ttl_cache_miss": await ameasure(lambda: cached(next(keys)), iterations),
+        "metrics_serialization": measure(generate_latest, iterations)
+    }
+
+    pool = RpcConnectionPool(size=1, call_timeout=5)
+    await pool.start(loader_uri)
+    try:
+        await pool.call("avgDay", city=CITIES[0])
+    except Exception as e:
+        print(f"weather_loader no disponible en {loader_uri}, se omite rpc_round_trip: {e}", file=sys.stderr)
+    else:
+        results["rpc_round_trip"] = await ameasure(lambda: pool.call("avgDay", city=CITIES[0]), iterations)
+        results["rpc_get_snapshot"] = await ameasure(lambda: pool.call("getSnapshot", city=CITIES[0]), iterations)
+    finally:
+        await pool.close()
+    return results
+
+
+def serialization_suite(iterations):
+    """
+    Costo por request de serializar la medición actual: el camino anterior (dict como string por RPC,
+    replace de comillas + json.loads + JSONResponse) contra el tipado (dict por RPC serializado por
+    FastAPI con el response_model, directo a bytes con pydantic), y la codificación de un frame RPC
+    de getSnapshot en JSON contra msgpack.
+    """
+    from fastapi.responses import JSONResponse
+    from pydantic import TypeAdapter
+    from api import CurrentResponse
+    from fastapi_websocket_rpc.schemas import RpcMessage, RpcResponse
+    from fastapi_websocket_rpc.simplewebsocket import JsonSerializingWebSocket
+    from rpc_serialization import MsgpackSerializingWebSocket
+
+    current = {"temperature": 21.4, "humidity": 64, "pressure": 1014, "timestamp": 1700000000, "datetime": "2023-11-14 19:13:20"}
+    legacy_doc = str(current)
+    snapshot = RpcMessage(response=RpcResponse[dict](
+        call_id="0" * 32, result_type="WeatherSnapshot",
+        result={"current": current, "avgDay": 20.125, "avgWeek": 18.5}
+    ))
+    current_adapter = TypeAdapter(CurrentResponse)
+    frames = {"json": JsonSerializingWebSocket(None), "msgpack": MsgpackSerializingWebSocket(None)}
+
+    def frame_round_trip(socket):
+        return lambda: socket._deserialize(socket._serialize(snapshot))
+
+    return {
+        "serialize_current_legacy": measure(lambda: JSONResponse(json.loads(legacy_doc.replace("'", "\""))).body, iterations),
+        "serialize_current": measure(lambda: current_adapter.dump_json(current_adapter.validate_python(current)), iterations),
+        "rpc_frame_json": measure(frame_round_trip(frames["json"]), iterations),
+        "rpc_frame_msgpack": measure(frame_round_trip(frames["msgpack"]), iterations)
+    }
+
+
+async def middleware_suite(iterations):
+    """
+    Overhead por request del middleware de métricas: una app con un endpoint trivial sin middleware,
+    con el middleware anterior (BaseHTTPMiddleware, labels por path crudo) y con el ASGI puro,
+    llamada directo por ASGI para no medir un cliente HTTP.
+    """
+    from fastapi import FastAPI
+    from prometheus_client import CollectorRegistry, Counter, Histogram
+    from starlette.middleware.base import BaseHTTPMiddleware
+    from middleware import MetricsMiddleware
+
+    registry = CollectorRegistry()
+    legacy_count = Counter('legacy_request_count', '', ['method', 'endpoint', 'http_status'], registry=registry)
+    legacy_latency = Histogram('legacy_request_latency_seconds', '', ['method', 'endpoint'], registry=registry)
+
+    class LegacyMetricsMiddleware(BaseHTTPMiddleware):
+        async def dispatch(self, request, call_next):
+            start = time.time()
+            response = await call_next(request)
+            legacy_latency.labels(method=request.method, endpoint=request.url.path).observe(time.time() - start)
+            legacy_count.labels(method=request.method, endpoint=request.url.path, http_status=response.status_code).inc()
+            return response
+
+    def build(middleware=None):
+        app = FastAPI()
+
+        @app.get("/bench")
+        async def bench():
+            return {"ok": True}
+
+        if middleware is not None:
+            app.add_middleware(middleware)
+        return app
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": "/bench", "raw_path": b"/bench", "root_path": "", "query_string": b"", "headers": [],
+        "client": ("127.0.0.1", 50000), "server": ("127.0.0.1", 8000)
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    def request(app):
+        return lambda: app(dict(scope), receive, send)
+
+    return {
+        "middleware_none": await ameasure(request(build()), iterations),
+        "middleware_legacy": await ameasure(request(build(LegacyMetricsMiddleware)), iterations),
+        "middleware_asgi": await ameasure(request(build(MetricsMiddleware)), iterations)
+    }
+
+
+# Corre una suite de micro-benchmarks e imprime el resultado en JSON.
+# Uso: python benchmarks/micro.py loader|metrics [--iterations N] [--loader ws://127.0.0.1:8001/ws]
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Micro-benchmarks offline")
+    parser.add_argument("suite", choices=["loader", "metrics"])
+    parser.add_argument("--iterations", type=int, default=500)
+    parser.add_argument("--loader", default=f"ws://127.0.0.1:{LOADER_PORT}/ws")
+    args = parser.parse_args()
+
+    if args.suite == "loader":
+        results = loader_suite(args.iterations)
+    else:
+        results = asyncio.run(metrics_suite(args.iterations, args.loader))
+    print(json.dumps({f"micro.{args.suite}.{name}": result for name, result in results.items()}))
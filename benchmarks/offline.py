@@ -0,0 +1,139 @@
+import argparse
+import os
+import random
+import sys
+import time
+from types import SimpleNamespace
+import uvicorn
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CITIES = ["Buenos Aires", "Cordoba", "Rosario"]
+UPSTREAM_PORT = 8901
+LOADER_PORT = 8001
+METRICS_PORT = 8000
+SEED_DAYS = 8
+SEED_INTERVAL = 15 * 60
+
+
+# ---------------------------------------------------
+# ENTORNO OFFLINE (sin OpenWeather, sin Mongo remoto)
+# ---------------------------------------------------
+def use_service(name):
+    """
+    Deja importables los módulos de un servicio. Cada proceso carga un solo servicio:
+    weather_loader y weather_metrics comparten nombres de módulo (api, config, logging_ag).
+    """
+    sys.path.insert(0, os.path.join(ROOT, name))
+
+
+def _install_mongomock():
+    """
+    Reemplaza MongoClient por mongomock. mongomock no entiende las operaciones de bulk_write
+    de pymongo 4, así que se traducen a las llamadas individuales equivalentes.
+    """
+    import mongomock
+    import pymongo
+    from mongomock.collection import Collection
+
+    def bulk_write(self, requests, ordered=True, **kwargs):
+        upserted = {}
+        for index, request in enumerate(requests):
+            if isinstance(request, pymongo.UpdateOne):
+                result = self.update_one(request._filter, request._doc, upsert=request._upsert)
+            elif isinstance(request, pymongo.ReplaceOne):
+                result = self.replace_one(request._filter, request._doc, upsert=request._upsert)
+            elif isinstance(request, pymongo.InsertOne):
+                self.insert_one(request._doc)
+                continue
+            else:
+                raise NotImplementedError(type(request).__name__)
+            if result.upserted_id is not None:
+                upserted[index] = result.upserted_id
+        return SimpleNamespace(upserted_count=len(upserted), upserted_ids=upserted)
+
+    Collection.bulk_write = bulk_write
+    pymongo.MongoClient = mongomock.MongoClient
+
+
+def offline_environment(upstream_url=f"http://127.0.0.1:{UPSTREAM_PORT}"):
+    """
+    Variables de entorno del stack offline: los proveedores apuntan al simulador de upstream.
+    Con BENCH_MONGO_URI se usa ese Mongo (ej: uno local); si no, una base en memoria (mongomock)
+    sin colección time-series.
+    """
+    os.environ["CITY"] = CITIES[0]
+    os.environ["CITIES"] = ",".join(CITIES)
+    os.environ["OPENWEATHER_API_KEY"] = "offline"
+    os.environ["WEATHERSTACK_API_KEY"] = "offline"
+    os.environ["OPENWEATHER_BASE_URL"] = upstream_url
+    os.environ["OPENWEATHER_HISTORY_BASE_URL"] = upstream_url
+    os.environ["WEATHERSTACK_BASE_URL"] = upstream_url
+    mongo_uri = os.getenv("BENCH_MONGO_URI")
+    if mongo_uri:
+        os.environ["MONGO_URI"] = mongo_uri
+        os.environ["MONGO_DB"] = os.getenv("BENCH_MONGO_DB", "weather_bench")
+    else:
+        _install_mongomock()
+        os.environ["MONGO_URI"] = "mongodb://localhost:27017"
+        os.environ["MONGO_TIMESERIES"] = "false"
+
+
+def seed(repository, cities=CITIES, days=SEED_DAYS):
+    """
+    Carga `days` días de mediciones cada 15 minutos por ciudad, terminando ahora.
+    """
+    random.seed(42)
+    now = int(time.time())
+    measurements = [
+        {
+            "city": city,
+            "timestamp": timestamp,
+            "temperature": round(random.uniform(5, 30), 2),
+            "humidity": random.randint(30, 90),
+            "pressure": random.randint(990, 1030)
+        }
+        for city in cities
+        for timestamp in range(now - days * 24 * 3600 + SEED_INTERVAL, now + 1, SEED_INTERVAL)
+    ]
+    repository.ensure_storage()
+    repository.save_many(measurements)
+    return len(measurements)
+
+
+def load_loader(upstream_url):
+    offline_environment(upstream_url)
+    use_service("weather_loader")
+    import repository
+    seed(repository)
+    import api
+    return api
+
+
+def load_metrics(upstream_url, loader_host="127.0.0.1"):
+    offline_environment(upstream_url)
+    use_service("weather_metrics")
+    import api
+    api.HOST = loader_host
+    return api
+
+
+# Levanta un componente del stack offline en este proceso.
+# Uso: python benchmarks/offline.py upstream|loader|metrics
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stack offline para benchmarks")
+    parser.add_argument("role", choices=["upstream", "loader", "metrics"])
+    parser.add_argument("--host", default="127.0.0.1")
+    args = parser.parse_args()
+
+    upstream_url = f"http://{args.host}:{UPSTREAM_PORT}"
+    if args.role == "upstream":
+        from fake_upstream import app
+        port = UPSTREAM_PORT
+    elif args.role == "loader":
+        app = load_loader(upstream_url).app
+        port = LOADER_PORT
+    else:
+        app = load_metrics(upstream_url, args.host).app
+        port = METRICS_PORT
+    uvicorn.run(app, host=args.host, port=port, log_level="warning")
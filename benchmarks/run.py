@@ -0,0 +1,136 @@
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from benchlib import compare, format_table, load_results, metadata, save_results
+from offline import LOADER_PORT, METRICS_PORT, ROOT, UPSTREAM_PORT
+
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+PORTS = {"upstream": UPSTREAM_PORT, "loader": LOADER_PORT, "metrics": METRICS_PORT}
+
+
+# ---------------------------------------------------
+# STACK OFFLINE EN PROCESOS SEPARADOS
+# ---------------------------------------------------
+class OfflineStack:
+    def __init__(self, roles, log_dir, startup_timeout=60):
+        self.roles = roles
+        self.log_dir = log_dir
+        self.startup_timeout = startup_timeout
+        self.processes = []
+
+    def __enter__(self):
+        for role in self.roles:
+            log = open(os.path.join(self.log_dir, f"{role}.log"), "w")
+            process = subprocess.Popen(
+                [sys.executable, os.path.join(BENCH_DIR, "offline.py"), role],
+                cwd=ROOT, stdout=log, stderr=subprocess.STDOUT
+            )
+            self.processes.append((role, process, log))
+            self._wait_port(role, process)
+        # Deja que weather_metrics abra el pool RPC y la suscripción de snapshots
+        time.sleep(2)
+        return self
+
+    def __exit__(self, *exc):
+        for role, process, log in reversed(self.processes):
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+            log.close()
+
+    def _wait_port(self, role, process):
+        deadline = time.monotonic() + self.startup_timeout
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"{role} terminó al arrancar, ver {self.log_dir}/{role}.log")
+            try:
+                with socket.create_connection(("127.0.0.1", PORTS[role]), timeout=1):
+                    return
+            except OSError:
+                time.sleep(0.2)
+        raise RuntimeError(f"{role} no respondió en el puerto {PORTS[role]}")
+
+
+# ---------------------------------------------------
+# SUITES
+# ---------------------------------------------------
+def run_micro(iterations, log_dir):
+    results = {}
+    for suite in ("loader", "metrics"):
+        with open(os.path.join(log_dir, f"micro_{suite}.log"), "w") as log:
+            completed = subprocess.run(
+                [sys.executable, os.path.join(BENCH_DIR, "micro.py"), suite, "--iterations", str(iterations)],
+                cwd=ROOT, stdout=subprocess.PIPE, stderr=log, text=True, check=True
+            )
+        results.update(json.loads(completed.stdout.strip().splitlines()[-1]))
+    return results
+
+
+def run_macro(users, spawn_rate, duration, log_dir):
+    output = os.path.join(log_dir, "locust.json")
+    with open(os.path.join(log_dir, "locust.log"), "w") as log:
+        subprocess.run(
+            [
+                sys.executable, "-m", "locust",
+                "-f", os.path.join(BENCH_DIR, "locustfile.py"),
+                "--headless", "--only-summary",
+                "-u", str(users), "-r", str(spawn_rate), "-t", duration,
+                "--host", f"http://127.0.0.1:{METRICS_PORT}"
+            ],
+            cwd=ROOT, stdout=log, stderr=subprocess.STDOUT,
+            env={**os.environ, "BENCH_LOCUST_OUTPUT": output}
+        )
+    return load_results(output)
+
+
+# Corre los benchmarks offline, guarda el resultado en JSON y lo compara contra el baseline.
+# Sale con código 1 si hay regresiones.
+# Uso: python benchmarks/run.py [micro|macro|all] [--update-baseline]
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks offline con control de regresiones")
+    parser.add_argument("suite", nargs="?", choices=["micro", "macro", "all"], default="all")
+    parser.add_argument("--output", default=os.path.join(ROOT, "reports_bench", "latest.json"))
+    parser.add_argument("--baseline", default=os.path.join(BENCH_DIR, "baseline.json"))
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Empeoramiento admitido (fracción) de p95 y throughput")
+    parser.add_argument("--update-baseline", action="store_true", help="Guarda el resultado como nuevo baseline")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--users", type=int, default=30)
+    parser.add_argument("--spawn-rate", type=int, default=10)
+    parser.add_argument("--duration", default="30s")
+    args = parser.parse_args()
+
+    log_dir = tempfile.mkdtemp(prefix="weather_bench_")
+    print(f"Logs en {log_dir}")
+    results = {}
+    roles = ["upstream", "loader"] + (["metrics"] if args.suite in ("macro", "all") else [])
+    with OfflineStack(roles, log_dir):
+        if args.suite in ("micro", "all"):
+            results.update(run_micro(args.iterations, log_dir))
+        if args.suite in ("macro", "all"):
+            results.update(run_macro(args.users, args.spawn_rate, args.duration, log_dir))
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    save_results(args.output, {"meta": metadata(), "results": results})
+    print(f"Resultados en {args.output}")
+
+    if args.update_baseline:
+        save_results(args.baseline, {"meta": metadata(), "results": results})
+        print(f"Baseline actualizado en {args.baseline}")
+        sys.exit(0)
+    if not os.path.exists(args.baseline):
+        print("No hay baseline para comparar (correr con --update-baseline)")
+        sys.exit(0)
+
+    rows, regressions = compare(results, load_results(args.baseline)["results"], args.tolerance)
+    print(format_table(rows))
+    if regressions:
+        print(f"{len(regressions)} regresiones (tolerancia {args.tolerance:.0%})")
+        sys.exit(1)
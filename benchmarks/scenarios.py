@@ -0,0 +1,150 @@
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+import httpx
+from benchlib import percentile, save_results
+from offline import CITIES, UPSTREAM_PORT, offline_environment, use_service
+
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+UPSTREAM_URL = f"http://127.0.0.1:{UPSTREAM_PORT}"
+
+# Políticas de reintentos / circuit breaker a comparar ("config" = la configurada en weather_loader)
+POLICIES = {
+    "no-retry": {"timeout": 10, "retry_attempts": 1, "retry_wait": 0, "breaker_fail_max": 3, "breaker_reset_timeout": 60},
+    "fast-retry": {"timeout": 2, "retry_attempts": 3, "retry_wait": 0.2, "breaker_fail_max": 5, "breaker_reset_timeout": 10},
+    "no-breaker": {"timeout": 10, "retry_attempts": 3, "retry_wait": 5, "breaker_fail_max": 10 ** 6, "breaker_reset_timeout": 60}
+}
+
+
+def config_policy(config):
+    return {
+        "timeout": config["openweather_timeout"],
+        "retry_attempts": config["openweather_retry_attempts"],
+        "retry_wait": config["openweather_retry_wait"],
+        "breaker_fail_max": config["openweather_breaker_fail_max"],
+        "breaker_reset_timeout": config["openweather_breaker_reset_timeout"]
+    }
+
+
+# ---------------------------------------------------
+# EJECUCIÓN DE UN ESCENARIO (perfil del simulador x política)
+# ---------------------------------------------------
+async def run_scenario(weather_client, profile, policy, duration, rate):
+    """
+    Genera `rate` fetches por segundo (llegadas abiertas, repartidas entre ciudades) durante `duration`
+    segundos y mide la latencia de cada fetch completo (incluye reintentos) y las llamadas al upstream.
+    """
+    import pybreaker
+
+    async with httpx.AsyncClient() as control:
+        (await control.put(f"{UPSTREAM_URL}/_sim/profile", json=profile)).raise_for_status()
+
+    client = weather_client.OpenWeatherClient(
+        "offline", UPSTREAM_URL, max_concurrency=100, rate_per_second=10 ** 6, burst=10 ** 6, **policy
+    )
+    await client.start()
+    latencies, outcomes = [], {"ok": 0, "failed": 0, "breaker_open": 0}
+
+    async def one(city):
+        start = time.perf_counter()
+        try:
+            await client.fetch(city)
+            outcomes["ok"] += 1
+        except pybreaker.CircuitBreakerError:
+            outcomes["breaker_open"] += 1
+        except Exception:
+            outcomes["failed"] += 1
+        latencies.append(time.perf_counter() - start)
+
+    tasks = []
+    started = time.monotonic()
+    for i in range(int(duration * rate)):
+        await asyncio.sleep(max(0, started + i / rate - time.monotonic()))
+        tasks.append(asyncio.create_task(one(CITIES[i % len(CITIES)])))
+    await asyncio.gather(*tasks)
+    await client.close()
+
+    async with httpx.AsyncClient() as control:
+        upstream = (await control.get(f"{UPSTREAM_URL}/_sim/stats")).json().get("openweather", {"total": 0})
+
+    samples = sorted(latencies)
+    requests = len(samples)
+    return {
+        "requests": requests,
+        "ok_rate": outcomes["ok"] / requests,
+        "outcomes": outcomes,
+        "p50": percentile(samples, 50) * 1000,
+        "p95": percentile(samples, 95) * 1000,
+        "p99": percentile(samples, 99) * 1000,
+        "upstream_calls": upstream["total"],
+        "upstream": upstream,
+        "calls_per_request": upstream["total"] / requests
+    }
+
+
+def format_report(results):
+    lines = [f"{'perfil':<14} {'política':<12} {'requests':>8} {'ok %':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'upstream':>9} {'llam/req':>9}"]
+    for name, result in results.items():
+        profile, policy = name.split("/")
+        lines.append(
+            f"{profile:<14} {policy:<12} {result['requests']:>8} {result['ok_rate'] * 100:>6.1f}% "
+            f"{result['p50']:>9.1f} {result['p95']:>9.1f} {result['p99']:>9.1f} "
+            f"{result['upstream_calls']:>9} {result['calls_per_request']:>9.2f}"
+        )
+    return "\n".join(lines)
+
+
+async def main(args):
+    offline_environment(UPSTREAM_URL)
+    use_service("weather_loader")
+    import weather_client
+    from config import CONFIG
+
+    policies = {"config": config_policy(CONFIG), **POLICIES}
+    selected_policies = args.policies.split(",") if args.policies else list(policies)
+    results = {}
+    for profile in args.profiles.split(","):
+        for policy in selected_policies:
+            print(f"Escenario {profile} / {policy} ({args.duration}s)...", file=sys.stderr)
+            results[f"{profile}/{policy}"] = await run_scenario(weather_client, profile, policies[policy], args.duration, args.rate)
+    return results
+
+
+# Corre los escenarios contra el simulador de upstream y reporta cómo cada política
+# de reintentos/breaker afecta el p99 y la cantidad de llamadas al proveedor.
+# Uso: python benchmarks/scenarios.py [--profiles flaky,outage] [--policies config,fast-retry]
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Escenarios de fallas del proveedor")
+    parser.add_argument("--profiles", default="healthy,flaky,slow-tail,timeouts,outage")
+    parser.add_argument("--policies", default=None, help=f"Políticas: config, {', '.join(POLICIES)} (default: todas)")
+    parser.add_argument("--duration", type=float, default=30, help="Segundos de carga por escenario")
+    parser.add_argument("--rate", type=float, default=5, help="Fetches por segundo")
+    parser.add_argument("--output", default=None, help="Guarda los resultados en JSON")
+    args = parser.parse_args()
+
+    simulator = subprocess.Popen(
+        [sys.executable, os.path.join(BENCH_DIR, "fake_upstream.py"), "--port", str(UPSTREAM_PORT)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                httpx.get(f"{UPSTREAM_URL}/_sim/profile").raise_for_status()
+                break
+            except httpx.HTTPError:
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.2)
+        results = asyncio.run(main(args))
+    finally:
+        simulator.terminate()
+        simulator.wait()
+
+    print(format_report(results))
+    if args.output:
+        save_results(args.output, results)
@@ -1,4 +1,6 @@
 import sys
+import threading
+import time
 import requests
 import pytest
 import uvicorn
@@ -6,6 +8,9 @@ from multiprocessing import Process
 sys.path.insert(0, './weather_loader')
 from weather_loader.api  import WeatherServer
 from weather_loader.api  import app as app_loader
+# Ambos servicios tienen su propio config.py y circuit_breaker.py: se descartan los del loader antes de importar metrics
+for name in ('config', 'circuit_breaker'):
+    sys.modules.pop(name, None)
 sys.path.insert(0, './weather_metrics')
 import weather_metrics.api
 from weather_metrics.api import app as app_metrics
@@ -60,6 +65,59 @@ def test_avg_week(server):
     response = requests.get(url= URL_METRICS + "/weather/average/week")
     assert response.status_code == 200
 
+@pytest.mark.asyncio
+def test_summary(server):
+    response = requests.get(url= URL_METRICS + "/weather/summary")
+    assert response.status_code == 200
+
+@pytest.mark.asyncio
+def test_stats(server):
+    response = requests.get(url= URL_METRICS + "/weather/stats", params={"bucket": "1h", "fields": "temperature"})
+    assert response.status_code == 200
+
+@pytest.mark.asyncio
+def test_history(server):
+    response = requests.get(url= URL_METRICS + "/weather/history", params={"format": "csv"})
+    assert response.status_code == 200
+    assert response.text.startswith("city,timestamp")
+
+@pytest.mark.asyncio
+def test_current_weather_not_modified(server):
+    response = requests.get(url= URL_METRICS + "/weather/current")
+    assert response.status_code == 200
+    assert "max-age=" in response.headers["Cache-Control"]
+    response = requests.get(url= URL_METRICS + "/weather/current", headers={"If-None-Match": response.headers["ETag"]})
+    assert response.status_code == 304
+
+@pytest.mark.asyncio
+def test_trace_id_header(server):
+    response = requests.get(url= URL_METRICS + "/weather/current", headers={"X-Trace-Id": "integration-test"})
+    assert response.status_code == 200
+    assert response.headers["X-Trace-Id"] == "integration-test"
+    response = requests.get(url= URL_METRICS + "/weather/current")
+    assert response.headers["X-Trace-Id"]
+
+def test_save_many_concurrent_is_idempotent():
+    import repository
+    repository.ensure_storage()
+    city = "integration-dedup"
+    now = int(time.time())
+    batch = [{"city": city, "timestamp": now - i * 60, "temperature": 10.0, "humidity": 50, "pressure": 1000} for i in range(100)]
+    try:
+        threads = [threading.Thread(target=repository.save_many, args=(batch,)) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        repository.save_many(batch)
+        assert repository.collection.count_documents({"city": city}) == len(batch)
+        hourly = sum(bucket["temperature"]["count"] for bucket in repository.hourly_collection.find({"city": city}))
+        daily = sum(bucket["temperature"]["count"] for bucket in repository.daily_collection.find({"city": city}))
+        assert hourly == daily == len(batch)
+    finally:
+        for collection in (repository.collection, repository.keys_collection, repository.hourly_collection, repository.daily_collection):
+            collection.delete_many({"city": city})
+
 @pytest.mark.asyncio
 def test_current_weather_fails(server_only_one):
     response = requests.get(url= URL_METRICS + "/weather/current")
@@ -88,4 +146,9 @@ def test_avg_week_fails_CB(server_only_one):
     response = requests.get(url= URL_METRICS + "/weather/average/week")
     assert response.status_code == 502
     response = requests.get(url= URL_METRICS + "/weather/average/week")
-    assert response.status_code == 503
\ No newline at end of file
+    assert response.status_code == 503
+
+@pytest.mark.asyncio
+def test_summary_fails(server_only_one):
+    response = requests.get(url= URL_METRICS + "/weather/summary")
+    assert response.status_code == 502
@@ -0,0 +1,203 @@
+import asyncio
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+import pybreaker
+import pytest
+from fastapi import Response
+# Lógica pura de weather_metrics: no necesita Mongo, weather_loader ni los servidores levantados
+sys.path.insert(0, './weather_metrics')
+import http_cache
+from cache import MemoryBackend, TTLCache
+from circuit_breaker import AsyncCircuitBreaker, CircuitSharedStorage
+from config import CONFIG
+from history import iter_pages, encode_pages
+from http_cache import etag_for, max_age, matches, conditional
+from shared_state import SharedState
+from stats import parse_bucket, parse_fields, normalize_window
+
+
+def records(start, count):
+    return [{"city": "Rosario", "timestamp": start + i, "temperature": 20.0} for i in range(count)]
+
+async def collect(pages):
+    return [page async for page in pages]
+
+# ---------------------------------------------------
+# HISTORY
+# ---------------------------------------------------
+@pytest.mark.asyncio
+async def test_iter_pages_follows_cursor():
+    calls = []
+    async def fetch_page(cursor, size):
+        calls.append((cursor, size))
+        return records(cursor + 1, size)
+    pages = await collect(iter_pages(fetch_page, records(0, 2), page_size=2, limit=5))
+    assert [len(page) for page in pages] == [2, 2, 1]
+    assert calls == [(1, 2), (3, 1)]
+
+@pytest.mark.asyncio
+async def test_iter_pages_failed_page_aborts_export():
+    async def fetch_page(cursor, size):
+        raise ConnectionError("weather_loader no disponible")
+    sent = []
+    with pytest.raises(ConnectionError):
+        async for chunk in encode_pages(iter_pages(fetch_page, records(0, 2), page_size=2), "ndjson"):
+            sent.append(chunk)
+    # La primera página se llegó a enviar, pero el stream no termina como una exportación completa
+    assert len(sent) == 1
+
+# ---------------------------------------------------
+# HTTP CACHE
+# ---------------------------------------------------
+def test_etag_for_timestamp_and_body():
+    assert etag_for("current", "Rosario", 100) == etag_for("current", "Rosario", 100)
+    assert etag_for("current", "Rosario", 100) != etag_for("current", "Rosario", 200)
+    assert etag_for("current", "Rosario", 100) != etag_for("current", "Cordoba", 100)
+    assert etag_for("avg_day", "Rosario", body={"a": 1, "b": 2}) == etag_for("avg_day", "Rosario", body={"b": 2, "a": 1})
+    assert etag_for("avg_day", "Rosario", body={"a": 1}) != etag_for("avg_day", "Rosario", body={"a": 2})
+
+def test_max_age(monkeypatch):
+    interval = CONFIG["interval_minutes"] * 60
+    monkeypatch.setattr(http_cache.time, "time", lambda: 10_000.0)
+    assert max_age(30) == 30
+    assert max_age(30, 10_000 - 10) == 30
+    assert max_age(300, 10_000 - interval + 5) == 5
+    # Medición esperada atrasada: no se extiende el reuso con el resto de la división
+    assert max_age(30, 10_000 - interval) == 0
+    assert max_age(30, 10_000 - 3 * interval - 100) == 0
+
+def test_matches():
+    assert matches('"a", W/"b"', '"b"')
+    assert matches("*", '"b"')
+    assert not matches('"a"', '"b"')
+    assert not matches(None, '"b"')
+
+def test_conditional():
+    request = SimpleNamespace(headers={"if-none-match": '"etag-1"'})
+    not_modified = conditional(request, Response(), '"etag-1"', 30)
+    assert not_modified.status_code == 304
+    assert not_modified.headers["cache-control"] == "max-age=30"
+    response = Response()
+    assert conditional(request, response, '"etag-2"', 0) is None
+    assert response.headers["etag"] == '"etag-2"'
+    assert response.headers["cache-control"] == "max-age=0"
+
+# ---------------------------------------------------
+# STATS
+# ---------------------------------------------------
+def test_parse_bucket():
+    assert parse_bucket("15m") == ("minute", 15, 900)
+    assert parse_bucket(" 7h ") == ("hour", 7, 7 * 3600)
+    assert parse_bucket("1d") == ("day", 1, 86400)
+    for bucket in ("0h", "1w", "h", "-1h", "1.5h"):
+        with pytest.raises(ValueError):
+            parse_bucket(bucket)
+
+def test_parse_fields():
+    assert parse_fields("pressure, temperature,temperature") == ("pressure", "temperature")
+    with pytest.raises(ValueError):
+        parse_fields("temperature,wind")
+    with pytest.raises(ValueError):
+        parse_fields(" , ")
+
+def test_normalize_window_epoch_multiples():
+    bucket = 7 * 3600
+    start, end = normalize_window(1_700_000_123, 1_700_100_000, bucket)
+    # Múltiplos de bucket desde el epoch, igual que repository._bucket_start en weather_loader
+    assert start % bucket == 0 and end % bucket == 0
+    assert start <= 1_700_000_123 < start + bucket
+    assert end - bucket < 1_700_100_000 <= end
+    assert normalize_window(start, end, bucket) == (start, end)
+
+# ---------------------------------------------------
+# TTL CACHE
+# ---------------------------------------------------
+def memory_cache(seconds, stale_seconds=0):
+    clock = [1000.0]
+    backend = MemoryBackend(max_size=2)
+    backend.clock = lambda: clock[0]
+    return TTLCache("test", seconds, stale_seconds, max_size=2, backend=backend), clock
+
+@pytest.mark.asyncio
+async def test_ttl_cache_single_flight():
+    cache, _ = memory_cache(10)
+    calls = 0
+    async def compute():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return calls
+    results = await asyncio.gather(*(cache.get("k", compute) for _ in range(10)))
+    assert results == [1] * 10
+    assert calls == 1
+    assert await cache.get("k", compute) == 1
+
+@pytest.mark.asyncio
+async def test_ttl_cache_stale_while_revalidate():
+    cache, clock = memory_cache(10, stale_seconds=5)
+    values = iter(["v1", "v2", "v3"])
+    async def compute():
+        return next(values)
+    assert await cache.get("k", compute) == "v1"
+    clock[0] += 12
+    # Vencido pero dentro de stale_seconds: devuelve el anterior y refresca en background
+    assert await cache.get("k", compute) == "v1"
+    while cache._inflight:
+        await asyncio.sleep(0)
+    assert await cache.get("k", compute) == "v2"
+    clock[0] += 20
+    # Fuera de stale_seconds se espera el cálculo nuevo
+    assert await cache.get("k", compute) == "v3"
+
+@pytest.mark.asyncio
+async def test_ttl_cache_does_not_store_errors_or_empty():
+    cache, _ = memory_cache(10)
+    async def empty():
+        return None
+    async def failing():
+        raise ConnectionError("weather_loader no disponible")
+    async def value():
+        return "ok"
+    assert await cache.get("k", empty) is None
+    with pytest.raises(ConnectionError):
+        await cache.get("k", failing)
+    assert await cache.get("k", value) == "ok"
+
+@pytest.mark.asyncio
+async def test_ttl_cache_lru_eviction():
+    cache, _ = memory_cache(10)
+    for key in ("a", "b", "c"):
+        await cache.get(key, lambda key=key: asyncio.sleep(0, key))
+    assert cache.backend.get("a") is None
+    assert cache.backend.get("c")[0] == "c"
+
+# ---------------------------------------------------
+# CIRCUIT BREAKER
+# ---------------------------------------------------
+async def open_breaker(breaker):
+    async def failing():
+        raise ConnectionError("weather_loader no disponible")
+    with pytest.raises(pybreaker.CircuitBreakerError):
+        await breaker.call_coroutine(failing)
+
+@pytest.mark.asyncio
+async def test_breaker_effective_state():
+    breaker = AsyncCircuitBreaker(fail_max=1, reset_timeout=60)
+    assert breaker.effective_state == pybreaker.STATE_CLOSED
+    await open_breaker(breaker)
+    assert breaker.effective_state == pybreaker.STATE_OPEN
+    breaker._state_storage.opened_at = datetime.now(timezone.utc) - timedelta(seconds=61)
+    # Pasado reset_timeout se informa half-open sin cambiar el estado guardado
+    assert breaker.effective_state == pybreaker.STATE_HALF_OPEN
+    assert breaker.current_state == pybreaker.STATE_OPEN
+
+@pytest.mark.asyncio
+async def test_breaker_effective_state_shared(tmp_path):
+    storage = CircuitSharedStorage(SharedState(str(tmp_path / "shared_state.sqlite")), "test")
+    breaker = AsyncCircuitBreaker(fail_max=1, reset_timeout=60, state_storage=storage)
+    await open_breaker(breaker)
+    assert breaker.effective_state == pybreaker.STATE_OPEN
+    storage.opened_at = datetime.now(timezone.utc) - timedelta(seconds=61)
+    assert breaker.effective_state == pybreaker.STATE_HALF_OPEN
@@ -1,17 +1,32 @@
+import asyncio
 import logging
-from datetime import datetime,timedelta
-from fastapi import FastAPI
+import time
+from datetime import datetime
+from typing import Optional
+from fastapi import FastAPI, HTTPException, Query, Response
+from fastapi.responses import JSONResponse
 import pytz
-from repository import get_latest, avg_since
+from prometheus_client import Counter, generate_latest, CONTENT_TYPE_LATEST
+import async_repository
+from repository import get_snapshot, lease_collection, BUCKET_UNITS, ROLLUP_FIELDS
 from fastapi_websocket_rpc import RpcMethodsBase, WebsocketRPCEndpoint
+from fastapi_websocket_rpc.schemas import WebSocketFrameType
 from contextlib import asynccontextmanager
-from apscheduler.schedulers.background import BackgroundScheduler
-from weather_client import fetch_weather
-from repository import save_weather_data
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from weather_client import weather_provider
 from config import CONFIG
 from logger import get_logger
-from weather_client import fetch_weather
 from logging_ag import log_to_opensearch
+from publisher import SnapshotPublisher
+from loop_monitor import EventLoopLagMonitor
+from leader import LeaderLease
+from scheduler import ProviderPolling
+from health import Startup
+from mongo import mongo
+from rpc_serialization import MsgpackSerializingWebSocket
+from schemas import CurrentWeather, WeatherSnapshot
+from tracing import traced_rpc
+from profiler import SamplingProfiler
 
 logging.basicConfig(
     format="[%(asctime)s] %(levelname)s %(name)s: %(message)s",
@@ -19,46 +34,306 @@ logging.basicConfig(
 )
 logger = get_logger("Scheduler")
 
-def job():
+publisher = SnapshotPublisher()
+loop_monitor = EventLoopLagMonitor(interval=CONFIG["event_loop_lag_interval"])
+# Con varias instancias del loader solo la que tiene el lease corre job()
+scheduler_lease = LeaderLease(lease_collection, "scheduler", CONFIG["leader_lease_seconds"])
+provider_polling = ProviderPolling(update_seconds=CONFIG["provider_update_seconds"])
+
+def format_current(latest):
+    gmt_timezone = pytz.timezone("America/Buenos_Aires")
+    weather_date= datetime.fromtimestamp(latest['timestamp'],gmt_timezone)
+    return {
+        "temperature": latest['temperature'],
+        "humidity": latest['humidity'],
+        "pressure": latest['pressure'],
+        "timestamp": latest['timestamp'],
+        "datetime": weather_date.strftime("%Y-%m-%d %H:%M:%S")
+    }
+
+def is_stale(city, latest):
+    """
+    Sin medición, o vencida y con una observación nueva posible en el proveedor (ver ProviderPolling).
+    """
+    if latest is None:
+        return True
+    return time.time() - latest['timestamp'] > CONFIG["stale_after_seconds"] and provider_polling.due(city)
+
+def format_snapshot(snapshot):
+    return {
+        "current": format_current(snapshot["latest"]),
+        "avgDay": snapshot["avgDay"],
+        "avgWeek": snapshot["avgWeek"]
+    }
+
+def build_snapshots(cities):
+    """
+    Bloqueante (una consulta por ciudad): desde el event loop se llama con async_repository.run.
+    """
+    snapshots = {}
+    for city in cities:
+        snapshot = get_snapshot(city)
+        if snapshot["latest"] is None:
+            continue
+        snapshots[city] = format_snapshot(snapshot)
+    return snapshots
+
+# ---------------------------------------------------
+# REFRESCO DE MEDICIONES VENCIDAS (UN FETCH EN VUELO POR CIUDAD)
+# ---------------------------------------------------
+REFRESHES = Counter(
+    'weather_loader_refreshes',
+    'Refrescos de mediciones vencidas pedidos por RPC (fetched = fetch al proveedor, coalesced = esperó uno en curso, failed = falló el fetch)',
+    ['result']
+)
+_refreshing = {}
+
+async def refresh(city):
+    """
+    Trae la medición de `city` del proveedor, la guarda y publica el snapshot nuevo a los suscriptores.
+    Las llamadas concurrentes para la misma ciudad comparten un único fetch.
+    """
+    task = _refreshing.get(city)
+    if task is None:
+        REFRESHES.labels(result="fetched").inc()
+        task = asyncio.create_task(_refresh(city))
+        _refreshing[city] = task
+        task.add_done_callback(lambda _: _refreshing.pop(city, None))
+    else:
+        REFRESHES.labels(result="coalesced").inc()
+    # shield: si se cancela quien espera, el fetch sigue para el resto
+    return await asyncio.shield(task)
+
+async def refresh_or_stored(city, latest):
+    """
+    refresh(city), o `latest` (lo guardado, puede ser None) si el proveedor falla (caído, reintentos
+    agotados, breaker abierto): una excepción en el método RPC no le llega a weather_metrics,
+    que esperaría hasta RPC_CALL_TIMEOUT, y hay un dato utilizable.
+    """
     try:
-        data = fetch_weather()
-        save_weather_data(data)
+        return await refresh(city)
+    except Exception as e:
+        logger.error(f"Failed to refresh weather data for {city}, serving stored data: {e}")
+        log_to_opensearch(f"Failed to refresh weather data for {city}, serving stored data: {e}","ERROR")
+        return latest
+
+async def _refresh(city):
+    try:
+        latest = await weather_provider.fetch(city)
+    except Exception:
+        REFRESHES.labels(result="failed").inc()
+        raise
+    provider_polling.observe(city, latest["timestamp"])
+    try:
+        await async_repository.save_weather_data(latest)
+        snapshots = await async_repository.run(build_snapshots, [city])
+        await publisher.publish(snapshots)
+    except Exception as e:
+        logger.error(f"Failed to save refreshed weather data for {city}: {e}")
+        log_to_opensearch(f"Failed to save refreshed weather data for {city}: {e}","ERROR")
+    return latest
+
+async def job():
+    try:
+        leader = await async_repository.run(scheduler_lease.acquire)
+    except Exception as e:
+        logger.error(f"Failed to acquire scheduler lease: {e}")
+        log_to_opensearch(f"Failed to acquire scheduler lease: {e}","ERROR")
+        return
+    if not leader:
+        await publish_stored()
+        return
+    cities = provider_polling.plan(CONFIG["cities"])
+    results = await weather_provider.fetch_many(cities)
+    measurements = []
+    for city, result in zip(cities, results):
+        if isinstance(result, Exception):
+            logger.error(f"Failed to load weather data for {city}: {result}")
+            log_to_opensearch(f"Failed to load weather data for {city}: {result}","ERROR")
+        elif provider_polling.observe(city, result["timestamp"]):
+            measurements.append(result)
+    try:
+        await async_repository.save_many(measurements)
+        snapshots = await async_repository.run(build_snapshots, [data["city"] for data in measurements])
+        await publisher.publish(snapshots)
     except Exception as e:
         logger.error(f"Failed to load weather data: {e}")
         log_to_opensearch(f"Failed to load weather data: {e}","ERROR")
 
+async def publish_stored():
+    """
+    Instancias sin el lease: no consultan al proveedor, pero publican a sus suscriptores
+    lo que guardó la líder.
+    """
+    if not publisher.subscribers:
+        return
+    try:
+        snapshots = await async_repository.run(build_snapshots, CONFIG["cities"])
+        await publisher.publish(snapshots)
+    except Exception as e:
+        logger.error(f"Failed to publish stored snapshots: {e}")
+        log_to_opensearch(f"Failed to publish stored snapshots: {e}","ERROR")
+
+# ---------------------------------------------------
+# ARRANQUE: MONGO Y WARM-UP ANTES DE ESTAR LISTO
+# ---------------------------------------------------
+startup = Startup()
+
+async def startup_steps(state):
+    delay = 1
+    while True:
+        try:
+            await async_repository.ensure_storage()
+            break
+        except Exception as e:
+            state.checks["mongo"] = f"error: {e}"
+            logger.error(f"Mongo no disponible al arrancar, reintento en {delay}s: {e}")
+            log_to_opensearch(f"Mongo no disponible al arrancar: {e}","ERROR")
+            await asyncio.sleep(delay)
+            delay = min(30, delay * 2)
+    state.checks["mongo"] = "ok"
+    # Un snapshot por ciudad: abre las conexiones del pool y trae los índices a memoria
+    # antes de atender los primeros getSnapshot/subscribe
+    try:
+        snapshots = await async_repository.run(build_snapshots, CONFIG["cities"])
+        state.checks["warmup"] = f"{len(snapshots)} snapshots"
+    except Exception as e:
+        state.checks["warmup"] = f"error: {e}"
+        logger.error(f"Warm-up fallido: {e}")
+
 @asynccontextmanager
 async def lifespan(app:FastAPI):
-    scheduler = BackgroundScheduler()
+    loop_monitor.start()
+    await weather_provider.start()
+    startup.start(startup_steps)
+    scheduler = AsyncIOScheduler()
     scheduler.add_job(job,"interval",minutes = CONFIG["interval_minutes"])
     scheduler.start()
     yield
+    scheduler.shutdown(wait=False)
+    await startup.stop()
+    if scheduler_lease.leader:
+        await async_repository.run(scheduler_lease.release)
+    await weather_provider.close()
+    await loop_monitor.stop()
+    async_repository.shutdown()
+    mongo.close()
 
 app = FastAPI(lifespan=lifespan)
 
 
 class WeatherServer(RpcMethodsBase):
-    async def getCurrent(self):
-        latest = get_latest()
-        gmt_timezone = pytz.timezone("America/Buenos_Aires")
-
-        if datetime.fromtimestamp(latest['timestamp']) < (datetime.now() - timedelta(minutes=10)):
-            latest = fetch_weather()
-        weather_date= datetime.fromtimestamp(latest['timestamp'],gmt_timezone)
-        return {
-        "temperature": latest['temperature'],
-        "humidity": latest['humidity'],
-        "pressure": latest['pressure'],
-        "datetime": weather_date.strftime("%Y-%m-%d %H:%M:%S")
-    }
-    
-    async def avgDay(self):
-        return avg_since(24 * 3600)
-    
-    async def avgWeek(self):
-        return avg_since(7 * 24 * 3600)
+    @traced_rpc
+    async def getCurrent(self, city: str = None) -> Optional[CurrentWeather]:
+        city = city or CONFIG["city"]
+        latest = await async_repository.get_latest(city)
+
+        if city not in CONFIG["cities"]:
+            # Ciudades no configuradas: solo se responde con lo que haya en la base
+            return CurrentWeather(**format_current(latest)) if latest is not None else None
+        if is_stale(city, latest):
+            latest = await refresh_or_stored(city, latest)
+        return CurrentWeather(**format_current(latest)) if latest is not None else None
+
+    @traced_rpc
+    async def getSnapshot(self, city: str = None) -> Optional[WeatherSnapshot]:
+        """
+        Medición actual y promedios diario y semanal de `city` en una sola llamada.
+        """
+        city = city or CONFIG["city"]
+        snapshot = await async_repository.get_snapshot(city)
+        if city in CONFIG["cities"] and is_stale(city, snapshot["latest"]):
+            snapshot["latest"] = await refresh_or_stored(city, snapshot["latest"])
+        if snapshot["latest"] is None:
+            return None
+        return WeatherSnapshot(**format_snapshot(snapshot))
+
+    @traced_rpc
+    async def getStats(self, start: int, end: int, unit: str = "hour", bin_size: int = 1, fields: list = None, city: str = None) -> list:
+        """
+        Estadísticas por bucket de la ventana [start, end) (epoch). Ver repository.get_stats.
+        """
+        if unit not in BUCKET_UNITS or bin_size < 1:
+            return []
+        return await async_repository.get_stats(city or CONFIG["city"], start, end, unit, bin_size, fields or ROLLUP_FIELDS)
+
+    @traced_rpc
+    async def getHistory(self, start: int, end: int, after: Optional[int] = None, limit: int = 1000, city: str = None) -> list:
+        """
+        Página de mediciones crudas para la exportación de histórico. Ver repository.get_history.
+        """
+        return await async_repository.get_history(city or CONFIG["city"], start, end, after, limit)
 
+    @traced_rpc
+    async def avgDay(self, city: str = None) -> Optional[float]:
+        return await async_repository.avg_since(24 * 3600, city)
 
-endpoint = WebsocketRPCEndpoint(WeatherServer())
+    @traced_rpc
+    async def avgWeek(self, city: str = None) -> Optional[float]:
+        return await async_repository.avg_since(7 * 24 * 3600, city)
+
+    async def subscribe(self) -> dict:
+        """
+        Suscribe el canal que llama a los snapshots publicados por el scheduler.
+        Devuelve los snapshots actuales de todas las ciudades para que el suscriptor arranque con datos.
+        """
+        publisher.subscribe(self.channel)
+        return await async_repository.run(build_snapshots, CONFIG["cities"])
+
+
+@app.get("/metrics")
+def metrics():
+    """
+    Punto de exposición para Prometheus.
+    """
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
+@app.get("/healthz")
+async def healthz():
+    """
+    Liveness: el proceso y su event loop responden.
+    """
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readyz():
+    """
+    Readiness: arranque terminado (Mongo y warm-up) y Mongo respondiendo.
+    """
+    if startup.ready:
+        try:
+            await asyncio.wait_for(async_repository.run(mongo.ping), 2)
+            startup.checks["mongo"] = "ok"
+        except Exception as e:
+            startup.checks["mongo"] = f"error: {e!r}"
+            return JSONResponse(status_code=503, content={"status": "unavailable", "checks": startup.checks})
+    return startup.readiness()
+
+
+profiler = SamplingProfiler(max_seconds=CONFIG["profiler_max_seconds"])
+
+@app.get("/debug/profile")
+async def profile(seconds: float = Query(10, gt=0), interval: float = Query(0.01, gt=0)):
+    """
+    Perfil por muestreo del proceso durante `seconds` en formato de stacks colapsados (flame graph).
+    Solo con PROFILER_ENABLED=true.
+    """
+    if not CONFIG["profiler_enabled"]:
+        raise HTTPException(status_code=404, detail="Not Found")
+    stacks = await asyncio.to_thread(profiler.profile, seconds, interval)
+    if stacks is None:
+        raise HTTPException(status_code=409, detail="Ya hay un perfil en curso")
+    return Response(content=stacks, media_type="text/plain")
+
+
+endpoint = WebsocketRPCEndpoint(WeatherServer(), on_disconnect=[publisher.unsubscribe])
 endpoint.register_route(app, "/ws")
-    
\ No newline at end of file
+# Mismos métodos con frames binarios msgpack (weather_metrics con RPC_ENCODING=msgpack)
+msgpack_endpoint = WebsocketRPCEndpoint(
+    WeatherServer(),
+    on_disconnect=[publisher.unsubscribe],
+    frame_type=WebSocketFrameType.Binary,
+    serializing_socket_cls=MsgpackSerializingWebSocket
+)
+msgpack_endpoint.register_route(app, "/ws/msgpack")
@@ -0,0 +1,70 @@
+import asyncio
+import functools
+import time
+from concurrent.futures import ThreadPoolExecutor
+import repository
+from config import CONFIG
+from tracing import STAGE_LATENCY, stage
+
+
+# ---------------------------------------------------
+# API ASYNC DEL REPOSITORIO
+# ---------------------------------------------------
+# pymongo es sincrónico: desde el event loop las consultas se corren en un pool de threads
+# dedicado (no el threadpool por defecto de starlette), así una consulta lenta no frena
+# el resto de los clientes WebSocket ni compite con otras tareas bloqueantes.
+_executor = ThreadPoolExecutor(max_workers=CONFIG["mongo_executor_workers"], thread_name_prefix="mongo")
+
+
+async def run(function, *args, **kwargs):
+    """
+    Corre `function` (bloqueante) en el executor de Mongo y espera el resultado.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(_timed, time.perf_counter(), function, *args, **kwargs))
+
+
+def _timed(submitted, function, *args, **kwargs):
+    """
+    Ya en el thread del executor: registra la espera en la cola (mongo_wait) y la consulta (mongo).
+    """
+    operation = function.__name__
+    STAGE_LATENCY.labels(stage="mongo_wait", operation=operation).observe(time.perf_counter() - submitted)
+    with stage("mongo", operation):
+        return function(*args, **kwargs)
+
+
+def shutdown():
+    _executor.shutdown(wait=False)
+
+
+async def ensure_storage():
+    return await run(repository.ensure_storage)
+
+
+async def save_weather_data(data):
+    return await run(repository.save_weather_data, data)
+
+
+async def save_many(measurements):
+    return await run(repository.save_many, measurements)
+
+
+async def get_latest(city=None):
+    return await run(repository.get_latest, city)
+
+
+async def avg_since(seconds, city=None):
+    return await run(repository.avg_since, seconds, city)
+
+
+async def get_snapshot(city=None):
+    return await run(repository.get_snapshot, city)
+
+
+async def get_history(city, start, end, after=None, limit=1000):
+    return await run(repository.get_history, city, start, end, after, limit)
+
+
+async def get_stats(city, start, end, unit="hour", bin_size=1, fields=repository.ROLLUP_FIELDS):
+    return await run(repository.get_stats, city, start, end, unit, bin_size, fields)
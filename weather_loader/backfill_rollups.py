@@ -0,0 +1,13 @@
+from repository import ensure_storage, rebuild_rollups
+from logger import get_logger
+
+logger = get_logger("Backfill")
+
+
+# Reconstruye los buckets horarios y diarios a partir de las mediciones existentes.
+# Con RAW_RETENTION_DAYS solo los buckets cubiertos enteros por mediciones crudas: los anteriores se conservan.
+# Uso: python backfill_rollups.py
+if __name__ == "__main__":
+    ensure_storage()
+    rebuild_rollups()
+    logger.info("Backfill de rollups finalizado")
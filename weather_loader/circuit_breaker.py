@@ -0,0 +1,46 @@
+import inspect
+from datetime import datetime, timedelta, timezone
+from functools import wraps
+import pybreaker
+
+
+# ---------------------------------------------------
+# CIRCUIT BREAKER COMPATIBLE CON CORRUTINAS
+# ---------------------------------------------------
+class AsyncCircuitBreaker(pybreaker.CircuitBreaker):
+    """
+    pybreaker.CircuitBreaker que tambien puede decorar funciones `async def`.
+    Reutiliza el storage, los listeners y las transiciones de estado de pybreaker,
+    solo que la llamada protegida se espera con await en vez de ejecutarse en un thread.
+    """
+
+    async def call_coroutine(self, func, *args, **kwargs):
+        state = self.state
+        if state.name == pybreaker.STATE_OPEN:
+            opened_at = self._state_storage.opened_at
+            now = datetime.now(timezone.utc) if opened_at and opened_at.tzinfo else datetime.utcnow()
+            if opened_at and now < opened_at + timedelta(seconds=self.reset_timeout):
+                raise pybreaker.CircuitBreakerError("Timeout not elapsed yet, circuit breaker still open")
+            self.half_open()
+            state = self.state
+
+        for listener in self.listeners:
+            listener.before_call(self, func, *args, **kwargs)
+
+        try:
+            result = await func(*args, **kwargs)
+        except Exception as e:
+            state._handle_error(e)
+        else:
+            state._handle_success()
+            return result
+
+    def __call__(self, func):
+        if not inspect.iscoroutinefunction(func):
+            return super().__call__(func)
+
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            return await self.call_coroutine(func, *args, **kwargs)
+
+        return wrapper
@@ -8,7 +8,50 @@ CONFIG = {
     "mongo_uri": os.getenv("MONGO_URI"),
     "mongo_db": os.getenv("MONGO_DB", "weather"),
     "mongo_collection": os.getenv("MONGO_COLLECTION", "measurements"),
+    # Pool de conexiones de pymongo: las consultas corren en MONGO_EXECUTOR_WORKERS threads
+    "mongo_max_pool_size": int(os.getenv("MONGO_MAX_POOL_SIZE", 20)),
+    "mongo_min_pool_size": int(os.getenv("MONGO_MIN_POOL_SIZE", 2)),
+    "mongo_max_idle_ms": int(os.getenv("MONGO_MAX_IDLE_MS", 5 * 60 * 1000)),
+    "mongo_server_selection_timeout_ms": int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5000)),
     "city": os.getenv("CITY", "Buenos Aires"),
+    # Lista de ciudades separadas por coma; por defecto solo CITY
+    "cities": [city.strip() for city in os.getenv("CITIES", os.getenv("CITY", "Buenos Aires")).split(",") if city.strip()],
     "open_search_uri": os.getenv("OPEN_SEARCH_URI"),
-    "interval_minutes": 15
+    "interval_minutes": 15,
+    "log_queue_size": int(os.getenv("LOG_QUEUE_SIZE", 10000)),
+    "log_batch_size": int(os.getenv("LOG_BATCH_SIZE", 500)),
+    "log_flush_interval": float(os.getenv("LOG_FLUSH_INTERVAL", 2)),
+    "log_sample_rate": float(os.getenv("LOG_SAMPLE_RATE", 0.1)),
+    "log_ship_timeout": float(os.getenv("LOG_SHIP_TIMEOUT", 5)),
+    "openweather_max_concurrency": int(os.getenv("OPENWEATHER_MAX_CONCURRENCY", 10)),
+    "openweather_rate_limit": float(os.getenv("OPENWEATHER_RATE_LIMIT", 1)),
+    "openweather_burst": int(os.getenv("OPENWEATHER_BURST", 10)),
+    # Base URL del proveedor (ej: el simulador de benchmarks/fake_upstream.py) y política de reintentos/breaker
+    "openweather_base_url": os.getenv("OPENWEATHER_BASE_URL", "https://api.openweathermap.org").rstrip("/"),
+    "openweather_timeout": float(os.getenv("OPENWEATHER_TIMEOUT", 10)),
+    "openweather_retry_attempts": int(os.getenv("OPENWEATHER_RETRY_ATTEMPTS", 3)),
+    "openweather_retry_wait": float(os.getenv("OPENWEATHER_RETRY_WAIT", 5)),
+    "openweather_breaker_fail_max": int(os.getenv("OPENWEATHER_BREAKER_FAIL_MAX", 3)),
+    "openweather_breaker_reset_timeout": float(os.getenv("OPENWEATHER_BREAKER_RESET_TIMEOUT", 60)),
+    # API de histórico por hora del proveedor (import_history.py --provider)
+    "openweather_history_base_url": os.getenv("OPENWEATHER_HISTORY_BASE_URL", "https://history.openweathermap.org").rstrip("/"),
+    # Colección time-series y retención (días, 0 = sin vencimiento) de cada nivel
+    "mongo_timeseries": os.getenv("MONGO_TIMESERIES", "true").lower() == "true",
+    "raw_retention_days": int(os.getenv("RAW_RETENTION_DAYS", 7)),
+    "hourly_retention_days": int(os.getenv("HOURLY_RETENTION_DAYS", 365)),
+    # Antigüedad (segundos) a partir de la cual getCurrent/getSnapshot refrescan la medición desde el proveedor
+    "stale_after_seconds": int(os.getenv("STALE_AFTER_SECONDS", 10 * 60)),
+    # Cada cuánto publica el proveedor una observación nueva (segundos): antes de `dt` + esto no se lo consulta
+    "provider_update_seconds": int(os.getenv("PROVIDER_UPDATE_SECONDS", 10 * 60)),
+    # Vencimiento (segundos) del lease del scheduler: con varias instancias solo la que lo tiene corre job()
+    "leader_lease_seconds": int(os.getenv("LEADER_LEASE_SECONDS", 15 * 60 * 3 // 2)),
+    # Threads del executor de consultas a Mongo (ver async_repository.py) e intervalo (segundos) de medición del event loop
+    "mongo_executor_workers": int(os.getenv("MONGO_EXECUTOR_WORKERS", 8)),
+    "event_loop_lag_interval": float(os.getenv("EVENT_LOOP_LAG_INTERVAL", 0.5)),
+    "history_batch_size": int(os.getenv("HISTORY_BATCH_SIZE", 500)),
+    # Percentiles aproximados de /weather/stats ($percentile requiere MongoDB 7.0; vacío los desactiva)
+    "stats_percentiles": [float(p) for p in os.getenv("STATS_PERCENTILES", "0.5,0.95,0.99").split(",") if p.strip()],
+    # Profiler por muestreo en /debug/profile (desactivado por defecto) y duración máxima (segundos) de un perfil
+    "profiler_enabled": os.getenv("PROFILER_ENABLED", "false").lower() == "true",
+    "profiler_max_seconds": int(os.getenv("PROFILER_MAX_SECONDS", 60))
 }
@@ -0,0 +1,47 @@
+import asyncio
+import logging
+import time
+from fastapi.responses import JSONResponse
+
+
+logger = logging.getLogger("health")
+
+
+# ---------------------------------------------------
+# ARRANQUE EN BACKGROUND Y READINESS
+# ---------------------------------------------------
+class Startup:
+    """
+    Corre las tareas de arranque (conexiones, warm-up de cache) en background: el servidor
+    acepta conexiones enseguida, /healthz responde y /readyz da 503 hasta que terminan.
+    `checks` guarda el resultado de cada paso para mostrarlo en /readyz.
+    """
+
+    def __init__(self):
+        self.ready = False
+        self.checks = {}
+        self._started = time.monotonic()
+        self._task = None
+
+    def start(self, steps):
+        self._started = time.monotonic()
+        self._task = asyncio.create_task(self._run(steps))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self, steps):
+        await steps(self)
+        self.ready = True
+        logger.info(f"Listo para recibir tráfico en {time.monotonic() - self._started:.2f}s: {self.checks}")
+
+    def readiness(self):
+        status = "ready" if self.ready else "starting"
+        return JSONResponse(status_code=200 if self.ready else 503, content={"status": status, "checks": self.checks})
+
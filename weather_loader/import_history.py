@@ -0,0 +1,334 @@
+import argparse
+import asyncio
+import csv
+import gzip
+import json
+import math
+import time
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timezone
+from itertools import islice
+from config import CONFIG
+from repository import (
+    bucket_totals, ensure_storage, insert_missing_rollups, save_many, DAY, HOUR, HOURLY_RETENTION, RAW_RETENTION
+)
+from logger import get_logger
+
+logger = get_logger("ImportHistory")
+
+BATCH_SIZE = 5000
+WORKERS = 4
+REPORT_EVERY = 5
+DEDUP_WINDOW = 100_000
+
+# Nombres de columna de otros sistemas -> esquema de medición
+FIELD_ALIASES = {
+    "name": "city",
+    "dt": "timestamp",
+    "time": "timestamp",
+    "date": "timestamp",
+    "datetime": "timestamp",
+    "temp": "temperature"
+}
+
+# Rangos válidos (°C, %, hPa): un valor fuera de rango es un registro inválido, no una medición
+RANGES = {
+    "temperature": (-100, 70),
+    "humidity": (0, 100),
+    "pressure": (800, 1100)
+}
+
+
+# ---------------------------------------------------
+# LECTURA Y NORMALIZACIÓN
+# ---------------------------------------------------
+def read_records(path):
+    """
+    Registros de un CSV (con encabezado) o JSONL, uno por vez; también comprimidos con gzip (.gz).
+    """
+    name = path[:-3] if path.endswith(".gz") else path
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8", newline="") as file:
+        if name.endswith(".csv"):
+            yield from csv.DictReader(file)
+        elif name.endswith((".jsonl", ".ndjson")):
+            for line in file:
+                if line.strip():
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        yield None
+        else:
+            raise ValueError(f"Formato no soportado: {path} (csv, jsonl o ndjson)")
+
+
+def parse_timestamp(value):
+    """
+    Epoch en segundos (o milisegundos) o fecha ISO 8601; sin zona horaria se toma como UTC.
+    """
+    if isinstance(value, str):
+        value = value.strip()
+        try:
+            value = float(value)
+        except ValueError:
+            parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+            if parsed.tzinfo is None:
+                parsed = parsed.replace(tzinfo=timezone.utc)
+            return int(parsed.timestamp())
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ValueError(f"timestamp inválido: {value!r}")
+    return int(value / 1000 if value > 1e11 else value)
+
+
+def normalize(record, default_city=None):
+    """
+    Lleva un registro al esquema de medición (city, timestamp, temperature, humidity, pressure).
+    Acepta los alias de FIELD_ALIASES y el formato del proveedor ({"dt": ..., "main": {"temp": ...}}).
+    Lanza ValueError si falta un campo o un valor está fuera de rango.
+    """
+    if not isinstance(record, dict):
+        raise ValueError("registro ilegible")
+    flat = {**record, **record["main"]} if isinstance(record.get("main"), dict) else record
+    fields = {FIELD_ALIASES.get(key, key): value for key, value in flat.items()}
+
+    city = fields.get("city") or default_city
+    if not city or not str(city).strip():
+        raise ValueError("falta city")
+    if fields.get("timestamp") in (None, ""):
+        raise ValueError("falta timestamp")
+    data = {"city": str(city).strip(), "timestamp": parse_timestamp(fields["timestamp"])}
+    for field, (low, high) in RANGES.items():
+        value = fields.get(field)
+        if value in (None, ""):
+            raise ValueError(f"falta {field}")
+        value = float(value)
+        if not low <= value <= high:
+            raise ValueError(f"{field} fuera de rango: {value}")
+        data[field] = value if field == "temperature" else int(round(value))
+    return data
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+# ---------------------------------------------------
+# IMPORTACIÓN EN LOTES PARALELOS
+# ---------------------------------------------------
+class ImportStats:
+    def __init__(self):
+        self.started = time.monotonic()
+        self.read = 0
+        self.invalid = 0
+        self.duplicated = 0
+        self.inserted = 0
+        self.rollup_only = 0
+        self.skipped = 0
+
+    def report(self, final=False):
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        logger.info(
+            f"{'Importación finalizada' if final else 'Importando'}: {self.read} leídos, {self.inserted} insertados, "
+            f"{self.rollup_only} solo en rollups, {self.skipped} omitidos (bucket existente), "
+            f"{self.duplicated} duplicados, {self.invalid} inválidos "
+            f"en {elapsed:.1f}s ({self.read / elapsed:,.0f} registros/s, {self.inserted / elapsed:,.0f} inserts/s)"
+        )
+
+
+class RecentKeys:
+    """
+    Últimas `size` claves (city, timestamp) vistas: memoria acotada aunque el archivo tenga millones de filas.
+    """
+
+    def __init__(self, size=DEDUP_WINDOW):
+        self.size = size
+        self._keys = OrderedDict()
+
+    def add(self, key):
+        """
+        Devuelve False si la clave ya estaba en la ventana.
+        """
+        if key in self._keys:
+            self._keys.move_to_end(key)
+            return False
+        self._keys[key] = None
+        if len(self._keys) > self.size:
+            self._keys.popitem(last=False)
+        return True
+
+
+class HistoryImporter:
+    """
+    Escribe los registros en lotes de `batch_size` con save_many (insert_many desordenado y rollups
+    en bulk) desde `workers` threads, con a lo sumo 2 * workers lotes en vuelo.
+    Deduplica por (city, timestamp) contra lo ya guardado en save_many (atómico, ver _claim_keys),
+    así que reimportar un archivo no duplica; en memoria solo se recuerdan las últimas `dedup_window`
+    claves, para descartar antes los duplicados cercanos.
+    Las mediciones más viejas que la retención de los datos crudos solo se agregan a los rollups,
+    creando los buckets que no existen (insert_missing_rollups): el TTL las borraría enseguida y
+    después no habría contra qué deduplicarlas. Entre ellas, un duplicado más lejano que la ventana
+    se suma dos veces al bucket.
+    """
+
+    def __init__(self, batch_size=BATCH_SIZE, workers=WORKERS, report_every=REPORT_EVERY, dedup_window=DEDUP_WINDOW):
+        self.batch_size = batch_size
+        self.workers = workers
+        self.report_every = report_every
+        self.stats = ImportStats()
+        self._recent = RecentKeys(dedup_window)
+        self._hourly = {}
+        self._daily = {}
+
+    def _accept(self, data):
+        if self._recent.add((data["city"], data["timestamp"])):
+            return True
+        self.stats.duplicated += 1
+        return False
+
+    def _valid(self, records, default_city):
+        for record in records:
+            self.stats.read += 1
+            try:
+                data = normalize(record, default_city)
+            except (ValueError, TypeError, KeyError) as e:
+                self.stats.invalid += 1
+                if self.stats.invalid <= 10:
+                    logger.warning(f"Registro {self.stats.read} inválido: {e}")
+                continue
+            if self._accept(data):
+                yield data
+
+    def _save(self, batch):
+        inserted = save_many(batch)
+        return inserted, len(batch) - inserted
+
+    def _collect(self, done):
+        for future in done:
+            inserted, duplicated = future.result()
+            self.stats.inserted += inserted
+            self.stats.duplicated += duplicated
+
+    def run(self, records, default_city=None):
+        now = time.time()
+        # Redondeado al día siguiente: un bucket no se arma en parte con save_many y en parte acá, y no se
+        # guardan crudas mediciones que el TTL borraría enseguida (con sus claves de dedup, así que
+        # reimportarlas las volvería a sumar a los rollups)
+        raw_cutoff = math.ceil((now - RAW_RETENTION) / DAY) * DAY if RAW_RETENTION else None
+        hourly_cutoff = now - HOURLY_RETENTION if HOURLY_RETENTION else None
+        last_report = time.monotonic()
+        pending = set()
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for batch in batched(self._valid(records, default_city), self.batch_size):
+                if raw_cutoff is not None:
+                    expired = [data for data in batch if data["timestamp"] < raw_cutoff]
+                    if expired:
+                        self._aggregate(expired, hourly_cutoff)
+                        batch = [data for data in batch if data["timestamp"] >= raw_cutoff]
+                if batch:
+                    pending.add(executor.submit(self._save, batch))
+                if len(pending) >= 2 * self.workers:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    self._collect(done)
+                if time.monotonic() - last_report >= self.report_every:
+                    self.stats.report()
+                    last_report = time.monotonic()
+            self._collect(wait(pending).done)
+        if self._daily:
+            self._insert_rollups()
+        self.stats.report(final=True)
+        return self.stats
+
+    def _insert_rollups(self):
+        hourly, daily = insert_missing_rollups(self._hourly, self._daily)
+        # Toda medición vencida cae en un bucket diario: cuenta como importada si ese bucket se creó
+        for key, totals in self._daily.items():
+            rows = totals["temperature"]["count"]
+            if key in daily:
+                self.stats.rollup_only += rows
+            else:
+                self.stats.skipped += rows
+        logger.info(
+            f"Rollups de mediciones vencidas: {len(hourly)} de {len(self._hourly)} buckets horarios y "
+            f"{len(daily)} de {len(self._daily)} diarios creados (los demás ya existían)"
+        )
+
+    def _aggregate(self, measurements, hourly_cutoff):
+        bucket_totals(measurements, DAY, self._daily)
+        # Los buckets horarios que ya vencieron no se crean
+        hourly = [data for data in measurements if hourly_cutoff is None or data["timestamp"] >= hourly_cutoff]
+        bucket_totals(hourly, HOUR, self._hourly)
+
+
+# ---------------------------------------------------
+# HISTÓRICO DEL PROVEEDOR
+# ---------------------------------------------------
+def read_provider(cities, start, end):
+    """
+    Mediciones por hora de cada ciudad entre `start` y `end`, con el cliente del proveedor
+    (rate limit y reintentos de OPENWEATHER_*). Se piden de a una ventana de una semana, a medida
+    que el importador las consume: en memoria hay una sola ventana.
+    """
+    from weather_client import weather_provider
+
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(weather_provider.start())
+        for city in cities:
+            windows = weather_provider.fetch_history(city, start, end)
+            count = 0
+            try:
+                while True:
+                    measurements = loop.run_until_complete(anext(windows))
+                    count += len(measurements)
+                    yield from measurements
+            except StopAsyncIteration:
+                logger.info(f"{city}: {count} mediciones del API de histórico")
+            finally:
+                loop.run_until_complete(windows.aclose())
+    finally:
+        loop.run_until_complete(weather_provider.close())
+        loop.close()
+
+
+def read_files(paths):
+    for path in paths:
+        logger.info(f"Leyendo {path}")
+        yield from read_records(path)
+
+
+# Importa mediciones históricas de archivos CSV/JSONL (o del API de histórico del proveedor).
+# Columnas: city, timestamp (epoch o ISO 8601), temperature, humidity, pressure (acepta name, dt, temp).
+# Uso: python import_history.py datos.csv otros.jsonl.gz [--city Rosario] [--batch-size 5000] [--workers 4]
+#      python import_history.py --provider --cities Rosario,Cordoba --start 2024-01-01 --end 2024-02-01
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Importación masiva de mediciones históricas")
+    parser.add_argument("files", nargs="*", help="Archivos .csv, .jsonl o .ndjson (opcionalmente .gz)")
+    parser.add_argument("--city", default=None, help="Ciudad de los registros que no la traen")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=WORKERS, help="Lotes escritos en paralelo")
+    parser.add_argument("--report-every", type=float, default=REPORT_EVERY, help="Segundos entre reportes de avance")
+    parser.add_argument("--dedup-window", type=int, default=DEDUP_WINDOW, help="Claves recientes recordadas para descartar duplicados")
+    parser.add_argument("--provider", action="store_true", help="Leer del API de histórico del proveedor")
+    parser.add_argument("--cities", default=",".join(CONFIG["cities"]), help="Ciudades a pedir con --provider")
+    parser.add_argument("--start", help="Inicio del rango con --provider (epoch o ISO 8601)")
+    parser.add_argument("--end", help="Fin del rango con --provider (epoch o ISO 8601, por defecto ahora)")
+    args = parser.parse_args()
+    if args.provider == bool(args.files):
+        parser.error("Indicar archivos o --provider")
+    if args.provider and not args.start:
+        parser.error("--provider requiere --start")
+
+    ensure_storage()
+    importer = HistoryImporter(
+        batch_size=args.batch_size, workers=args.workers, report_every=args.report_every, dedup_window=args.dedup_window
+    )
+    if args.provider:
+        cities = [city.strip() for city in args.cities.split(",") if city.strip()]
+        end = parse_timestamp(args.end) if args.end else int(time.time())
+        records = read_provider(cities, parse_timestamp(args.start), end)
+    else:
+        records = read_files(args.files)
+    importer.run(records, default_city=args.city)
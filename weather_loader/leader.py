@@ -0,0 +1,65 @@
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta, timezone
+from prometheus_client import Gauge
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from logger import get_logger
+
+logger = get_logger("Leader")
+
+SCHEDULER_LEADER = Gauge(
+    'weather_loader_scheduler_leader',
+    'Esta instancia tiene el lease del scheduler (1) o no (0)'
+)
+
+
+# ---------------------------------------------------
+# LEASE EN MONGO PARA ELEGIR UNA SOLA INSTANCIA
+# ---------------------------------------------------
+class LeaderLease:
+    """
+    Lease con vencimiento guardado en Mongo (un documento por `name`): lo tiene la instancia que
+    lo tomó hasta `ttl` segundos después de la última renovación. Las demás no lo pueden tomar
+    mientras no venza, así que si el líder se cae otra lo toma como mucho `ttl` segundos después.
+    Los vencimientos usan el reloj de cada instancia: el ttl tiene que ser mucho mayor que el desfasaje.
+    Bloqueante (pymongo): desde el event loop se llama con async_repository.run.
+    """
+
+    def __init__(self, collection, name, ttl):
+        self.collection = collection
+        self.name = name
+        self.ttl = ttl
+        self.owner = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.leader = False
+
+    def acquire(self):
+        """
+        Toma o renueva el lease. Devuelve True si esta instancia es la líder.
+        """
+        now = datetime.now(timezone.utc)
+        try:
+            lease = self.collection.find_one_and_update(
+                {"_id": self.name, "$or": [{"owner": self.owner}, {"expires_at": {"$lt": now}}]},
+                {"$set": {"owner": self.owner, "expires_at": now + timedelta(seconds=self.ttl), "renewed_at": now}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+            leader = lease is not None and lease["owner"] == self.owner
+        except DuplicateKeyError:
+            # El documento existe, vigente y de otra instancia: el upsert choca con su _id
+            leader = False
+        if leader != self.leader:
+            logger.info(f"Lease {self.name}: {'tomado' if leader else 'en manos de otra instancia'} ({self.owner})")
+        self.leader = leader
+        SCHEDULER_LEADER.set(1 if leader else 0)
+        return leader
+
+    def release(self):
+        """
+        Libera el lease si es de esta instancia, así otra lo toma sin esperar el vencimiento.
+        """
+        self.collection.delete_one({"_id": self.name, "owner": self.owner})
+        self.leader = False
+        SCHEDULER_LEADER.set(0)
@@ -1,8 +1,14 @@
+import atexit
+import queue
+import random
+import threading
 from opensearchpy import OpenSearch
+from prometheus_client import Counter, Gauge
 from datetime import datetime
 import time
 import logging
 from config import CONFIG
+from tracing import current_trace_id, stage
 
 
 # ---------------------------------------------------
@@ -13,38 +19,144 @@ logging.basicConfig(
     level=logging.DEBUG
 )
 
-client = OpenSearch(
-    hosts=[CONFIG["open_search_uri"]],
-    http_auth=("admin", "admin"), 
-    use_ssl=False,
-    verify_certs=False,
-)
+def create_client():
+    """
+    Cliente de OpenSearch del shipper: un solo thread lo usa, así que alcanza con una conexión.
+    """
+    return OpenSearch(
+        hosts=[CONFIG["open_search_uri"]],
+        http_auth=("admin", "admin"),
+        use_ssl=False,
+        verify_certs=False,
+        timeout=CONFIG["log_ship_timeout"],
+        maxsize=1
+    )
 
 log_index = "weather_logs"
 
+# ---------------------------------------------------
+# MÉTRICAS DEL SHIPPER
+# ---------------------------------------------------
+LOGS_SHIPPED = Counter('log_shipper_documents_shipped', 'Documentos de log enviados a OpenSearch')
+LOGS_DROPPED = Counter('log_shipper_documents_dropped', 'Documentos de log descartados antes de enviarse', ['reason'])
+LOGS_FAILED = Counter('log_shipper_documents_failed', 'Documentos de log rechazados o con error al enviarse')
+LOGS_QUEUED = Gauge('log_shipper_queue_size', 'Documentos de log pendientes de envío')
+
+# ---------------------------------------------------
+# SHIPPER EN BACKGROUND (COLA ACOTADA + _bulk)
+# ---------------------------------------------------
+class OpenSearchLogShipper:
+    """
+    Envía los logs a OpenSearch desde un thread en background usando la API _bulk.
+    El request nunca espera a OpenSearch: solo encola el documento.
+    Con la cola por encima de `high_watermark` los logs INFO se muestrean con `sample_rate`,
+    y con la cola llena se descartan.
+    El cliente se crea con `client_factory` en el primer envío, desde el thread del shipper:
+    importar el módulo no necesita OpenSearch.
+    """
+
+    def __init__(self, client_factory, index, max_queue=10000, batch_size=500, flush_interval=2.0,
+                 sample_rate=0.1, high_watermark=0.8):
+        self.client_factory = client_factory
+        self.client = None
+        self.index = index
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.sample_rate = sample_rate
+        self.high_watermark = int(max_queue * high_watermark)
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="opensearch-log-shipper", daemon=True)
+                self._thread.start()
+
+    def submit(self, document):
+        if self._thread is None:
+            self.start()
+        if (document["level"] == "INFO" and self._queue.qsize() >= self.high_watermark
+                and random.random() >= self.sample_rate):
+            LOGS_DROPPED.labels(reason="sampled").inc()
+            return
+        try:
+            self._queue.put_nowait(document)
+            LOGS_QUEUED.inc()
+        except queue.Full:
+            LOGS_DROPPED.labels(reason="queue_full").inc()
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while not (self._stop.is_set() and self._queue.empty()):
+            try:
+                batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                LOGS_QUEUED.dec()
+            except queue.Empty:
+                pass
+            if len(batch) >= self.batch_size or time.monotonic() >= deadline or self._stop.is_set():
+                if batch:
+                    self._flush(batch)
+                    batch = []
+                deadline = time.monotonic() + self.flush_interval
+        if batch:
+            self._flush(batch)
+
+    def _flush(self, batch):
+        body = []
+        for document in batch:
+            body.append({"index": {"_index": self.index}})
+            body.append(document)
+        try:
+            if self.client is None:
+                self.client = self.client_factory()
+            with stage("log_ship", "bulk"):
+                response = self.client.bulk(body=body)
+        except Exception as e:
+            LOGS_FAILED.inc(len(batch))
+            logging.warning(f"No se pudieron enviar {len(batch)} logs a OpenSearch: {e}")
+            return
+        failed = sum(1 for item in response.get("items", []) if item.get("index", {}).get("error"))
+        LOGS_FAILED.inc(failed)
+        LOGS_SHIPPED.inc(len(batch) - failed)
+
+
+shipper = OpenSearchLogShipper(
+    create_client,
+    log_index,
+    max_queue=CONFIG["log_queue_size"],
+    batch_size=CONFIG["log_batch_size"],
+    flush_interval=CONFIG["log_flush_interval"],
+    sample_rate=CONFIG["log_sample_rate"]
+)
+atexit.register(shipper.stop)
+
 # Función para enviar logs a OpenSearch
 def send_log_to_opensearch(log_message, level):
     document = {
         "timestamp": datetime.utcnow(),
         "log_message": log_message,
-        "level": level, 
+        "level": level,
     }
-    print(f"++++++++++++++++++++++++++++++++++++++++++++++++++++++++ document { document} ")
-    print(f"++++++++++++++++++++++++++++++++++++++++++++++++++++++++ document { document} ")
-
-    response = client.index(
-        index=log_index,
-        body=document,
-        refresh=True   
-    )
-    print(f"Log enviado a OpenSearch: {response['result']}")
+    trace_id = current_trace_id()
+    if trace_id is not None:
+        document["trace_id"] = trace_id
+    shipper.submit(document)
 
 ## level: INFO | ERROR | WARNING
 def log_to_opensearch(log_message, level):
-    log_message_to_send = f"LOADER - {log_message}"  
+    log_message_to_send = f"LOADER - {log_message}"
     if level == "INFO":
         logging.info(log_message_to_send)
-    else: 
+    else:
         logging.error(log_message_to_send)
-    
-    send_log_to_opensearch(log_message_to_send, level)
\ No newline at end of file
+
+    send_log_to_opensearch(log_message_to_send, level)
@@ -0,0 +1,54 @@
+import asyncio
+from prometheus_client import Gauge, Histogram
+from logger import get_logger
+
+logger = get_logger("LoopMonitor")
+
+EVENT_LOOP_LAG = Histogram(
+    'weather_loader_event_loop_lag_seconds',
+    'Retraso del event loop de weather_loader (cuánto tarda en despertar una tarea respecto de lo programado)',
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+)
+EVENT_LOOP_LAG_LAST = Gauge(
+    'weather_loader_event_loop_lag_last_seconds',
+    'Último retraso medido del event loop de weather_loader'
+)
+
+
+# ---------------------------------------------------
+# MEDICIÓN DEL RETRASO DEL EVENT LOOP
+# ---------------------------------------------------
+class EventLoopLagMonitor:
+    """
+    Duerme `interval` segundos en bucle y registra cuánto más tardó en despertar.
+    Un retraso alto indica código bloqueante corriendo en el event loop.
+    """
+
+    def __init__(self, interval=0.5, warn_threshold=0.1):
+        self.interval = interval
+        self.warn_threshold = warn_threshold
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - expected)
+            EVENT_LOOP_LAG.observe(lag)
+            EVENT_LOOP_LAG_LAST.set(lag)
+            if lag >= self.warn_threshold:
+                logger.warning(f"Event loop bloqueado {lag * 1000:.0f} ms")
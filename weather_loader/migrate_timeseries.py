@@ -0,0 +1,34 @@
+import time
+from config import CONFIG
+from mongo import mongo
+from repository import collection, ensure_storage, rebuild_rollups, to_datetime, RAW_RETENTION
+from logger import get_logger
+
+logger = get_logger("Migration")
+
+BATCH_SIZE = 1000
+
+
+# Migra la colección de mediciones común (timestamp entero) a una colección time-series.
+# Los rollups se reconstruyen desde la colección anterior, así conservan lo que ya venció,
+# y solo se copian las mediciones crudas que están dentro de la retención.
+# La colección anterior queda como <MONGO_COLLECTION>_legacy para borrarla a mano.
+# Uso: python migrate_timeseries.py
+if __name__ == "__main__":
+    legacy = mongo.database[f"{CONFIG['mongo_collection']}_legacy"]
+    collection.rename(legacy.name)
+    ensure_storage()
+    rebuild_rollups(source=legacy)
+
+    query = {"timestamp": {"$gte": int(time.time() - RAW_RETENTION)}} if RAW_RETENTION else {}
+    batch, copied = [], 0
+    for document in legacy.find(query, {"_id": 0}).batch_size(BATCH_SIZE):
+        batch.append({**document, "timestamp": to_datetime(document["timestamp"])})
+        if len(batch) == BATCH_SIZE:
+            collection.insert_many(batch, ordered=False)
+            copied += len(batch)
+            batch = []
+    if batch:
+        collection.insert_many(batch, ordered=False)
+        copied += len(batch)
+    logger.info(f"Migración finalizada: {copied} mediciones copiadas a {collection.name}")
@@ -0,0 +1,69 @@
+import threading
+from pymongo import MongoClient
+from config import CONFIG
+from logger import get_logger
+
+logger = get_logger("Mongo")
+
+
+# ---------------------------------------------------
+# CLIENTE DE MONGO PEREZOSO
+# ---------------------------------------------------
+class MongoConnection:
+    """
+    Crea el MongoClient en el primer uso, no al importar: importar el repositorio (tests, scripts)
+    no resuelve el URI ni necesita un Mongo disponible. El lifespan lo cierra con close().
+    `options` son los parámetros del pool de pymongo (maxPoolSize, minPoolSize, timeouts).
+    """
+
+    def __init__(self, uri, database, **options):
+        self.uri = uri
+        self.database_name = database
+        self.options = options
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = MongoClient(self.uri, **self.options)
+        return self._client
+
+    @property
+    def database(self):
+        return self.client[self.database_name]
+
+    def ping(self):
+        self.client.admin.command("ping")
+
+    def close(self):
+        with self._lock:
+            client, self._client = self._client, None
+        if client is not None:
+            client.close()
+
+
+class LazyCollection:
+    """
+    Colección definida a nivel de módulo que se resuelve contra la conexión recién en el primer uso.
+    Delega todos los atributos en la colección de pymongo.
+    """
+
+    def __init__(self, connection, name):
+        self._connection = connection
+        self._name = name
+
+    def __getattr__(self, attribute):
+        return getattr(self._connection.database[self._name], attribute)
+
+
+mongo = MongoConnection(
+    CONFIG["mongo_uri"],
+    CONFIG["mongo_db"],
+    maxPoolSize=CONFIG["mongo_max_pool_size"],
+    minPoolSize=CONFIG["mongo_min_pool_size"],
+    maxIdleTimeMS=CONFIG["mongo_max_idle_ms"],
+    serverSelectionTimeoutMS=CONFIG["mongo_server_selection_timeout_ms"]
+)
@@ -0,0 +1,61 @@
+import sys
+import threading
+import time
+from collections import Counter
+
+
+# ---------------------------------------------------
+# PROFILER POR MUESTREO (STACKS COLAPSADOS)
+# ---------------------------------------------------
+class SamplingProfiler:
+    """
+    Cada `interval` segundos toma el stack de todos los threads del proceso (sys._current_frames)
+    y cuenta las apariciones de cada stack. El resultado está en formato de stacks colapsados
+    ("thread;modulo:funcion:linea;... cantidad"), el que leen flamegraph.pl y speedscope.
+    Un solo perfil a la vez por proceso; mientras no se pide uno no tiene costo.
+    """
+
+    def __init__(self, max_seconds=60, min_interval=0.001):
+        self.max_seconds = max_seconds
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self._lock.locked()
+
+    def profile(self, seconds, interval=0.01):
+        """
+        Bloqueante durante `seconds`: desde el event loop se corre en un thread.
+        Devuelve None si ya hay un perfil en curso.
+        """
+        if not self._lock.acquire(blocking=False):
+            return None
+        try:
+            seconds = min(seconds, self.max_seconds)
+            interval = max(interval, self.min_interval)
+            return self._sample(seconds, interval)
+        finally:
+            self._lock.release()
+
+    def _sample(self, seconds, interval):
+        own = threading.get_ident()
+        stacks = Counter()
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident != own:
+                    stacks[self._collapse(names.get(ident, str(ident)), frame)] += 1
+            time.sleep(interval)
+        return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+    @staticmethod
+    def _collapse(thread_name, frame):
+        frames = []
+        while frame is not None:
+            code = frame.f_code
+            frames.append(f"{code.co_filename.rsplit('/', 1)[-1]}:{code.co_name}:{frame.f_lineno}")
+            frame = frame.f_back
+        frames.append(thread_name.replace(" ", "_"))
+        return ";".join(reversed(frames))
@@ -0,0 +1,40 @@
+import asyncio
+from logger import get_logger
+
+logger = get_logger("Publisher")
+
+
+# ---------------------------------------------------
+# PUBLICACIÓN DE SNAPSHOTS A LOS SUSCRIPTORES (weather_metrics)
+# ---------------------------------------------------
+class SnapshotPublisher:
+    """
+    Mantiene los canales RPC suscriptos y les envía los snapshots nuevos por ciudad
+    (medición actual + promedios) por el mismo WebSocket de fastapi_websocket_rpc.
+    """
+
+    def __init__(self, timeout=5):
+        self.timeout = timeout
+        self.subscribers = set()
+
+    def subscribe(self, channel):
+        self.subscribers.add(channel)
+        logger.info(f"Suscriptor agregado {channel.id} ({len(self.subscribers)} activos)")
+
+    async def unsubscribe(self, channel):
+        if channel in self.subscribers:
+            self.subscribers.discard(channel)
+            logger.info(f"Suscriptor removido {channel.id} ({len(self.subscribers)} activos)")
+
+    async def publish(self, snapshots):
+        channels = list(self.subscribers)
+        if not channels:
+            return
+        results = await asyncio.gather(
+            *(channel.call("publishSnapshots", {"snapshots": snapshots}, timeout=self.timeout) for channel in channels),
+            return_exceptions=True
+        )
+        for channel, result in zip(channels, results):
+            if isinstance(result, Exception):
+                logger.warning(f"No se pudieron publicar los snapshots a {channel.id}: {result}")
+                await self.unsubscribe(channel)
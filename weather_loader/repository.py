@@ -1,26 +1,524 @@
 import logging
+import math
 import time
-from pymongo import MongoClient
+from datetime import datetime, timezone
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+from pymongo.errors import BulkWriteError
 from config import CONFIG
 from logger import get_logger
+from mongo import mongo, LazyCollection
 
 logger = get_logger("Repository")
 
-client = MongoClient(CONFIG["mongo_uri"])
-db = client[CONFIG["mongo_db"]]
-collection = db[CONFIG["mongo_collection"]]
+collection = LazyCollection(mongo, CONFIG["mongo_collection"])
+
+# ---------------------------------------------------
+# ROLLUPS (buckets pre-agregados por hora y por día)
+# ---------------------------------------------------
+HOUR = 3600
+DAY = 24 * HOUR
+WEEK = 7 * DAY
+ROLLUP_FIELDS = ("temperature", "humidity", "pressure")
+
+hourly_collection = LazyCollection(mongo, f"{CONFIG['mongo_collection']}_hourly")
+daily_collection = LazyCollection(mongo, f"{CONFIG['mongo_collection']}_daily")
+
+# Claves (city, timestamp) de las mediciones guardadas, con índice único: las colecciones
+# time-series no admiten índices únicos, así que el insert de la clave es el que decide quién guarda
+keys_collection = LazyCollection(mongo, f"{CONFIG['mongo_collection']}_keys")
+
+# Leases de las tareas que corre una sola instancia (ver leader.py)
+lease_collection = LazyCollection(mongo, f"{CONFIG['mongo_collection']}_leases")
+
+
+# ---------------------------------------------------
+# RETENCIÓN POR NIVEL (crudo -> horario -> diario)
+# ---------------------------------------------------
+RAW_RETENTION = CONFIG["raw_retention_days"] * DAY
+HOURLY_RETENTION = CONFIG["hourly_retention_days"] * DAY
+
+
+def to_datetime(timestamp):
+    return datetime.fromtimestamp(timestamp, timezone.utc)
+
+def to_timestamp(value):
+    if isinstance(value, datetime):
+        return int(value.replace(tzinfo=timezone.utc).timestamp())
+    return value
+
+def _to_document(data):
+    return {**data, "timestamp": to_datetime(data["timestamp"])}
+
+def _from_document(document):
+    if document is None:
+        return None
+    return {**document, "timestamp": to_timestamp(document["timestamp"])}
+
+# Segundos epoch de `timestamp`, sea fecha (time-series) o entero (colección anterior a la migración)
+EPOCH_EXPRESSION = {"$cond": [
+    {"$eq": [{"$type": "$timestamp"}, "date"]},
+    {"$floor": {"$divide": [{"$toLong": "$timestamp"}, 1000]}},
+    "$timestamp"
+]}
+
+
+def _create_measurements_collection():
+    """
+    Crea la colección de mediciones como time-series (metaField city, timeField timestamp)
+    con vencimiento de los datos crudos. Con MONGO_TIMESERIES=false se usa una colección
+    común con índice TTL sobre timestamp.
+    """
+    db = mongo.database
+    if collection.name in db.list_collection_names():
+        if CONFIG["mongo_timeseries"] and "timeseries" not in collection.options():
+            logger.warning(f"{collection.name} no es time-series: correr python migrate_timeseries.py")
+        return
+    if CONFIG["mongo_timeseries"]:
+        options = {"timeseries": {"timeField": "timestamp", "metaField": "city", "granularity": "minutes"}}
+        if RAW_RETENTION:
+            options["expireAfterSeconds"] = RAW_RETENTION
+        db.create_collection(collection.name, **options)
+        logger.info(f"Colección time-series {collection.name} creada")
+    else:
+        db.create_collection(collection.name)
+        if RAW_RETENTION:
+            collection.create_index([("timestamp", ASCENDING)], name="timestamp_ttl", expireAfterSeconds=RAW_RETENTION)
+
+
+def ensure_storage():
+    _create_measurements_collection()
+    collection.create_index([("city", ASCENDING), ("timestamp", DESCENDING)], name="city_timestamp")
+    for rollup in (hourly_collection, daily_collection):
+        rollup.create_index([("city", ASCENDING), ("start", ASCENDING)], name="city_start", unique=True)
+    if HOURLY_RETENTION:
+        hourly_collection.create_index([("date", ASCENDING)], name="date_ttl", expireAfterSeconds=HOURLY_RETENTION)
+    keys_collection.create_index([("city", ASCENDING), ("timestamp", ASCENDING)], name="city_timestamp", unique=True)
+    if RAW_RETENTION:
+        keys_collection.create_index([("timestamp", ASCENDING)], name="timestamp_ttl", expireAfterSeconds=RAW_RETENTION)
+
+
+def bucket_totals(measurements, size, buckets=None):
+    """
+    Suma, cantidad, mínimo y máximo por (ciudad, bucket) de un lote: un lote grande
+    (ej: una importación de histórico) se escribe con un update por bucket, no por medición.
+    Con `buckets` se acumula sobre totales anteriores.
+    """
+    buckets = {} if buckets is None else buckets
+    for data in measurements:
+        start = data["timestamp"] - data["timestamp"] % size
+        bucket = buckets.setdefault((data["city"], start), {})
+        for field in ROLLUP_FIELDS:
+            value = data.get(field)
+            if value is None:
+                continue
+            totals = bucket.get(field)
+            if totals is None:
+                bucket[field] = {"sum": value, "count": 1, "min": value, "max": value}
+            else:
+                totals["sum"] += value
+                totals["count"] += 1
+                totals["min"] = min(totals["min"], value)
+                totals["max"] = max(totals["max"], value)
+    return buckets
+
+
+def _bucket_update(totals):
+    update = {"$inc": {}, "$min": {}, "$max": {}}
+    for field, values in totals.items():
+        update["$inc"][f"{field}.sum"] = values["sum"]
+        update["$inc"][f"{field}.count"] = values["count"]
+        update["$min"][f"{field}.min"] = values["min"]
+        update["$max"][f"{field}.max"] = values["max"]
+    return {operator: fields for operator, fields in update.items() if fields}
+
+
+def update_rollups(measurements):
+    for rollup, size in ((hourly_collection, HOUR), (daily_collection, DAY)):
+        operations = [
+            UpdateOne(
+                {"city": city, "start": start},
+                {**_bucket_update(totals), "$setOnInsert": {"date": to_datetime(start)}},
+                upsert=True
+            )
+            for (city, start), totals in bucket_totals(measurements, size).items()
+        ]
+        if operations:
+            rollup.bulk_write(operations, ordered=False)
+
+
+def insert_missing_rollups(hourly, daily):
+    """
+    Crea los buckets (totales de bucket_totals) que todavía no existen; los existentes no se tocan.
+    Para mediciones fuera de la retención de los datos crudos, que no se pueden deduplicar contra
+    la colección de mediciones: importarlas dos veces no suma dos veces.
+    Devuelve las claves (city, start) de los buckets creados, horarios y diarios.
+    """
+    created = []
+    for rollup, buckets in ((hourly_collection, hourly), (daily_collection, daily)):
+        keys = list(buckets)
+        operations = [
+            UpdateOne(
+                {"city": city, "start": start},
+                {"$setOnInsert": {**buckets[(city, start)], "date": to_datetime(start)}},
+                upsert=True
+            )
+            for city, start in keys
+        ]
+        upserted = rollup.bulk_write(operations, ordered=False).upserted_ids if operations else {}
+        created.append({keys[index] for index in upserted})
+    return tuple(created)
+
+
+def _new_measurements(measurements):
+    """
+    Mediciones del lote que no están guardadas, por (city, timestamp), según el índice city_timestamp.
+    Es un filtro previo (evita escribir claves de lo ya guardado, incluso de mediciones anteriores
+    a la colección de claves); la garantía la da _claim_keys.
+    """
+    unique = list({(data["city"], data["timestamp"]): data for data in measurements}.values())
+    timestamps = {}
+    for data in unique:
+        timestamps.setdefault(data["city"], []).append(to_datetime(data["timestamp"]))
+    existing = collection.find(
+        {"$or": [{"city": city, "timestamp": {"$in": dates}} for city, dates in timestamps.items()]},
+        {"_id": 0, "city": 1, "timestamp": 1}
+    )
+    saved = {(document["city"], to_timestamp(document["timestamp"])) for document in existing}
+    return [data for data in unique if (data["city"], data["timestamp"]) not in saved]
+
+
+DUPLICATE_KEY = 11000
+
+
+def _claim_keys(measurements):
+    """
+    Inserta las claves (city, timestamp) en la colección con índice único y devuelve las mediciones
+    cuya clave se insertó: si dos escrituras del mismo `dt` corren a la vez (varias instancias,
+    un refresco y el scheduler, un reintento) solo una la obtiene, así que la medición no se
+    duplica ni se suma dos veces a los rollups.
+    """
+    keys = [{"city": data["city"], "timestamp": to_datetime(data["timestamp"])} for data in measurements]
+    try:
+        keys_collection.insert_many(keys, ordered=False)
+        return measurements
+    except BulkWriteError as e:
+        failed = {error["index"] for error in e.details.get("writeErrors", [])}
+        others = [error for error in e.details.get("writeErrors", []) if error.get("code") != DUPLICATE_KEY]
+        if others:
+            logger.error(f"No se pudieron registrar {len(others)} claves de mediciones: {others[0].get('errmsg')}")
+        return [data for i, data in enumerate(measurements) if i not in failed]
+
+
+def _release_keys(measurements):
+    if measurements:
+        keys_collection.delete_many({"$or": [
+            {"city": data["city"], "timestamp": to_datetime(data["timestamp"])} for data in measurements
+        ]})
+
 
 def save_weather_data(data):
-    collection.insert_one(data)
-    logger.info(f"Saved weather data: {data}")
+    return save_many([data])
+
+def save_many(measurements):
+    """
+    Persiste un lote de mediciones con un único insert_many desordenado
+    (un documento fallido no frena al resto) y actualiza los rollups en bulk.
+    Las mediciones ya guardadas se descartan: guardar dos veces el mismo lote, aun en paralelo,
+    no tiene efecto.
+    """
+    if not measurements:
+        return 0
+    measurements = _new_measurements(measurements)
+    if measurements:
+        measurements = _claim_keys(measurements)
+    if not measurements:
+        logger.info("Sin mediciones nuevas para guardar")
+        return 0
+    try:
+        inserted = len(collection.insert_many([_to_document(data) for data in measurements], ordered=False).inserted_ids)
+        saved = measurements
+    except BulkWriteError as e:
+        inserted = e.details.get("nInserted", 0)
+        failed = {error["index"] for error in e.details.get("writeErrors", [])}
+        saved = [data for i, data in enumerate(measurements) if i not in failed]
+        # Las claves de lo que no se guardó se liberan, así un reintento puede guardarlo
+        _release_keys([data for i, data in enumerate(measurements) if i in failed])
+        logger.error(f"Bulk insert parcial: {len(failed)} errores")
+    update_rollups(saved)
+    logger.info(f"Saved {inserted} weather measurements")
+    return inserted
+
+def get_latest(city=None):
+    city = city or CONFIG["city"]
+    return _from_document(collection.find_one({"city": city}, sort=[("timestamp", -1)]))
+
+def _value_count(field):
+    """
+    Acumulador de $group que cuenta las mediciones con un valor numérico en `field`, las mismas que
+    suma $sum (y que cuenta bucket_totals): una medición sin el campo no baja el promedio.
+    """
+    return {"$sum": {"$cond": [{"$isNumber": f"${field}"}, 1, 0]}}
+
+def _sum_raw(city, start, end):
+    if start >= end:
+        return 0, 0
+    pipeline = [
+        {"$match": {"city": city, "timestamp": {"$gte": to_datetime(start), "$lt": to_datetime(end)}}},
+        {"$group": {"_id": None, "sum": {"$sum": "$temperature"}, "count": _value_count("temperature")}}
+    ]
+    result = list(collection.aggregate(pipeline))
+    return (result[0]["sum"], result[0]["count"]) if result else (0, 0)
 
-def get_latest():
-    return collection.find().sort("timestamp", -1).limit(1)[0]
+def _sum_buckets(rollup, city, start, end=None):
+    if end is not None and start >= end:
+        return 0, 0
+    bucket_filter = {"$gte": start}
+    if end is not None:
+        bucket_filter["$lt"] = end
+    total, count = 0, 0
+    for bucket in rollup.find({"city": city, "start": bucket_filter}, {"temperature": 1}):
+        temperature = bucket.get("temperature", {})
+        total += temperature.get("sum", 0)
+        count += temperature.get("count", 0)
+    return total, count
 
-def avg_since(seconds):
-    threshold = time.time() - seconds
+def avg_since(seconds, city=None):
+    """
+    Promedio de temperatura de `city` desde hace `seconds` segundos.
+    Se resuelve con los buckets diarios y horarios completos que caen en la ventana,
+    y solo se leen mediciones crudas para la hora parcial del borde inicial.
+    Si el borde ya venció en un nivel (retención), se usa el bucket completo del nivel
+    siguiente que lo contiene.
+    """
+    city = city or CONFIG["city"]
+    now = time.time()
+    threshold = now - seconds
+    first_hour = math.ceil(threshold / HOUR) * HOUR
+    if RAW_RETENTION and threshold < now - RAW_RETENTION:
+        first_hour = math.floor(threshold / HOUR) * HOUR
+        threshold = first_hour
+    first_day = math.ceil(first_hour / DAY) * DAY
+    if HOURLY_RETENTION and first_hour < now - HOURLY_RETENTION:
+        first_day = math.floor(first_hour / DAY) * DAY
+        first_hour = first_day
+
+    parts = [
+        _sum_raw(city, threshold, first_hour),
+        _sum_buckets(hourly_collection, city, first_hour, first_day),
+        _sum_buckets(daily_collection, city, first_day)
+    ]
+    total = sum(part[0] for part in parts)
+    count = sum(part[1] for part in parts)
+    return total / count if count else None
+
+def get_snapshot(city=None):
+    """
+    Última medición y promedios de temperatura del último día y la última semana de `city`
+    en una sola agregación ($facet sobre las mediciones crudas de la semana).
+    Si la semana excede la retención de datos crudos, los promedios salen de los rollups.
+    """
+    city = city or CONFIG["city"]
+    if RAW_RETENTION and WEEK > RAW_RETENTION:
+        return {"latest": get_latest(city), "avgDay": avg_since(DAY, city), "avgWeek": avg_since(WEEK, city)}
+    now = time.time()
+    average = {"$group": {"_id": None, "average": {"$avg": "$temperature"}}}
     pipeline = [
-        {"$match": {"timestamp": {"$gte": threshold}}},
-        {"$group": {"_id": None, "avgTemp": {"$avg": "$temperature"}}}
+        {"$match": {"city": city, "timestamp": {"$gte": to_datetime(now - WEEK)}}},
+        {"$facet": {
+            "latest": [{"$sort": {"timestamp": -1}}, {"$limit": 1}],
+            "avgDay": [{"$match": {"timestamp": {"$gte": to_datetime(now - DAY)}}}, average],
+            "avgWeek": [average]
+        }}
     ]
-    return list(collection.aggregate(pipeline))[0]["avgTemp"]
\ No newline at end of file
+    result = next(collection.aggregate(pipeline), {})
+    latest = result.get("latest") or [None]
+    if latest[0] is None:
+        # Sin mediciones en la semana: se informa la última que haya
+        return {"latest": get_latest(city), "avgDay": None, "avgWeek": None}
+    return {
+        "latest": _from_document(latest[0]),
+        "avgDay": (result.get("avgDay") or [{}])[0].get("average"),
+        "avgWeek": (result.get("avgWeek") or [{}])[0].get("average")
+    }
+
+# ---------------------------------------------------
+# EXPORTACIÓN DE HISTÓRICO (paginado por timestamp)
+# ---------------------------------------------------
+HISTORY_PROJECTION = {"_id": 0, "city": 1, "timestamp": 1, **{field: 1 for field in ROLLUP_FIELDS}}
+HISTORY_MAX_PAGE = 10000
+
+
+def get_history(city, start, end, after=None, limit=1000):
+    """
+    Hasta `limit` mediciones crudas de `city` en [start, end) ordenadas por timestamp.
+    `after` es el timestamp del último registro recibido: la página siguiente arranca después de él.
+    """
+    if after is not None:
+        start = max(start, after + 1)
+    limit = max(1, min(limit, HISTORY_MAX_PAGE))
+    cursor = collection.find(
+        {"city": city, "timestamp": {"$gte": to_datetime(start), "$lt": to_datetime(end)}},
+        HISTORY_PROJECTION
+    ).sort("timestamp", ASCENDING).limit(limit).batch_size(min(limit, CONFIG["history_batch_size"]))
+    return [_from_document(document) for document in cursor]
+
+# ---------------------------------------------------
+# ESTADÍSTICAS POR BUCKET EN UNA VENTANA ARBITRARIA
+# ---------------------------------------------------
+BUCKET_UNITS = {"minute": 60, "hour": HOUR, "day": DAY}
+PERCENTILES = CONFIG["stats_percentiles"]
+PERCENTILE_MIN_VERSION = (7, 0)
+_percentiles_supported = None
+
+
+def percentiles_supported():
+    """
+    $percentile existe desde MongoDB 7.0: con un servidor anterior las estadísticas salen sin
+    percentiles (en lugar de fallar la agregación). Se consulta la versión una vez por proceso.
+    """
+    global _percentiles_supported
+    if _percentiles_supported is None:
+        version = mongo.client.server_info().get("version", "0")
+        major_minor = tuple(int(part) for part in version.split(".")[:2] if part.isdigit())
+        _percentiles_supported = major_minor >= PERCENTILE_MIN_VERSION
+        if PERCENTILES and not _percentiles_supported:
+            logger.warning(f"MongoDB {version} no soporta $percentile (requiere 7.0): /weather/stats sin percentiles")
+    return bool(PERCENTILES) and _percentiles_supported
+
+
+def _bucket_start(epoch, bucket_seconds):
+    """
+    Inicio del bucket en segundos epoch, alineado a múltiplos de `bucket_seconds` desde el epoch,
+    la misma regla que normalize_window en weather_metrics. $dateTrunc con binSize cuenta desde
+    2000-01-01, que no coincide para tamaños que no dividen un día (ej: 7h).
+    """
+    return {"$subtract": [epoch, {"$mod": [epoch, bucket_seconds]}]}
+
+
+def _stats_source(start, bucket_seconds):
+    """
+    Nivel del que salen las estadísticas: crudo mientras la ventana esté dentro de la retención,
+    si no el rollup más fino que siga vigente y no sea más fino que el bucket pedido.
+    """
+    now = time.time()
+    if not RAW_RETENTION or start >= now - RAW_RETENTION or bucket_seconds < HOUR:
+        return collection
+    if bucket_seconds < DAY or not HOURLY_RETENTION or start >= now - HOURLY_RETENTION:
+        return hourly_collection
+    return daily_collection
+
+
+def _raw_stats_pipeline(city, start, end, bucket_seconds, fields, percentiles):
+    group = {"_id": _bucket_start(EPOCH_EXPRESSION, bucket_seconds)}
+    for field in fields:
+        group[f"{field}_min"] = {"$min": f"${field}"}
+        group[f"{field}_max"] = {"$max": f"${field}"}
+        group[f"{field}_avg"] = {"$avg": f"${field}"}
+        group[f"{field}_count"] = _value_count(field)
+        if percentiles:
+            group[f"{field}_percentiles"] = {"$percentile": {"input": f"${field}", "p": PERCENTILES, "method": "approximate"}}
+    return [
+        {"$match": {"city": city, "timestamp": {"$gte": to_datetime(start), "$lt": to_datetime(end)}}},
+        {"$group": group},
+        {"$sort": {"_id": 1}}
+    ]
+
+
+def _rollup_stats_pipeline(city, start, end, bucket_seconds, fields):
+    group = {"_id": _bucket_start("$start", bucket_seconds)}
+    for field in fields:
+        group[f"{field}_min"] = {"$min": f"${field}.min"}
+        group[f"{field}_max"] = {"$max": f"${field}.max"}
+        group[f"{field}_sum"] = {"$sum": f"${field}.sum"}
+        group[f"{field}_count"] = {"$sum": f"${field}.count"}
+    return [
+        {"$match": {"city": city, "start": {"$gte": start, "$lt": end}}},
+        {"$group": group},
+        {"$sort": {"_id": 1}}
+    ]
+
+
+def get_stats(city, start, end, unit="hour", bin_size=1, fields=ROLLUP_FIELDS):
+    """
+    Mínimo, máximo, promedio, cantidad y percentiles aproximados de `fields` por bucket
+    de `bin_size` `unit` entre `start` y `end` (epoch), calculados en MongoDB.
+    Los percentiles solo están disponibles cuando se leen mediciones crudas (y con MongoDB 7.0+).
+    """
+    fields = [field for field in fields if field in ROLLUP_FIELDS]
+    bucket_seconds = BUCKET_UNITS[unit] * bin_size
+    source = _stats_source(start, bucket_seconds)
+    percentiles = source is collection and percentiles_supported()
+    if source is collection:
+        pipeline = _raw_stats_pipeline(city, start, end, bucket_seconds, fields, percentiles)
+    else:
+        pipeline = _rollup_stats_pipeline(city, start, end, bucket_seconds, fields)
+
+    buckets = []
+    for group in source.aggregate(pipeline, allowDiskUse=True):
+        bucket = {"start": int(group["_id"])}
+        for field in fields:
+            count = group[f"{field}_count"]
+            stats = {"min": group[f"{field}_min"], "max": group[f"{field}_max"], "count": count}
+            if source is collection:
+                stats["avg"] = group[f"{field}_avg"]
+                values = group.get(f"{field}_percentiles") or [None] * len(PERCENTILES)
+                stats["percentiles"] = {f"p{p * 100:g}": value for p, value in zip(PERCENTILES, values)} if percentiles else None
+            else:
+                stats["avg"] = group[f"{field}_sum"] / count if count else None
+                stats["percentiles"] = None
+            bucket[field] = stats
+        buckets.append(bucket)
+    return buckets
+
+# ---------------------------------------------------
+# BACKFILL DE ROLLUPS A PARTIR DE LAS MEDICIONES CRUDAS
+# ---------------------------------------------------
+def rebuild_rollups(source=None):
+    """
+    Reconstruye los buckets horarios y diarios desde `source` (default: la colección de mediciones).
+    Sobre la colección con retención solo se reemplazan los buckets que empiezan después de
+    now - RAW_RETENTION: los anteriores ya perdieron mediciones por el TTL y reconstruirlos los
+    dejaría con sumas parciales, sin forma de recuperar las que ya vencieron.
+    """
+    since = None
+    if source is None and RAW_RETENTION:
+        since = time.time() - RAW_RETENTION
+    source = source if source is not None else collection
+    for rollup, size in ((hourly_collection, HOUR), (daily_collection, DAY)):
+        match = []
+        if since is not None:
+            first_bucket = math.ceil(since / size) * size
+            match = [{"$match": {"$or": [
+                {"timestamp": {"$gte": to_datetime(first_bucket)}},
+                {"timestamp": {"$gte": first_bucket}}
+            ]}}]
+        group = {"_id": {
+            "city": "$city",
+            "start": {"$subtract": ["$epoch", {"$mod": ["$epoch", size]}]}
+        }}
+        for field in ROLLUP_FIELDS:
+            group[f"{field}_sum"] = {"$sum": f"${field}"}
+            group[f"{field}_count"] = _value_count(field)
+            group[f"{field}_min"] = {"$min": f"${field}"}
+            group[f"{field}_max"] = {"$max": f"${field}"}
+        project = {
+            "_id": 0,
+            "city": "$_id.city",
+            "start": "$_id.start",
+            "date": {"$toDate": {"$multiply": ["$_id.start", 1000]}}
+        }
+        for field in ROLLUP_FIELDS:
+            project[field] = {
+                "sum": f"${field}_sum",
+                "count": f"${field}_count",
+                "min": f"${field}_min",
+                "max": f"${field}_max"
+            }
+        pipeline = match + [
+            {"$addFields": {"epoch": EPOCH_EXPRESSION}},
+            {"$group": group},
+            {"$project": project},
+            {"$merge": {"into": rollup.name, "on": ["city", "start"], "whenMatched": "replace", "whenNotMatched": "insert"}}
+        ]
+        source.aggregate(pipeline, allowDiskUse=True)
+        logger.info(f"Rollup {rollup.name} reconstruido ({rollup.estimated_document_count()} buckets)")
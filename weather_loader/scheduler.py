@@ -1,28 +1,56 @@
-import schedule
 import time
-from weather_client import fetch_weather
-from repository import save_weather_data
-from config import CONFIG
+from prometheus_client import Counter
 from logger import get_logger
-from logging_ag import log_to_opensearch
 
 logger = get_logger("Scheduler")
 
-def job():
-    try:
-        data = fetch_weather()
-        save_weather_data(data)
-    except Exception as e:
-        logger.error(f"Failed to load weather data: {e}")
-        log_to_opensearch(f"Failed to load weather data: {e}", "ERROR")
+PROVIDER_POLLS = Counter(
+    'weather_loader_provider_polls',
+    'Consultas al proveedor por ciudad (fetched = medición nueva, unchanged = mismo dt que la anterior, skipped = no se consultó)',
+    ['result']
+)
 
-def start():
-    interval = CONFIG["interval_minutes"]
-    schedule.every(interval).minutes.do(job)
-    logger.info(f"Scheduler started. Running every {interval} minutes.")
-    log_to_opensearch(f"Scheduler started. Running every {interval} minutes.", "INFO")
 
+# ---------------------------------------------------
+# POLLING ADAPTATIVO SEGÚN EL `dt` DEL PROVEEDOR
+# ---------------------------------------------------
+class ProviderPolling:
+    """
+    Recuerda el `dt` (momento de la observación) de la última medición de cada ciudad.
+    El proveedor publica una observación nueva cada `update_seconds`: antes de `dt + update_seconds`
+    consultarlo devolvería la misma medición, así que la ciudad no se consulta.
+    Si una consulta devuelve el mismo `dt`, la próxima se corre `update_seconds` desde ahora.
+    """
 
-    while True:
-        schedule.run_pending()
-        time.sleep(1)
+    def __init__(self, update_seconds=600, clock=time.time):
+        self.update_seconds = update_seconds
+        self.clock = clock
+        self._next_poll = {}  # city -> epoch desde el que puede haber una observación nueva
+        self._last_dt = {}
+
+    def due(self, city):
+        return self.clock() >= self._next_poll.get(city, 0)
+
+    def plan(self, cities):
+        """
+        Ciudades a consultar ahora; las demás se cuentan como skipped.
+        """
+        due = [city for city in cities if self.due(city)]
+        PROVIDER_POLLS.labels(result="skipped").inc(len(cities) - len(due))
+        return due
+
+    def observe(self, city, dt):
+        """
+        Registra el `dt` devuelto por el proveedor. Devuelve False si no avanzó.
+        """
+        last = self._last_dt.get(city)
+        advanced = last is None or dt > last
+        if advanced:
+            self._last_dt[city] = dt
+            self._next_poll[city] = dt + self.update_seconds
+            PROVIDER_POLLS.labels(result="fetched").inc()
+        else:
+            self._next_poll[city] = self.clock() + self.update_seconds
+            PROVIDER_POLLS.labels(result="unchanged").inc()
+            logger.info(f"{city}: el proveedor no tiene una observación nueva (dt={dt})")
+        return advanced
@@ -0,0 +1,19 @@
+from typing import Optional
+from pydantic import BaseModel
+
+
+# ---------------------------------------------------
+# RESPUESTAS TIPADAS DE LOS MÉTODOS RPC
+# ---------------------------------------------------
+class CurrentWeather(BaseModel):
+    temperature: float
+    humidity: int
+    pressure: int
+    timestamp: int
+    datetime: str
+
+
+class WeatherSnapshot(BaseModel):
+    current: CurrentWeather
+    avgDay: Optional[float] = None
+    avgWeek: Optional[float] = None
@@ -0,0 +1,81 @@
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from prometheus_client import Counter, Histogram
+
+
+# ---------------------------------------------------
+# LATENCIA POR ETAPA
+# ---------------------------------------------------
+# Mismo nombre en weather_loader y weather_metrics: se distinguen por el job de Prometheus
+STAGE_LATENCY = Histogram(
+    'weather_stage_latency_seconds',
+    'Latencia de cada etapa de un request (rpc_connect, rpc_wait, rpc_call, rpc_handler, mongo, mongo_wait, upstream_fetch, log_ship)',
+    ['stage', 'operation'],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+)
+STAGE_RETRIES = Counter(
+    'weather_stage_retries',
+    'Reintentos de una etapa (ej: upstream_fetch a un proveedor)',
+    ['stage', 'operation']
+)
+
+
+@contextmanager
+def stage(name, operation):
+    """
+    Mide el bloque como la etapa `name` / `operation`, también si termina con excepción.
+    Sirve en código sync y async (no hace await).
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_LATENCY.labels(stage=name, operation=operation).observe(time.perf_counter() - start)
+
+
+# ---------------------------------------------------
+# TRACE ID DEL REQUEST
+# ---------------------------------------------------
+# Lo asigna weather_metrics por request HTTP (header X-Trace-Id), viaja como argumento `trace_id`
+# de las llamadas RPC y se agrega a los logs enviados a OpenSearch de ambos servicios.
+TRACE_HEADER = "x-trace-id"
+_trace_id = ContextVar("trace_id", default=None)
+
+
+def new_trace_id():
+    return uuid.uuid4().hex
+
+
+def current_trace_id():
+    return _trace_id.get()
+
+
+def set_trace_id(trace_id):
+    """
+    Devuelve el token para restaurar el trace id anterior con reset_trace_id.
+    """
+    return _trace_id.set(trace_id)
+
+
+def reset_trace_id(token):
+    _trace_id.reset(token)
+
+
+def traced_rpc(method):
+    """
+    Decorador de métodos RPC: toma el `trace_id` que manda el cliente (opcional) y mide el
+    método como la etapa rpc_handler. Mantiene la firma (y el tipo de retorno) del método.
+    """
+    @wraps(method)
+    async def wrapper(self, *args, trace_id=None, **kwargs):
+        token = set_trace_id(trace_id or new_trace_id())
+        try:
+            with stage("rpc_handler", method.__name__):
+                return await method(self, *args, **kwargs)
+        finally:
+            reset_trace_id(token)
+
+    return wrapper
@@ -1,37 +1,181 @@
+import asyncio
+import time
 from fastapi import HTTPException
-import requests
-from tenacity import retry, retry_if_exception_type, wait_fixed, stop_after_attempt
+import httpx
+from tenacity import AsyncRetrying, retry_if_exception_type, wait_fixed, stop_after_attempt
 from config import CONFIG
 from logger import get_logger
-import pybreaker
+from circuit_breaker import AsyncCircuitBreaker
 from logging_ag import log_to_opensearch
+from tracing import STAGE_RETRIES, stage
 
 
 logger = get_logger("WeatherClient")
-circuit_breaker = pybreaker.CircuitBreaker(fail_max=3, reset_timeout=60)
 
-@circuit_breaker
-@retry(wait=wait_fixed(5), stop=stop_after_attempt(3),retry=retry_if_exception_type(Exception))
-def fetch_weather():
-    try:
-        city = CONFIG["city"]
-        api_key = CONFIG["api_key"]
-        url = f"https://api.openweathermap.org/data/2.5/weather?q={city}&appid={api_key}&units=metric"
+OPENWEATHER_PATH = "/data/2.5/weather"
+OPENWEATHER_HISTORY_PATH = "/data/2.5/history/city"
+HISTORY_WINDOW = 7 * 24 * 3600  # máximo rango por request del API de histórico
 
-        response = requests.get(url, timeout=10)
+
+# ---------------------------------------------------
+# RATE LIMITER (TOKEN BUCKET) POR PROVEEDOR
+# ---------------------------------------------------
+class RateLimiter:
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+# ---------------------------------------------------
+# CLIENTE OPENWEATHER
+# ---------------------------------------------------
+class OpenWeatherClient:
+    """
+    Cliente async de OpenWeather con conexiones HTTP reutilizadas (httpx),
+    límite de requests por segundo y de requests concurrentes,
+    y un circuit breaker por ciudad (una ciudad fallando no corta al resto).
+    La política de reintentos y de breaker es configurable para poder medirla contra el simulador.
+    """
+
+    def __init__(self, api_key, base_url, max_concurrency=10, rate_per_second=1, burst=10, timeout=10,
+                 retry_attempts=3, retry_wait=5, breaker_fail_max=3, breaker_reset_timeout=60, history_base_url=None):
+        self.api_key = api_key
+        self.url = f"{base_url}{OPENWEATHER_PATH}"
+        self.history_url = f"{history_base_url or base_url}{OPENWEATHER_HISTORY_PATH}"
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.retry_attempts = retry_attempts
+        self.retry_wait = retry_wait
+        self.breaker_fail_max = breaker_fail_max
+        self.breaker_reset_timeout = breaker_reset_timeout
+        self.rate_limiter = RateLimiter(rate_per_second, burst)
+        self.breakers = {}
+        self._semaphore = None
+        self._client = None
+
+    async def start(self):
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._client = httpx.AsyncClient(
+            timeout=self.timeout,
+            limits=httpx.Limits(max_connections=self.max_concurrency, max_keepalive_connections=self.max_concurrency)
+        )
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def breaker(self, city):
+        if city not in self.breakers:
+            self.breakers[city] = AsyncCircuitBreaker(
+                fail_max=self.breaker_fail_max,
+                reset_timeout=self.breaker_reset_timeout,
+                name=city
+            )
+        return self.breakers[city]
+
+    async def fetch(self, city):
+        return await self.breaker(city).call_coroutine(self._fetch_with_retry, city)
+
+    async def fetch_many(self, cities):
+        """
+        Devuelve una lista alineada con `cities`: la medición o la excepción de esa ciudad.
+        """
+        return await asyncio.gather(*(self.fetch(city) for city in cities), return_exceptions=True)
+
+    async def fetch_history(self, city, start, end):
+        """
+        Mediciones por hora de `city` entre `start` y `end` (epoch) del API de histórico, de a una
+        ventana: el proveedor devuelve a lo sumo una semana por request.
+        Sin breaker: es para importaciones (import_history.py), no para el camino de las requests.
+        """
+        for window_start in range(start, end, HISTORY_WINDOW):
+            window_end = min(window_start + HISTORY_WINDOW, end)
+            retrying = AsyncRetrying(
+                wait=wait_fixed(self.retry_wait),
+                stop=stop_after_attempt(self.retry_attempts),
+                retry=retry_if_exception_type(Exception),
+                reraise=True,
+                before_sleep=lambda _: STAGE_RETRIES.labels(stage="upstream_fetch", operation="openweather_history").inc()
+            )
+            yield await retrying(self._fetch_history_once, city, window_start, window_end)
+
+    async def _fetch_history_once(self, city, start, end):
+        async with self._semaphore:
+            await self.rate_limiter.acquire()
+            params = {"q": city, "type": "hour", "start": start, "end": end, "appid": self.api_key, "units": "metric"}
+            with stage("upstream_fetch", "openweather_history"):
+                response = await self._client.get(self.history_url, params=params)
         response.raise_for_status()
+        return [
+            {
+                "city": city,
+                "timestamp": point["dt"],
+                "temperature": point["main"]["temp"],
+                "humidity": point["main"]["humidity"],
+                "pressure": point["main"]["pressure"]
+            }
+            for point in response.json().get("list", [])
+        ]
+
+    async def _fetch_with_retry(self, city):
+        retrying = AsyncRetrying(
+            wait=wait_fixed(self.retry_wait),
+            stop=stop_after_attempt(self.retry_attempts),
+            retry=retry_if_exception_type(Exception),
+            before_sleep=lambda _: STAGE_RETRIES.labels(stage="upstream_fetch", operation="openweather").inc()
+        )
+        return await retrying(self._fetch_once, city)
+
+    async def _fetch_once(self, city):
+        try:
+            async with self._semaphore:
+                await self.rate_limiter.acquire()
+                params = {"q": city, "appid": self.api_key, "units": "metric"}
+                # Solo el request HTTP: la espera del rate limiter y del semáforo no cuentan
+                with stage("upstream_fetch", "openweather"):
+                    response = await self._client.get(self.url, params=params)
+            response.raise_for_status()
+
+            data = response.json()
+            logger.info(f"Fetched weather data for {city}: {data['main']}")
+            log_to_opensearch(f"Fetched weather data for {city}: {data['main']}", "INFO")
+            return {
+                "city": city,
+                "timestamp": data["dt"],
+                "temperature": data["main"]["temp"],
+                "humidity": data["main"]["humidity"],
+                "pressure": data["main"]["pressure"]
+            }
+        except Exception as e:
+            log_to_opensearch(f"errror de conexion {city}: {e}", "ERROR")
+            raise HTTPException(status_code=502, detail=f"Error de conexión: {str(e)}")
 
 
-        data = response.json()
-        logger.info(f"Fetched weather data for {city}: {data['main']}")
-        log_to_opensearch(f"Fetched weather data for {city}: {data['main']}", "INFO")
-        return {
-            "city": city,
-            "timestamp": data["dt"],
-            "temperature": data["main"]["temp"],
-            "humidity": data["main"]["humidity"],
-            "pressure": data["main"]["pressure"]
-        }
-    except Exception as e:
-        log_to_opensearch("errror de conexion {e}", "ERROR")
-        raise HTTPException(status_code=502, detail=f"Error de conexión: {str(e)}")
\ No newline at end of file
+weather_provider = OpenWeatherClient(
+    CONFIG["api_key"],
+    CONFIG["openweather_base_url"],
+    max_concurrency=CONFIG["openweather_max_concurrency"],
+    rate_per_second=CONFIG["openweather_rate_limit"],
+    burst=CONFIG["openweather_burst"],
+    timeout=CONFIG["openweather_timeout"],
+    retry_attempts=CONFIG["openweather_retry_attempts"],
+    retry_wait=CONFIG["openweather_retry_wait"],
+    breaker_fail_max=CONFIG["openweather_breaker_fail_max"],
+    breaker_reset_timeout=CONFIG["openweather_breaker_reset_timeout"],
+    history_base_url=CONFIG["openweather_history_base_url"]
+)
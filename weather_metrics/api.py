@@ -1,23 +1,35 @@
 # weather_metrics/api.py
 
+import asyncio
 from datetime import datetime
-import json
+import os
 import time
 import logging
-from functools import wraps
-import pytz
-import requests
-from fastapi import FastAPI, HTTPException, Response
+from typing import Dict, List, Optional
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from fastapi_websocket_rpc.simplewebsocket import JsonSerializingWebSocket
 import pybreaker
 from pydantic import BaseModel
-from prometheus_client import Counter, Histogram, generate_latest, CONTENT_TYPE_LATEST
-from starlette.middleware.base import BaseHTTPMiddleware
-from hard_metrics.hardware import update_memory_metrics, update_cpu_metrics, update_disk_metrics, update_cpu_temperature 
+from prometheus_client import REGISTRY, CollectorRegistry, Histogram, generate_latest, multiprocess, CONTENT_TYPE_LATEST
+from hard_metrics.hardware import HardwareSampler
 from business_metrics.bussines_metrics import weather_average_day, weather_average_week, weather_current_temperature, weather_current_humidity, weather_current_pressure, weather_current_timestamp
 from logging_ag import log_to_opensearch
-from fastapi_websocket_rpc import RpcMethodsBase, WebSocketRpcClient
-import asyncio
-from tenacity import RetryError, retry_if_exception_type, wait_fixed, stop_after_attempt
+from rpc_pool import RpcConnectionPool
+from middleware import MetricsMiddleware
+from rpc_serialization import MsgpackSerializingWebSocket
+from circuit_breaker import AsyncCircuitBreaker, CircuitSharedStorage
+from shared_state import shared_store
+from cache import ttl_cache
+from snapshot import SnapshotStore, SnapshotSubscriber
+from fallback import LastKnownGood, WeatherstackFallback
+from stats import STATS_FIELDS, parse_bucket, parse_fields, normalize_window
+from history import MEDIA_TYPES, iter_pages, encode_pages, gzip_stream
+from http_cache import etag_for, max_age, conditional
+from profiler import SamplingProfiler
+from health import Startup
+from contextlib import asynccontextmanager
+from tenacity import RetryError
 
 from config import CONFIG
 
@@ -25,13 +37,14 @@ from config import CONFIG
 PORT = 8001
 HOST = "weather_loader"
 
-circuit_breaker = pybreaker.CircuitBreaker(fail_max=2, reset_timeout=60)
+# Con varios workers el estado del breaker se comparte: se abre una vez para todo el servicio
+circuit_breaker = AsyncCircuitBreaker(
+    fail_max=CONFIG["rpc_breaker_fail_max"],
+    reset_timeout=CONFIG["rpc_breaker_reset_timeout"],
+    state_storage=CircuitSharedStorage(shared_store, "weather_loader_rpc") if shared_store is not None else None
+)
 
 
-RETRY_CONFIG = {
-    'wait':wait_fixed(3), 'stop':stop_after_attempt(2),'retry':retry_if_exception_type(Exception)
-}
-
 # ---------------------------------------------------
 # CONFIGURACIÓN DE LOGGING
 # ---------------------------------------------------
@@ -41,69 +54,153 @@ logging.basicConfig(
 )
 
 # ---------------------------------------------------
-# AISLAMOS EN METODOS PARA IMPLEMENTAR PYBREAKER
+# POOL DE CONEXIONES RPC HACIA weather_loader
 # ---------------------------------------------------
-@circuit_breaker
-def rpc_call_current():
-    return asyncio.run(get_current(f"ws://{HOST}:{PORT}/ws"))
-@circuit_breaker
-def rpc_call_avg_day():
-    return asyncio.run(get_avg_day(f"ws://{HOST}:{PORT}/ws"))
-@circuit_breaker
-def rpc_call_avg_week():
-    return asyncio.run(get_avg_week(f"ws://{HOST}:{PORT}/ws"))
+# Codificación de los mensajes RPC: ruta del endpoint de weather_loader y serializador
+RPC_ENCODINGS = {
+    "json": ("/ws", JsonSerializingWebSocket),
+    "msgpack": ("/ws/msgpack", MsgpackSerializingWebSocket)
+}
+RPC_PATH, RPC_SERIALIZER = RPC_ENCODINGS[CONFIG["rpc_encoding"]]
+
+rpc_pool = RpcConnectionPool(
+    size=CONFIG["rpc_pool_size"],
+    call_timeout=CONFIG["rpc_call_timeout"],
+    health_interval=CONFIG["rpc_health_interval"],
+    backoff_max=CONFIG["rpc_backoff_max"],
+    serializing_socket_cls=RPC_SERIALIZER
+)
+hardware_sampler = HardwareSampler(interval=CONFIG["hardware_sample_interval"])
 
 # ---------------------------------------------------
-# METODOS RPC CLIENT
+# SNAPSHOT PUBLICADO POR weather_loader (PUSH)
 # ---------------------------------------------------
-async def get_current(uri):
-    async with WebSocketRpcClient(uri,RpcMethodsBase(),RETRY_CONFIG) as client:
-        response = await client.other.getCurrent()
-        return response.result
-    
-async def get_avg_day(uri):
-    async with WebSocketRpcClient(uri,RpcMethodsBase(),RETRY_CONFIG) as client:
-        response = await client.other.avgDay()
-        return response.result
-    
-async def get_avg_week(uri):
-    async with WebSocketRpcClient(uri,RpcMethodsBase(),RETRY_CONFIG) as client:
-        response = await client.other.avgWeek()
-        return response.result
-    
+snapshot_store = SnapshotStore(max_age=CONFIG["snapshot_max_age"])
+snapshot_subscriber = SnapshotSubscriber(
+    snapshot_store,
+    call_timeout=CONFIG["rpc_call_timeout"],
+    backoff_max=CONFIG["rpc_backoff_max"],
+    serializing_socket_cls=RPC_SERIALIZER
+)
+
 # ---------------------------------------------------
-# DECORADOR DE CACHE EN MEMORIA CON TTL
+# FALLBACK A WEATHERSTACK CON EL BREAKER ABIERTO
 # ---------------------------------------------------
-def ttl_cache(seconds: int):
-    cache = {}  # key -> (result, timestamp)
+last_known_good = LastKnownGood(max_age=CONFIG["fallback_last_known_good_max_age"])
+weatherstack_fallback = WeatherstackFallback(
+    CONFIG["weatherstack_base_url"],
+    CONFIG["weatherstack_key"],
+    last_known_good,
+    timeout=CONFIG["weatherstack_timeout"],
+    ttl=CONFIG["fallback_cache_ttl"],
+    max_size=CONFIG["cache_max_size"],
+    hedge_budget=CONFIG["fallback_hedge_budget"],
+    max_connections=CONFIG["weatherstack_pool_size"]
+)
 
-    def decorator(func):
-        logger = logging.getLogger("cache")
-        logger.setLevel(logging.DEBUG)
+# ---------------------------------------------------
+# AISLAMOS EN METODOS PARA IMPLEMENTAR PYBREAKER
+# ---------------------------------------------------
+@circuit_breaker
+async def rpc_call_current(city):
+    return await rpc_pool.call("getCurrent", city=city)
+@circuit_breaker
+async def rpc_call_avg_day(city):
+    return await rpc_pool.call("avgDay", city=city)
+@circuit_breaker
+async def rpc_call_avg_week(city):
+    return await rpc_pool.call("avgWeek", city=city)
+@circuit_breaker
+async def rpc_call_snapshot(city):
+    return await rpc_pool.call("getSnapshot", city=city)
+@circuit_breaker
+async def rpc_call_history(city, start, end, after, limit):
+    return await rpc_pool.call("getHistory", city=city, start=start, end=end, after=after, limit=limit)
+@circuit_breaker
+async def rpc_call_stats(city, start, end, unit, bin_size, fields):
+    return await rpc_pool.call("getStats", city=city, start=start, end=end, unit=unit, bin_size=bin_size, fields=list(fields))
 
-        @wraps(func)
-        def wrapper(*args, **kwargs):
-            key = (func.__name__, args, tuple(sorted(kwargs.items())))
-            entry = cache.get(key)
-            now = time.time()
+# ---------------------------------------------------
+# CONSULTAS CACHEADAS (single-flight + stale-while-revalidate)
+# ---------------------------------------------------
+CACHE_OPTIONS = {
+    "stale_seconds": CONFIG["cache_stale_seconds"],
+    "max_size": CONFIG["cache_max_size"]
+}
 
-            if entry and (now - entry[1] < seconds):
-                logger.debug(f"CACHE HIT  {func.__name__} args={key}")
-                return entry[0]
+@ttl_cache(seconds=CONFIG["cache_ttl_current"], **CACHE_OPTIONS)
+async def cached_current(city):
+    return await rpc_call_current(city)
+@ttl_cache(seconds=60, **CACHE_OPTIONS)
+async def cached_avg_day(city):
+    return await rpc_call_avg_day(city)
+@ttl_cache(seconds=300, **CACHE_OPTIONS)
+async def cached_avg_week(city):
+    return await rpc_call_avg_week(city)
+@ttl_cache(seconds=CONFIG["cache_ttl_summary"], **CACHE_OPTIONS)
+async def cached_summary(city):
+    return await rpc_call_snapshot(city)
+# Ventanas que incluyen el presente cambian con cada medición; las cerradas ya no cambian
+@ttl_cache(seconds=CONFIG["cache_ttl_stats"], **CACHE_OPTIONS)
+async def cached_stats(city, start, end, unit, bin_size, fields):
+    return await rpc_call_stats(city, start, end, unit, bin_size, fields)
+@ttl_cache(seconds=CONFIG["cache_ttl_stats_closed"], **CACHE_OPTIONS)
+async def cached_stats_closed(city, start, end, unit, bin_size, fields):
+    return await rpc_call_stats(city, start, end, unit, bin_size, fields)
 
-            logger.debug(f"CACHE MISS {func.__name__} args={key}")
-            result = func(*args, **kwargs)
-            cache[key] = (result, now)
-            return result
+# ---------------------------------------------------
+# WARM-UP: CACHE CARGADO ANTES DE ESTAR LISTO
+# ---------------------------------------------------
+startup = Startup()
 
-        return wrapper
+async def warm_city(city):
+    current, *_ = await asyncio.gather(
+        cached_current(city), cached_avg_day(city), cached_avg_week(city), cached_summary(city)
+    )
+    if current:
+        last_known_good.update(city, current)
 
-    return decorator
+async def startup_steps(state):
+    """
+    Espera (hasta WARMUP_TIMEOUT) la conexión con weather_loader y el snapshot inicial de la
+    suscripción, y carga en el cache la medición actual y los promedios de WARMUP_CITIES.
+    Sin weather_loader igual queda listo: responde con el fallback.
+    """
+    deadline = time.monotonic() + CONFIG["warmup_timeout"]
+    connected = await rpc_pool.wait_connected(CONFIG["warmup_timeout"])
+    state.checks["rpc_pool"] = f"{connected}/{rpc_pool.size} conexiones"
+    if not connected:
+        state.checks["warmup"] = "omitido: weather_loader no disponible"
+        return
+    while not snapshot_store.live and time.monotonic() < deadline:
+        await asyncio.sleep(0.1)
+    state.checks["snapshot"] = "live" if snapshot_store.live else "no disponible"
+    results = await asyncio.gather(*(warm_city(city) for city in CONFIG["warmup_cities"]), return_exceptions=True)
+    errors = {city: repr(result) for city, result in zip(CONFIG["warmup_cities"], results) if isinstance(result, Exception)}
+    state.checks["warmup"] = errors or f"{len(results)} ciudades"
 
 # ---------------------------------------------------
 # CREACIÓN DE LA APP
 # ---------------------------------------------------
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    mark_dead_workers()
+    await weatherstack_fallback.start()
+    hardware_sampler.start()
+    await rpc_pool.start(f"ws://{HOST}:{PORT}{RPC_PATH}")
+    await snapshot_subscriber.start(f"ws://{HOST}:{PORT}{RPC_PATH}")
+    startup.start(startup_steps)
+    yield
+    await startup.stop()
+    await snapshot_subscriber.close()
+    await rpc_pool.close()
+    await weatherstack_fallback.close()
+    hardware_sampler.stop()
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        multiprocess.mark_process_dead(os.getpid())
+
 app = FastAPI(
+    lifespan=lifespan,
     title="Weather Metrics API",
     version="1.0.0",
     description="API para consultar métricas de temperatura con observabilidad Prometheus"
@@ -121,71 +218,40 @@ class CurrentResponse(BaseModel):
 class AverageResponse(BaseModel):
     average: float
 
+class SummaryResponse(BaseModel):
+    current: CurrentResponse
+    avgDay: Optional[float]
+    avgWeek: Optional[float]
+
+class FieldStats(BaseModel):
+    min: Optional[float]
+    max: Optional[float]
+    avg: Optional[float]
+    count: int
+    percentiles: Optional[Dict[str, Optional[float]]] = None
+
+class StatsBucket(BaseModel):
+    start: int
+    temperature: Optional[FieldStats] = None
+    humidity: Optional[FieldStats] = None
+    pressure: Optional[FieldStats] = None
+
+class StatsResponse(BaseModel):
+    city: str
+    start: int
+    end: int
+    bucket: str
+    buckets: List[StatsBucket]
+
 # ---------------------------------------------------
 # MÉTRICAS Prometheus
 # ---------------------------------------------------
-REQUEST_COUNT = Counter(
-    'weather_api_request_count',
-    'Contador de peticiones HTTP',
-    ['method', 'endpoint', 'http_status']
-)
-REQUEST_LATENCY = Histogram(
-    'weather_api_request_latency_seconds',
-    'Latencia de peticiones en segundos',
-    ['method', 'endpoint']
+SUMMARY_LATENCY = Histogram(
+    'weather_summary_latency_seconds',
+    'Latencia de armado del resumen según el origen de los datos',
+    ['source']
 )
 
-REQUEST_COUNT_ERROR = Counter(
-    'weather_api_request_count_failed',
-    'Contador de peticiones HTTP fallidas (errores 500 u otros)',
-    ['method', 'endpoint', 'http_status']
-)
-
-# ---------------------------------------------------
-# MIDDLEWARE PARA INSTRUMENTACIÓN
-# ---------------------------------------------------
-class MetricsMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request, call_next):
-        start = time.time()
-        response = None 
-        try:
-            response = await call_next(request)
-            elapsed = time.time() - start
-
-            # Registrar latencia
-            REQUEST_LATENCY.labels(
-                method=request.method,
-                endpoint=request.url.path
-            ).observe(elapsed)
-
-            # Contar la petición
-            REQUEST_COUNT.labels(
-                method=request.method,
-                endpoint=request.url.path,
-                http_status=response.status_code
-            ).inc()
-            if(response.status_code != 200 or response.status_code != 202):
-                REQUEST_COUNT_ERROR.labels(                
-                method=request.method,
-                endpoint=request.url.path,
-                http_status= "500" if (response == None) else response.status_code
-                ).inc()            
-        except Exception as e:
-            log_to_opensearch(f"ERROR -> {e}",  "ERROR")
-            elapsed = time.time() - start
-            # Registrar latencia
-            REQUEST_LATENCY.labels(
-                method=request.method,
-                endpoint=request.url.path
-            ).observe(elapsed)
-
-            REQUEST_COUNT_ERROR.labels(                
-                method=request.method,
-                endpoint=request.url.path,
-                http_status= "500" if (response == None) else response.status_code
-                ).inc()
-        return response
-
 app.add_middleware(MetricsMiddleware)
 
 # ---------------------------------------------------
@@ -197,41 +263,39 @@ app.add_middleware(MetricsMiddleware)
     summary="Temperatura actual",
     description="Devuelve la última medición de temperatura, humedad y presión."
 )
-def current():
-    log_to_opensearch(f"================ consulta current ==================",  "INFO")    
+async def current(request: Request, response: Response, city: Optional[str] = None):
+    log_to_opensearch(f"================ consulta current ==================",  "INFO")
+    city = city or CONFIG["city"]
     parsed_response = None
     try:
-        doc = rpc_call_current()
-        if not doc:
-           log_to_opensearch(f"404  - No hay datos de clima disponibles aún",  "ERROR")                   
-           raise HTTPException(status_code=404, detail="No hay datos de clima disponibles aún")
-        json_acceptable_string = doc.replace("'", "\"")
-        parsed_response = json.loads(json_acceptable_string)
-        weather_current_temperature.set(parsed_response["temperature"])
-        weather_current_humidity.set(parsed_response["humidity"])
-        weather_current_pressure.set(parsed_response["pressure"])
-    except pybreaker.CircuitBreakerError:
-        city = CONFIG["city"]
-        api_key = CONFIG["weatherstack_key"]
-        gmt_timezone = pytz.timezone("America/Buenos_Aires")
-        url = f"http://api.weatherstack.com/current?query={city}&access_key={api_key}&units=m"
-        response = requests.get(url, timeout=10)
-        if(response.status_code == 200):
-            data = response.json()
-            weather_date = datetime.now().astimezone(gmt_timezone)
-            parsed_response = {
-                "temperature": data["current"]["temperature"],
-                "humidity": data["current"]["humidity"],
-                "pressure": data["current"]["pressure"],
-                "datetime": weather_date.strftime("%Y-%m-%d %H:%M:%S")
-            }
+        snapshot = snapshot_store.get(city)
+        if snapshot is not None:
+            parsed_response = snapshot["current"]
         else:
+            parsed_response = await cached_current(city)
+            if not parsed_response:
+               log_to_opensearch(f"404  - No hay datos de clima disponibles aún",  "ERROR")
+               raise HTTPException(status_code=404, detail="No hay datos de clima disponibles aún")
+        last_known_good.update(city, parsed_response)
+        if city == CONFIG["city"]:
+            weather_current_temperature.set(parsed_response["temperature"])
+            weather_current_humidity.set(parsed_response["humidity"])
+            weather_current_pressure.set(parsed_response["pressure"])
+    except pybreaker.CircuitBreakerError:
+        try:
+            parsed_response = await weatherstack_fallback.current(city)
+        except Exception as e:
+            log_to_opensearch(f"503  - Fallback a weatherstack falló: {e!r}",  "ERROR")
             raise HTTPException(status_code=503, detail="Servicio temporalmente fuera de servicio")
+    except HTTPException:
+        raise
     except RetryError:
         raise HTTPException(status_code=502, detail="Servicio no responde. Vuelva a intentar.")
     except Exception as e:
         raise HTTPException(status_code=502, detail=f"Error de conexión: {str(e)}")
-    return parsed_response
+    timestamp = parsed_response.get("timestamp")
+    etag = etag_for("current", city, timestamp, parsed_response)
+    return conditional(request, response, etag, max_age(cached_current.cache.seconds, timestamp)) or parsed_response
 
 
 @app.get(
@@ -240,23 +304,31 @@ def current():
     summary="Promedio de temperatura últimas 24 horas",
     description="Devuelve la temperatura media del último día."
 )
-@ttl_cache(seconds=60)
-def avg_day():
+async def avg_day(request: Request, response: Response, city: Optional[str] = None):
     log_to_opensearch(f"================ consulta avg_day ==================",  "INFO")
     avg = None
+    snapshot = None
     try:
-        avg = rpc_call_avg_day()
-        weather_average_day.set(avg)
+        city = city or CONFIG["city"]
+        snapshot = snapshot_store.get(city)
+        avg = snapshot["avgDay"] if snapshot is not None else await cached_avg_day(city)
         if avg is None:
-            log_to_opensearch(f"404  - No hay datos de las últimas 24 horas",  "ERROR")                              
+            log_to_opensearch(f"404  - No hay datos de las últimas 24 horas",  "ERROR")
             raise HTTPException(status_code=404, detail="No hay datos de las últimas 24 horas")
+        if city == CONFIG["city"]:
+            weather_average_day.set(avg)
+    except HTTPException:
+        raise
     except pybreaker.CircuitBreakerError:
         raise HTTPException(status_code=503, detail="Servicio temporalmente fuera de servicio")
     except RetryError:
         raise HTTPException(status_code=502, detail="Servicio no responde. Vuelva a intentar.")
     except Exception as e:
         raise HTTPException(status_code=502, detail=f"Error de conexión: {str(e)}")
-    return {"average": avg}
+    body = {"average": avg}
+    timestamp = snapshot["current"]["timestamp"] if snapshot is not None else None
+    etag = etag_for("avg-day", city, timestamp, body)
+    return conditional(request, response, etag, max_age(cached_avg_day.cache.seconds, timestamp)) or body
 
 @app.get(
     "/weather/average/week",
@@ -264,39 +336,242 @@ def avg_day():
     summary="Promedio de temperatura última semana",
     description="Devuelve la temperatura media de los últimos 7 días."
 )
-@ttl_cache(seconds=300)
-def avg_week():
+async def avg_week(request: Request, response: Response, city: Optional[str] = None):
 
     log_to_opensearch(f"================ consulta avg_week ==================",  "INFO")
     avg = None
+    snapshot = None
     try:
-        avg = rpc_call_avg_week()
-        weather_average_week.set(avg)        
+        city = city or CONFIG["city"]
+        snapshot = snapshot_store.get(city)
+        avg = snapshot["avgWeek"] if snapshot is not None else await cached_avg_week(city)
         if avg is None:
+            log_to_opensearch(f"404  - No hay datos de la última semana",  "ERROR")
             raise HTTPException(status_code=404, detail="No hay datos de la última semana")
-            log_to_opensearch(f"404  - No hay datos de la última semana",  "ERROR")                            
-            
+        if city == CONFIG["city"]:
+            weather_average_week.set(avg)
+    except HTTPException:
+        raise
+    except pybreaker.CircuitBreakerError:
+        raise HTTPException(status_code=503, detail="Servicio temporalmente fuera de servicio")
+    except RetryError:
+        raise HTTPException(status_code=502, detail="Servicio no responde. Vuelva a intentar.")
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"Error de conexión: {str(e)}")
+    body = {"average": avg}
+    timestamp = snapshot["current"]["timestamp"] if snapshot is not None else None
+    etag = etag_for("avg-week", city, timestamp, body)
+    return conditional(request, response, etag, max_age(cached_avg_week.cache.seconds, timestamp)) or body
+
+
+@app.get(
+    "/weather/summary",
+    response_model=SummaryResponse,
+    summary="Resumen del clima",
+    description="Devuelve la última medición y los promedios del último día y la última semana en una sola consulta."
+)
+async def summary(request: Request, response: Response, city: Optional[str] = None):
+    log_to_opensearch(f"================ consulta summary ==================",  "INFO")
+    start = time.perf_counter()
+    source = "snapshot"
+    try:
+        city = city or CONFIG["city"]
+        snapshot = snapshot_store.get(city)
+        if snapshot is None:
+            source = "rpc"
+            snapshot = await cached_summary(city)
+        if not snapshot:
+            log_to_opensearch(f"404  - No hay datos de clima disponibles aún",  "ERROR")
+            raise HTTPException(status_code=404, detail="No hay datos de clima disponibles aún")
+        if city == CONFIG["city"]:
+            weather_current_temperature.set(snapshot["current"]["temperature"])
+            weather_current_humidity.set(snapshot["current"]["humidity"])
+            weather_current_pressure.set(snapshot["current"]["pressure"])
+            if snapshot["avgDay"] is not None:
+                weather_average_day.set(snapshot["avgDay"])
+            if snapshot["avgWeek"] is not None:
+                weather_average_week.set(snapshot["avgWeek"])
+    except HTTPException:
+        raise
+    except pybreaker.CircuitBreakerError:
+        raise HTTPException(status_code=503, detail="Servicio temporalmente fuera de servicio")
+    except RetryError:
+        raise HTTPException(status_code=502, detail="Servicio no responde. Vuelva a intentar.")
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"Error de conexión: {str(e)}")
+    finally:
+        SUMMARY_LATENCY.labels(source=source).observe(time.perf_counter() - start)
+    timestamp = snapshot["current"]["timestamp"]
+    etag = etag_for("summary", city, timestamp)
+    return conditional(request, response, etag, max_age(cached_summary.cache.seconds, timestamp)) or snapshot
+
+
+@app.get(
+    "/weather/stats",
+    response_model=StatsResponse,
+    response_model_exclude_none=True,
+    summary="Estadísticas por bucket",
+    description="Devuelve mínimo, máximo, promedio, cantidad y percentiles aproximados por bucket en una ventana arbitraria."
+)
+async def stats(
+    from_: Optional[datetime] = Query(None, alias="from", description="Inicio de la ventana (ISO 8601 o epoch). Default: 24 horas antes de `to`"),
+    to: Optional[datetime] = Query(None, description="Fin de la ventana (ISO 8601 o epoch). Default: ahora"),
+    bucket: str = Query("1h", description="Tamaño del bucket: <n>m, <n>h o <n>d"),
+    fields: str = Query(",".join(STATS_FIELDS), description="Campos separados por coma"),
+    city: Optional[str] = None
+):
+    log_to_opensearch(f"================ consulta stats ==================",  "INFO")
+    city = city or CONFIG["city"]
+    now = time.time()
+    end = to.timestamp() if to is not None else now
+    start = from_.timestamp() if from_ is not None else end - 24 * 3600
+    try:
+        unit, bin_size, bucket_seconds = parse_bucket(bucket)
+        parsed_fields = parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    start, end = normalize_window(start, end, bucket_seconds)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="La ventana es vacía: `from` debe ser anterior a `to`")
+    if (end - start) / bucket_seconds > CONFIG["stats_max_buckets"]:
+        raise HTTPException(status_code=400, detail=f"La ventana supera los {CONFIG['stats_max_buckets']} buckets")
+
+    try:
+        cached = cached_stats_closed if end <= now else cached_stats
+        buckets = await cached(city, start, end, unit, bin_size, parsed_fields)
     except pybreaker.CircuitBreakerError:
         raise HTTPException(status_code=503, detail="Servicio temporalmente fuera de servicio")
     except RetryError:
         raise HTTPException(status_code=502, detail="Servicio no responde. Vuelva a intentar.")
     except Exception as e:
         raise HTTPException(status_code=502, detail=f"Error de conexión: {str(e)}")
-    return {"average": avg}
+    return {"city": city, "start": start, "end": end, "bucket": bucket, "buckets": buckets or []}
 
 
+@app.get(
+    "/weather/history",
+    summary="Exportación de histórico",
+    description="Exporta las mediciones de una ventana en streaming como NDJSON o CSV, opcionalmente comprimido con gzip."
+)
+async def history(
+    from_: Optional[datetime] = Query(None, alias="from", description="Inicio de la ventana (ISO 8601 o epoch). Default: 24 horas antes de `to`"),
+    to: Optional[datetime] = Query(None, description="Fin de la ventana (ISO 8601 o epoch). Default: ahora"),
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$", description="ndjson o csv"),
+    gzip: bool = Query(False, description="Comprimir la respuesta con gzip"),
+    cursor: Optional[int] = Query(None, description="Timestamp del último registro recibido, para retomar una exportación"),
+    limit: Optional[int] = Query(None, ge=1, description="Cantidad máxima de registros"),
+    city: Optional[str] = None
+):
+    log_to_opensearch(f"================ consulta history ==================",  "INFO")
+    city = city or CONFIG["city"]
+    end = int(to.timestamp() if to is not None else time.time())
+    start = int(from_.timestamp()) if from_ is not None else end - 24 * 3600
+    if start >= end:
+        raise HTTPException(status_code=400, detail="La ventana es vacía: `from` debe ser anterior a `to`")
+    page_size = CONFIG["history_page_size"]
+
+    async def fetch_page(after, size):
+        return await rpc_call_history(city, start, end, after, size)
+
+    # La primera página se pide antes de responder para poder devolver el código de error correcto
+    try:
+        first_page = await fetch_page(cursor, page_size if limit is None else min(page_size, limit))
+    except pybreaker.CircuitBreakerError:
+        raise HTTPException(status_code=503, detail="Servicio temporalmente fuera de servicio")
+    except RetryError:
+        raise HTTPException(status_code=502, detail="Servicio no responde. Vuelva a intentar.")
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"Error de conexión: {str(e)}")
+
+    body = encode_pages(iter_pages(fetch_page, first_page, page_size, limit), format)
+    headers = {"Content-Disposition": f'attachment; filename="history.{format}"'}
+    if gzip:
+        body = gzip_stream(body)
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(body, media_type=MEDIA_TYPES[format], headers=headers)
+
+
+# ---------------------------------------------------
+# HEALTH CHECKS
+# ---------------------------------------------------
+@app.get("/healthz")
+async def healthz():
+    """
+    Liveness: el proceso y su event loop responden.
+    """
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readyz():
+    """
+    Readiness: 503 hasta terminar el warm-up. Después informa el estado de weather_loader,
+    pero sigue listo aunque no responda (se sirve el fallback).
+    """
+    if startup.ready:
+        startup.checks["rpc_pool"] = f"{rpc_pool.connected_count}/{rpc_pool.size} conexiones"
+        startup.checks["snapshot"] = "live" if snapshot_store.live else "no disponible"
+        startup.checks["circuit_breaker"] = circuit_breaker.effective_state
+    return startup.readiness()
+
 # ---------------------------------------------------
 # ENDPOINT PARA PROMETHEUS
 # ---------------------------------------------------
+def metrics_registry():
+    """
+    Con varios workers (PROMETHEUS_MULTIPROC_DIR, ver main.py) se agregan las métricas de todos los procesos.
+    """
+    if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+def mark_dead_workers():
+    """
+    Descarta los gauges de los workers que ya no existen (salieron o uvicorn los reemplazó): si no,
+    sus últimos valores siguen en /metrics. Los contadores e histogramas se conservan (ya sumados).
+    Cada worker lo corre al arrancar (por los que murieron sin apagarse) y marca su propio pid al salir.
+    """
+    metrics_dir = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if not metrics_dir or not os.path.isdir(metrics_dir):
+        return
+    pids = set()
+    for name in os.listdir(metrics_dir):
+        pid = name.rsplit("_", 1)[-1].removesuffix(".db")
+        if pid.isdigit():
+            pids.add(int(pid))
+    for pid in pids - {os.getpid()}:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            multiprocess.mark_process_dead(pid, metrics_dir)
+        except PermissionError:
+            pass
+
 @app.get("/metrics")
 def metrics():
     """
     Punto de exposición para Prometheus.
     """
     log_to_opensearch(f"================ consulta metrics ==================",  "INFO")
-    update_memory_metrics()
-    update_disk_metrics()
-    update_cpu_metrics()
-    update_cpu_temperature()
-    data = generate_latest()
+    data = generate_latest(metrics_registry())
     return Response(content=data, media_type=CONTENT_TYPE_LATEST)
+
+
+# ---------------------------------------------------
+# PROFILER BAJO DEMANDA
+# ---------------------------------------------------
+profiler = SamplingProfiler(max_seconds=CONFIG["profiler_max_seconds"])
+
+@app.get("/debug/profile")
+async def profile(seconds: float = Query(10, gt=0), interval: float = Query(0.01, gt=0)):
+    """
+    Perfil por muestreo del worker que atiende el request durante `seconds`, en formato de stacks
+    colapsados (flame graph). Solo con PROFILER_ENABLED=true.
+    """
+    if not CONFIG["profiler_enabled"]:
+        raise HTTPException(status_code=404, detail="Not Found")
+    stacks = await asyncio.to_thread(profiler.profile, seconds, interval)
+    if stacks is None:
+        raise HTTPException(status_code=409, detail="Ya hay un perfil en curso")
+    return Response(content=stacks, media_type="text/plain")
@@ -0,0 +1,200 @@
+import asyncio
+import logging
+import pickle
+import time
+from collections import OrderedDict
+from functools import wraps
+from prometheus_client import Counter
+from shared_state import SharedStateUnavailable, shared_store
+
+
+logger = logging.getLogger("cache")
+
+CACHE_REQUESTS = Counter(
+    'weather_cache_requests',
+    'Consultas al cache en memoria por resultado (hit, miss, stale, coalesced)',
+    ['cache', 'result']
+)
+CACHE_EVICTIONS = Counter(
+    'weather_cache_evictions',
+    'Entradas desalojadas del cache por superar el tamaño máximo',
+    ['cache']
+)
+
+
+# ---------------------------------------------------
+# ALMACENAMIENTO DE LAS ENTRADAS
+# ---------------------------------------------------
+class MemoryBackend:
+    """
+    Entradas en memoria del proceso, con desalojo LRU.
+    """
+
+    clock = staticmethod(time.monotonic)
+    blocking = False
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._entries = OrderedDict()  # key -> (result, timestamp)
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def set(self, key, result, timestamp):
+        self._entries[key] = (result, timestamp)
+        self._entries.move_to_end(key)
+        evicted = 0
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            evicted += 1
+        return evicted
+
+    def delete(self, key=None):
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+
+class SharedBackend:
+    """
+    Entradas en el SharedState (SQLite) común a todos los workers: el resultado que obtiene
+    un worker lo sirven todos. Se desalojan las entradas más viejas (no las menos usadas).
+    Las marcas de tiempo son de reloj de pared para poder compararlas entre procesos.
+    TTLCache lo llama desde un thread (blocking). Si el SQLite está ocupado por otro worker,
+    la consulta es un miss y la entrada no se guarda.
+    """
+
+    clock = staticmethod(time.time)
+    blocking = True
+
+    def __init__(self, state, namespace, max_size):
+        self.state = state
+        self.namespace = namespace
+        self.max_size = max_size
+
+    def get(self, key):
+        try:
+            row = self.state.cache_get(self.namespace, repr(key))
+        except SharedStateUnavailable as e:
+            logger.debug(f"CACHE SHARED UNAVAILABLE {self.namespace}: {e}")
+            return None
+        return (pickle.loads(row[0]), row[1]) if row else None
+
+    def set(self, key, result, timestamp):
+        try:
+            return self.state.cache_set(self.namespace, repr(key), pickle.dumps(result), timestamp, self.max_size)
+        except SharedStateUnavailable as e:
+            logger.debug(f"CACHE SHARED UNAVAILABLE {self.namespace}: {e}")
+            return 0
+
+    def delete(self, key=None):
+        try:
+            self.state.cache_delete(self.namespace, None if key is None else repr(key))
+        except SharedStateUnavailable as e:
+            logger.warning(f"No se pudo invalidar el cache compartido {self.namespace}: {e}")
+
+
+def new_backend(name, max_size):
+    """
+    Backend por defecto: compartido entre workers si SHARED_STATE está activo, si no en memoria.
+    """
+    if shared_store is not None:
+        return SharedBackend(shared_store, name, max_size)
+    return MemoryBackend(max_size)
+
+
+# ---------------------------------------------------
+# CACHE TTL CON SINGLE-FLIGHT, STALE-WHILE-REVALIDATE Y LRU
+# ---------------------------------------------------
+class TTLCache:
+    """
+    Cache para funciones async.
+    - Las consultas concurrentes sobre una clave vencida comparten un único cálculo en curso (por proceso).
+    - Durante `stale_seconds` luego de vencer se devuelve el valor anterior y se refresca en background.
+    - Con más de `max_size` claves se desaloja la menos usada.
+    - Las excepciones (HTTPException incluidas) y los resultados vacíos nunca se cachean.
+    Las entradas se guardan en `backend` (en memoria por defecto, compartido entre workers con SharedBackend).
+    """
+
+    def __init__(self, name, seconds, stale_seconds=0, max_size=1024, backend=None):
+        self.name = name
+        self.seconds = seconds
+        self.stale_seconds = stale_seconds
+        self.max_size = max_size
+        self.backend = backend or new_backend(name, max_size)
+        self._inflight = {}  # key -> asyncio.Task
+
+    async def _backend(self, operation, *args):
+        if self.backend.blocking:
+            return await asyncio.to_thread(operation, *args)
+        return operation(*args)
+
+    async def get(self, key, compute):
+        entry = await self._backend(self.backend.get, key)
+        if entry is not None:
+            age = self.backend.clock() - entry[1]
+            if age < self.seconds:
+                CACHE_REQUESTS.labels(cache=self.name, result="hit").inc()
+                logger.debug(f"CACHE HIT   {self.name} args={key}")
+                return entry[0]
+            if age < self.seconds + self.stale_seconds:
+                CACHE_REQUESTS.labels(cache=self.name, result="stale").inc()
+                logger.debug(f"CACHE STALE {self.name} args={key}")
+                self._refresh(key, compute)
+                return entry[0]
+
+        result = "coalesced" if key in self._inflight else "miss"
+        CACHE_REQUESTS.labels(cache=self.name, result=result).inc()
+        logger.debug(f"CACHE {result.upper()} {self.name} args={key}")
+        # shield: si el request que disparó el cálculo se cancela, el resto lo sigue esperando
+        return await asyncio.shield(self._refresh(key, compute))
+
+    def invalidate(self, key=None):
+        self.backend.delete(key)
+
+    def _refresh(self, key, compute):
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._load(key, compute))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._done(key, done))
+        return task
+
+    async def _load(self, key, compute):
+        result = await compute()
+        # Sin datos (None) se trata como respuesta de error: no se cachea
+        if result is not None:
+            await self._store(key, result)
+        return result
+
+    async def _store(self, key, result):
+        evicted = await self._backend(self.backend.set, key, result, self.backend.clock())
+        if evicted:
+            CACHE_EVICTIONS.labels(cache=self.name).inc(evicted)
+
+    def _done(self, key, task):
+        self._inflight.pop(key, None)
+        if not task.cancelled() and task.exception() is not None:
+            logger.debug(f"CACHE ERROR {self.name} args={key}: {task.exception()}")
+
+
+# ---------------------------------------------------
+# DECORADOR DE CACHE EN MEMORIA CON TTL
+# ---------------------------------------------------
+def ttl_cache(seconds: int, stale_seconds: int = 0, max_size: int = 1024):
+    def decorator(func):
+        cache = TTLCache(func.__name__, seconds, stale_seconds, max_size)
+
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            key = (args, tuple(sorted(kwargs.items())))
+            return await cache.get(key, lambda: func(*args, **kwargs))
+
+        wrapper.cache = cache
+        return wrapper
+
+    return decorator
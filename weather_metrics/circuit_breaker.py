@@ -0,0 +1,153 @@
+import inspect
+import logging
+from datetime import datetime, timedelta, timezone
+from functools import wraps
+import pybreaker
+from shared_state import SharedStateUnavailable
+
+logger = logging.getLogger("circuit_breaker")
+
+
+# ---------------------------------------------------
+# CIRCUIT BREAKER COMPATIBLE CON CORRUTINAS
+# ---------------------------------------------------
+class AsyncCircuitBreaker(pybreaker.CircuitBreaker):
+    """
+    pybreaker.CircuitBreaker que tambien puede decorar funciones `async def`.
+    Reutiliza el storage, los listeners y las transiciones de estado de pybreaker,
+    solo que la llamada protegida se espera con await en vez de ejecutarse en un thread.
+    """
+
+    def _reset_timeout_elapsed(self):
+        opened_at = self._state_storage.opened_at
+        now = datetime.now(timezone.utc) if opened_at and opened_at.tzinfo else datetime.utcnow()
+        return not opened_at or now >= opened_at + timedelta(seconds=self.reset_timeout)
+
+    @property
+    def effective_state(self):
+        """
+        Estado con el que se atendería la próxima llamada: un breaker abierto cuyo `reset_timeout`
+        ya pasó se informa half-open, aunque recién pase a ese estado con la próxima llamada.
+        """
+        state = self.current_state
+        if state == pybreaker.STATE_OPEN and self._reset_timeout_elapsed():
+            return pybreaker.STATE_HALF_OPEN
+        return state
+
+    async def call_coroutine(self, func, *args, **kwargs):
+        state = self.state
+        if state.name == pybreaker.STATE_OPEN:
+            if not self._reset_timeout_elapsed():
+                raise pybreaker.CircuitBreakerError("Timeout not elapsed yet, circuit breaker still open")
+            self.half_open()
+            state = self.state
+
+        for listener in self.listeners:
+            listener.before_call(self, func, *args, **kwargs)
+
+        try:
+            result = await func(*args, **kwargs)
+        except Exception as e:
+            state._handle_error(e)
+        else:
+            state._handle_success()
+            return result
+
+    def __call__(self, func):
+        if not inspect.iscoroutinefunction(func):
+            return super().__call__(func)
+
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            return await self.call_coroutine(func, *args, **kwargs)
+
+        return wrapper
+
+
+# ---------------------------------------------------
+# ESTADO DEL BREAKER COMPARTIDO ENTRE WORKERS
+# ---------------------------------------------------
+class CircuitSharedStorage(pybreaker.CircuitBreakerStorage):
+    """
+    Storage de pybreaker sobre el SharedState: todos los workers ven el mismo estado, contadores
+    y momento de apertura, así el breaker se abre una sola vez para todo el servicio.
+    Guarda una copia local de cada campo: si una escritura no llega al SQLite (ocupado por otro
+    worker más de SHARED_STATE_TIMEOUT, SharedStateUnavailable) el proceso sigue con esa copia,
+    sin esperar, y la vuelve a escribir completa en la próxima escritura que funcione.
+    """
+
+    def __init__(self, store, name, state=pybreaker.STATE_CLOSED):
+        super().__init__("shared")
+        self._store = store
+        self._breaker_name = name
+        self._local = {"state": state, "counter": 0, "success_counter": 0, "opened_at": None}
+        self._diverged = False  # hay escrituras que solo están en la copia local
+        self._write(self._store.breaker_init, name, state)
+
+    def _write(self, operation, *args):
+        try:
+            if self._diverged:
+                for field, value in self._local.items():
+                    self._store.breaker_set(self._breaker_name, field, value)
+                self._diverged = False
+            else:
+                operation(*args)
+        except SharedStateUnavailable as e:
+            self._diverged = True
+            logger.warning(f"Estado compartido del breaker {self._breaker_name} no disponible, se usa el local: {e}")
+
+    def _get(self, field):
+        if self._diverged:
+            return self._local[field]
+        try:
+            value = self._store.breaker_get(self._breaker_name, field)
+        except SharedStateUnavailable as e:
+            logger.debug(f"Estado compartido del breaker {self._breaker_name} no disponible, se usa el local: {e}")
+            return self._local[field]
+        self._local[field] = value
+        return value
+
+    def _set(self, field, value):
+        self._local[field] = value
+        self._write(self._store.breaker_set, self._breaker_name, field, value)
+
+    def _increment(self, field):
+        self._local[field] += 1
+        self._write(self._store.breaker_increment, self._breaker_name, field)
+
+    @property
+    def state(self):
+        return self._get("state")
+
+    @state.setter
+    def state(self, state):
+        self._set("state", state)
+
+    def increment_counter(self):
+        self._increment("counter")
+
+    def reset_counter(self):
+        self._set("counter", 0)
+
+    def increment_success_counter(self):
+        self._increment("success_counter")
+
+    def reset_success_counter(self):
+        self._set("success_counter", 0)
+
+    @property
+    def counter(self):
+        return self._get("counter")
+
+    @property
+    def success_counter(self):
+        return self._get("success_counter")
+
+    @property
+    def opened_at(self):
+        opened_at = self._get("opened_at")
+        return datetime.fromtimestamp(opened_at, timezone.utc) if opened_at is not None else None
+
+    @opened_at.setter
+    def opened_at(self, now):
+        self._set("opened_at", now.replace(tzinfo=now.tzinfo or timezone.utc).timestamp())
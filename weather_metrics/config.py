@@ -9,7 +9,56 @@ CONFIG = {
     "mongo_db": os.getenv("MONGO_DB", "weather"),
     "mongo_collection": os.getenv("MONGO_COLLECTION", "measurements"),
     "city": os.getenv("CITY", "Buenos Aires"),
+    # Ciudades que se cargan en el cache al arrancar (separadas por coma; por defecto CITY) y espera máxima (segundos)
+    "warmup_cities": [city.strip() for city in os.getenv("WARMUP_CITIES", os.getenv("CITY", "Buenos Aires")).split(",") if city.strip()],
+    "warmup_timeout": float(os.getenv("WARMUP_TIMEOUT", 10)),
     "open_search_uri": os.getenv("OPEN_SEARCH_URI"),
     "interval_minutes": 15,
-    "weatherstack_key": os.getenv("WEATHERSTACK_API_KEY")
+    "weatherstack_key": os.getenv("WEATHERSTACK_API_KEY"),
+    "weatherstack_base_url": os.getenv("WEATHERSTACK_BASE_URL", "http://api.weatherstack.com").rstrip("/"),
+    "weatherstack_timeout": float(os.getenv("WEATHERSTACK_TIMEOUT", 3)),
+    "weatherstack_pool_size": int(os.getenv("WEATHERSTACK_POOL_SIZE", 10)),
+    # Fallback con el breaker abierto: TTL del cache de weatherstack, presupuesto (segundos) antes de
+    # responder con la última medición conocida (0 = esperar siempre a weatherstack) y su antigüedad máxima
+    "fallback_cache_ttl": int(os.getenv("FALLBACK_CACHE_TTL", 300)),
+    "fallback_hedge_budget": float(os.getenv("FALLBACK_HEDGE_BUDGET", 0.5)),
+    "fallback_last_known_good_max_age": int(os.getenv("FALLBACK_LAST_KNOWN_GOOD_MAX_AGE", 3600)),
+    # Workers de uvicorn. Con más de uno las métricas se agregan en modo multiproceso de Prometheus
+    # y el cache y los circuit breakers se comparten en SHARED_STATE_DIR (ver shared_state.py)
+    "workers": int(os.getenv("WORKERS", 1)),
+    "shared_state": os.getenv("SHARED_STATE", "true" if int(os.getenv("WORKERS", 1)) > 1 else "false").lower() == "true",
+    "shared_state_dir": os.getenv("SHARED_STATE_DIR", "/tmp/weather_metrics"),
+    # Espera máxima (segundos) por el lock del SQLite compartido antes de usar el estado local del proceso
+    "shared_state_timeout": float(os.getenv("SHARED_STATE_TIMEOUT", 0.05)),
+    "rpc_breaker_fail_max": int(os.getenv("RPC_BREAKER_FAIL_MAX", 2)),
+    "rpc_breaker_reset_timeout": float(os.getenv("RPC_BREAKER_RESET_TIMEOUT", 60)),
+    # Codificación de los mensajes RPC hacia weather_loader: json o msgpack (frames binarios)
+    "rpc_encoding": os.getenv("RPC_ENCODING", "json").lower(),
+    "rpc_pool_size": int(os.getenv("RPC_POOL_SIZE", 4)),
+    "rpc_call_timeout": float(os.getenv("RPC_CALL_TIMEOUT", 10)),
+    "rpc_health_interval": float(os.getenv("RPC_HEALTH_INTERVAL", 15)),
+    "rpc_backoff_max": float(os.getenv("RPC_BACKOFF_MAX", 30)),
+    "log_queue_size": int(os.getenv("LOG_QUEUE_SIZE", 10000)),
+    "log_batch_size": int(os.getenv("LOG_BATCH_SIZE", 500)),
+    "log_flush_interval": float(os.getenv("LOG_FLUSH_INTERVAL", 2)),
+    "log_sample_rate": float(os.getenv("LOG_SAMPLE_RATE", 0.1)),
+    "log_ship_timeout": float(os.getenv("LOG_SHIP_TIMEOUT", 5)),
+    "cache_ttl_current": int(os.getenv("CACHE_TTL_CURRENT", 30)),
+    "cache_stale_seconds": int(os.getenv("CACHE_STALE_SECONDS", 120)),
+    "cache_max_size": int(os.getenv("CACHE_MAX_SIZE", 1024)),
+    "cache_ttl_summary": int(os.getenv("CACHE_TTL_SUMMARY", 30)),
+    "cache_ttl_stats": int(os.getenv("CACHE_TTL_STATS", 60)),
+    "cache_ttl_stats_closed": int(os.getenv("CACHE_TTL_STATS_CLOSED", 3600)),
+    "stats_max_buckets": int(os.getenv("STATS_MAX_BUCKETS", 5000)),
+    # Registros por página de getHistory, hasta el máximo que devuelve weather_loader (HISTORY_MAX_PAGE):
+    # una página más chica que la pedida marca el fin de la exportación
+    "history_page_size": max(1, min(int(os.getenv("HISTORY_PAGE_SIZE", 1000)), 10000)),
+    # Antigüedad máxima (segundos) de un snapshot recibido por push antes de volver a consultar por RPC
+    "snapshot_max_age": int(os.getenv("SNAPSHOT_MAX_AGE", 2 * 15 * 60)),
+    # Buckets (segundos) del histograma de latencia de requests HTTP
+    "request_latency_buckets": [float(b) for b in os.getenv("REQUEST_LATENCY_BUCKETS", "0.005,0.01,0.025,0.05,0.075,0.1,0.25,0.5,0.75,1,2.5,5,7.5,10").split(",") if b.strip()],
+    "hardware_sample_interval": float(os.getenv("HARDWARE_SAMPLE_INTERVAL", 15)),
+    # Profiler por muestreo en /debug/profile (desactivado por defecto) y duración máxima (segundos) de un perfil
+    "profiler_enabled": os.getenv("PROFILER_ENABLED", "false").lower() == "true",
+    "profiler_max_seconds": int(os.getenv("PROFILER_MAX_SECONDS", 60))
 }
@@ -0,0 +1,119 @@
+import asyncio
+import logging
+import time
+from datetime import datetime
+import httpx
+import pytz
+from prometheus_client import Counter, Histogram
+from cache import TTLCache
+from tracing import stage
+
+
+logger = logging.getLogger("fallback")
+
+FALLBACK_RESPONSES = Counter(
+    'weather_fallback_responses',
+    'Respuestas de /weather/current servidas por el fallback según el origen (weatherstack, last_known_good, error)',
+    ['source']
+)
+FALLBACK_LATENCY = Histogram(
+    'weather_fallback_latency_seconds',
+    'Latencia del fallback de /weather/current según el origen',
+    ['source']
+)
+
+
+# ---------------------------------------------------
+# ÚLTIMA MEDICIÓN CONOCIDA POR CIUDAD
+# ---------------------------------------------------
+class LastKnownGood:
+    """
+    Última respuesta correcta de /weather/current por ciudad, usable hasta `max_age` segundos.
+    """
+
+    def __init__(self, max_age):
+        self.max_age = max_age
+        self._entries = {}  # city -> (current, received_at)
+
+    def update(self, city, current):
+        self._entries[city] = (current, time.monotonic())
+
+    def get(self, city):
+        entry = self._entries.get(city)
+        if entry is None or time.monotonic() - entry[1] > self.max_age:
+            return None
+        return entry[0]
+
+
+# ---------------------------------------------------
+# FALLBACK A WEATHERSTACK (POOL + CACHE + HEDGE)
+# ---------------------------------------------------
+class WeatherstackFallback:
+    """
+    Fallback de /weather/current mientras el breaker hacia weather_loader está abierto.
+    - Las consultas a weatherstack usan un pool de conexiones propio con timeout corto.
+    - Las respuestas se cachean `ttl` segundos por ciudad y las consultas concurrentes comparten
+      una única llamada, así una caída del loader no reenvía todo el tráfico al proveedor pago.
+    - Con `hedge_budget` y una última medición conocida, si weatherstack no responde dentro del
+      presupuesto se devuelve esa medición (la consulta sigue en background y carga el cache).
+    """
+
+    def __init__(self, base_url, api_key, last_known_good, timeout=3, ttl=300, max_size=1024,
+                 hedge_budget=None, max_connections=10):
+        self.base_url = base_url
+        self.api_key = api_key
+        self.last_known_good = last_known_good
+        self.timeout = timeout
+        self.hedge_budget = hedge_budget
+        self.max_connections = max_connections
+        self.cache = TTLCache("weatherstack_fallback", ttl, max_size=max_size)
+        self._client = None
+
+    async def start(self):
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url,
+            timeout=self.timeout,
+            limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections)
+        )
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def current(self, city):
+        start = time.perf_counter()
+        last_known = self.last_known_good.get(city)
+        lookup = self.cache.get(city, lambda: self._fetch(city))
+        try:
+            if last_known is not None and self.hedge_budget:
+                result = await asyncio.wait_for(lookup, self.hedge_budget)
+            else:
+                result = await lookup
+            source = "weatherstack"
+        except Exception as e:
+            if last_known is None:
+                FALLBACK_RESPONSES.labels(source="error").inc()
+                FALLBACK_LATENCY.labels(source="error").observe(time.perf_counter() - start)
+                raise
+            logger.warning(f"Fallback a la última medición conocida de {city}: {e!r}")
+            result, source = last_known, "last_known_good"
+        FALLBACK_RESPONSES.labels(source=source).inc()
+        FALLBACK_LATENCY.labels(source=source).observe(time.perf_counter() - start)
+        return result
+
+    async def _fetch(self, city):
+        with stage("upstream_fetch", "weatherstack"):
+            response = await self._client.get("/current", params={"query": city, "access_key": self.api_key, "units": "m"})
+        response.raise_for_status()
+        data = response.json()
+        # weatherstack informa algunos errores (clave inválida, cuota) con 200 y un objeto "error"
+        if "current" not in data:
+            raise ValueError(f"Respuesta inválida de weatherstack: {data.get('error')}")
+        weather_date = datetime.now().astimezone(pytz.timezone("America/Buenos_Aires"))
+        return {
+            "temperature": data["current"]["temperature"],
+            "humidity": data["current"]["humidity"],
+            "pressure": data["current"]["pressure"],
+            "datetime": weather_date.strftime("%Y-%m-%d %H:%M:%S")
+        }
@@ -1,10 +1,12 @@
+import logging
+import threading
 import psutil
 from prometheus_client import Gauge
 
 # Métrica para el uso de la memoria
-memory_usage = Gauge('memory_usage_percentage', 'Uso total de la memoria en porcentaje')
+memory_usage = Gauge('memory_usage_percentage', 'Uso total de la memoria en porcentaje', multiprocess_mode='livemostrecent')
 # Métrica para la memoria libre
-memory_free = Gauge('memory_free_bytes', 'Memoria libre en bytes')
+memory_free = Gauge('memory_free_bytes', 'Memoria libre en bytes', multiprocess_mode='livemostrecent')
 
 # Función para actualizar las métricas de memoria
 def update_memory_metrics():
@@ -15,28 +17,29 @@ def update_memory_metrics():
 ############################################################################################################################################
 
 # Métrica para el uso total de CPU
-cpu_usage = Gauge('cpu_usage_percentage', 'Uso total de la CPU en porcentaje')
+cpu_usage = Gauge('cpu_usage_percentage', 'Uso total de la CPU en porcentaje', multiprocess_mode='livemostrecent')
 
 # Métrica para el uso de cada núcleo de la CPU
-cpu_per_core_usage = Gauge('cpu_per_core_usage_percentage', 'Uso de cada núcleo de la CPU en porcentaje', ['core'])
+cpu_per_core_usage = Gauge('cpu_per_core_usage_percentage', 'Uso de cada núcleo de la CPU en porcentaje', ['core'], multiprocess_mode='livemostrecent')
 
 # Función para actualizar las métricas de CPU
+# interval=None no bloquea: devuelve el uso desde la llamada anterior (el período del sampler)
 def update_cpu_metrics():
     # Uso total de la CPU
-    cpu_usage.set(psutil.cpu_percent(interval=1))
+    cpu_usage.set(psutil.cpu_percent(interval=None))
     
     # Uso por cada núcleo de la CPU
-    for i, percentage in enumerate(psutil.cpu_percent(percpu=True, interval=1)):
+    for i, percentage in enumerate(psutil.cpu_percent(percpu=True, interval=None)):
         cpu_per_core_usage.labels(core=f'core_{i}').set(percentage)
 
 ############################################################################################################################################
 ############################################################################################################################################
 
 # Métrica para el uso del disco
-disk_usage = Gauge('disk_usage_percentage', 'Uso total del disco en porcentaje')
+disk_usage = Gauge('disk_usage_percentage', 'Uso total del disco en porcentaje', multiprocess_mode='livemostrecent')
 
 # Métrica para el espacio libre en el disco
-disk_free = Gauge('disk_free_bytes', 'Espacio libre en el disco en bytes')
+disk_free = Gauge('disk_free_bytes', 'Espacio libre en el disco en bytes', multiprocess_mode='livemostrecent')
 
 # Función para actualizar las métricas de disco
 def update_disk_metrics():
@@ -47,7 +50,7 @@ def update_disk_metrics():
 ############################################################################################################################################
 
 # Métrica para la temperatura del CPU (si está disponible)
-cpu_temp = Gauge('cpu_temperature_celsius', 'Temperatura del CPU en grados Celsius')
+cpu_temp = Gauge('cpu_temperature_celsius', 'Temperatura del CPU en grados Celsius', multiprocess_mode='livemostrecent')
 
 # Función para actualizar las métricas de temperatura
 def update_cpu_temperature():
@@ -60,3 +63,40 @@ def update_cpu_temperature():
 
 ############################################################################################################################################
 ############################################################################################################################################
+
+# Sampler en background: actualiza todos los gauges de hardware cada `interval` segundos,
+# así /metrics solo serializa el registry
+class HardwareSampler:
+    def __init__(self, interval=15):
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        # Primera lectura de CPU para que la siguiente tenga contra qué comparar
+        psutil.cpu_percent(interval=None)
+        psutil.cpu_percent(percpu=True, interval=None)
+        update_memory_metrics()
+        update_disk_metrics()
+        update_cpu_temperature()
+        self._thread = threading.Thread(target=self._run, name="hardware-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                update_memory_metrics()
+                update_disk_metrics()
+                update_cpu_metrics()
+                update_cpu_temperature()
+            except Exception as e:
+                logging.warning(f"Error actualizando métricas de hardware: {e}")
+
+############################################################################################################################################
+############################################################################################################################################
@@ -0,0 +1,66 @@
+import csv
+import io
+import orjson
+import logging
+import zlib
+
+
+logger = logging.getLogger("history")
+
+HISTORY_COLUMNS = ("city", "timestamp", "temperature", "humidity", "pressure")
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+# ---------------------------------------------------
+# EXPORTACIÓN DE HISTÓRICO EN STREAMING
+# ---------------------------------------------------
+async def iter_pages(fetch_page, first_page, page_size, limit=None):
+    """
+    Recorre las páginas de weather_loader usando el timestamp del último registro como cursor.
+    Se mantiene en memoria una sola página. Si una página falla a mitad del stream se relanza la
+    excepción: el servidor corta la respuesta chunked sin el chunk final y el cliente ve la
+    transferencia incompleta (puede retomar con cursor = último timestamp recibido).
+    """
+    page, sent = first_page, 0
+    while page:
+        if limit is not None:
+            page = page[:limit - sent]
+        yield page
+        sent += len(page)
+        if len(page) < page_size or (limit is not None and sent >= limit):
+            return
+        try:
+            page = await fetch_page(page[-1]["timestamp"], page_size if limit is None else min(page_size, limit - sent))
+        except Exception as e:
+            logger.error(f"Exportación de histórico interrumpida luego de {sent} registros: {e}")
+            raise
+
+
+def encode_ndjson(page):
+    return b"".join(orjson.dumps(record) + b"\n" for record in page)
+
+
+def encode_csv(page, header=False):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=HISTORY_COLUMNS, extrasaction="ignore")
+    if header:
+        writer.writeheader()
+    writer.writerows(page)
+    return buffer.getvalue().encode()
+
+
+async def encode_pages(pages, format):
+    if format == "csv":
+        yield encode_csv([], header=True)
+    encoder = encode_csv if format == "csv" else encode_ndjson
+    async for page in pages:
+        yield encoder(page)
+
+
+async def gzip_stream(chunks):
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+    async for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
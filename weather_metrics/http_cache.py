@@ -0,0 +1,59 @@
+import hashlib
+import json
+import time
+import zlib
+from fastapi import Response
+from config import CONFIG
+
+
+# ---------------------------------------------------
+# CACHE HTTP (ETag / Cache-Control / 304)
+# ---------------------------------------------------
+def etag_for(kind, city, timestamp=None, body=None):
+    """
+    ETag de una respuesta de `kind` para `city`. Con el timestamp de la medición de la que se deriva,
+    cambia solo cuando el loader guarda una medición nueva; sin timestamp (promedios por RPC,
+    fallback a weatherstack) se deriva del contenido.
+    """
+    if timestamp is not None:
+        return f'"{kind}-{zlib.crc32(city.encode()):08x}-{timestamp}"'
+    digest = hashlib.sha1(json.dumps(body, sort_keys=True, default=str).encode()).hexdigest()[:16]
+    return f'"{kind}-{digest}"'
+
+
+def max_age(ttl, timestamp=None):
+    """
+    Segundos que un cliente puede reusar la respuesta: el TTL del cache del endpoint,
+    sin pasar la próxima medición esperada del loader (`interval_minutes` después de `timestamp`).
+    Si esa medición ya está atrasada la respuesta puede cambiar en cualquier momento: 0.
+    """
+    if timestamp is None:
+        return ttl
+    interval = CONFIG["interval_minutes"] * 60
+    elapsed = time.time() - timestamp
+    if elapsed >= interval:
+        return 0
+    return int(min(ttl, interval - elapsed))
+
+
+def matches(header, etag):
+    """
+    Comparación débil de If-None-Match (RFC 9110): lista de ETags separados por coma o "*".
+    """
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return etag in (tag.strip().removeprefix("W/") for tag in header.split(","))
+
+
+def conditional(request, response, etag, seconds):
+    """
+    Si el cliente ya tiene `etag` devuelve la respuesta 304 a enviar; si no, agrega los headers de
+    cache a `response` y devuelve None.
+    """
+    headers = {"ETag": etag, "Cache-Control": f"max-age={seconds}"}
+    if matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
@@ -1,5 +1,22 @@
+import os
+import shutil
 import uvicorn
-from api import app
+from config import CONFIG
+
+
+def run_server():
+    if CONFIG["workers"] <= 1:
+        from api import app
+        uvicorn.run(app, host="0.0.0.0", port=8000)
+        return
+    # Varios workers: cada uno escribe sus métricas en PROMETHEUS_MULTIPROC_DIR (la variable tiene que
+    # estar antes de que los workers importen prometheus_client) y se arranca con el estado compartido limpio
+    shutil.rmtree(CONFIG["shared_state_dir"], ignore_errors=True)
+    metrics_dir = os.path.join(CONFIG["shared_state_dir"], "prometheus")
+    os.makedirs(metrics_dir)
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = metrics_dir
+    uvicorn.run("api:app", host="0.0.0.0", port=8000, workers=CONFIG["workers"])
+
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    run_server()
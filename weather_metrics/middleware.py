@@ -0,0 +1,95 @@
+import time
+from prometheus_client import Counter, Histogram
+from logging_ag import log_to_opensearch
+from config import CONFIG
+from tracing import TRACE_HEADER, new_trace_id, set_trace_id, reset_trace_id
+
+
+# ---------------------------------------------------
+# MÉTRICAS DE REQUESTS HTTP
+# ---------------------------------------------------
+REQUEST_COUNT = Counter(
+    'weather_api_request_count',
+    'Contador de peticiones HTTP',
+    ['method', 'endpoint', 'http_status']
+)
+REQUEST_LATENCY = Histogram(
+    'weather_api_request_latency_seconds',
+    'Latencia de peticiones en segundos',
+    ['method', 'endpoint'],
+    buckets=CONFIG["request_latency_buckets"]
+)
+REQUEST_COUNT_ERROR = Counter(
+    'weather_api_request_count_failed',
+    'Contador de peticiones HTTP fallidas (respuestas 4xx/5xx o excepciones)',
+    ['method', 'endpoint', 'http_status']
+)
+
+# Requests que no matchean ninguna ruta (404 de scanners, URLs al azar): una sola serie
+UNMATCHED_ROUTE = "unmatched"
+
+
+def route_template(scope):
+    """
+    Template de la ruta que atendió el request (ej: /weather/current), no el path crudo:
+    la cantidad de series queda acotada por las rutas de la app.
+    """
+    route = scope.get("route")
+    return getattr(route, "path", UNMATCHED_ROUTE)
+
+
+def trace_id_from(scope):
+    """
+    Trace id recibido en el header X-Trace-Id (ej: de un proxy o del cliente), si es razonable.
+    """
+    for name, value in scope.get("headers", []):
+        if name == TRACE_HEADER.encode():
+            value = value.decode("latin-1")
+            return value if 0 < len(value) <= 64 and value.isprintable() else None
+    return None
+
+
+# ---------------------------------------------------
+# MIDDLEWARE ASGI PARA INSTRUMENTACIÓN
+# ---------------------------------------------------
+class MetricsMiddleware:
+    """
+    Middleware ASGI puro: toma el status del mensaje http.response.start sin envolver el cuerpo
+    en un stream ni crear tareas extra por request (como BaseHTTPMiddleware).
+    Asigna además el trace id del request (el del header X-Trace-Id si viene) y lo devuelve en la respuesta.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        start = time.perf_counter()
+        trace_id = trace_id_from(scope) or new_trace_id()
+        token = set_trace_id(trace_id)
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message = {**message, "headers": [*message.get("headers", []), (TRACE_HEADER.encode(), trace_id.encode("latin-1"))]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        except Exception as e:
+            status = 500
+            log_to_opensearch(f"ERROR -> {e}",  "ERROR")
+            raise
+        finally:
+            reset_trace_id(token)
+            method = scope["method"]
+            endpoint = route_template(scope)
+            REQUEST_LATENCY.labels(method=method, endpoint=endpoint).observe(time.perf_counter() - start)
+            REQUEST_COUNT.labels(method=method, endpoint=endpoint, http_status=status).inc()
+            if status >= 400:
+                REQUEST_COUNT_ERROR.labels(method=method, endpoint=endpoint, http_status=status).inc()
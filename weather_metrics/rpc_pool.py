@@ -0,0 +1,180 @@
+import asyncio
+import logging
+import random
+import time
+from fastapi_websocket_rpc import RpcMethodsBase, WebSocketRpcClient
+from fastapi_websocket_rpc.simplewebsocket import JsonSerializingWebSocket
+from tracing import current_trace_id, stage
+
+
+logger = logging.getLogger("rpc_pool")
+
+
+class RpcUnavailableError(ConnectionError):
+    pass
+
+
+# ---------------------------------------------------
+# CONEXION DEL POOL
+# ---------------------------------------------------
+class PooledConnection:
+    def __init__(self, index):
+        self.index = index
+        self.client = None
+        self.failures = 0
+        self.next_attempt = 0.0
+
+    @property
+    def connected(self):
+        return self.client is not None and not self.client.channel.isClosed()
+
+
+# ---------------------------------------------------
+# POOL DE CONEXIONES WEBSOCKET RPC
+# ---------------------------------------------------
+class RpcConnectionPool:
+    """
+    Pool de conexiones WebSocket RPC persistentes hacia weather_loader.
+    Las conexiones se abren en el lifespan de la app y se reutilizan entre requests,
+    evitando el handshake TCP + WebSocket por cada llamada.
+    """
+
+    def __init__(self, size=4, call_timeout=10, health_interval=15, backoff_base=0.5, backoff_max=30, methods=None,
+                 serializing_socket_cls=JsonSerializingWebSocket):
+        self.size = size
+        self.call_timeout = call_timeout
+        self.health_interval = health_interval
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.methods = methods or RpcMethodsBase()
+        self.serializing_socket_cls = serializing_socket_cls
+        self.uri = None
+        self._connections = []
+        self._idle = None
+        self._health_task = None
+
+    @property
+    def connected_count(self):
+        return sum(1 for conn in self._connections if conn.connected)
+
+    async def start(self, uri):
+        self.uri = uri
+        self._connections = [PooledConnection(i) for i in range(self.size)]
+        self._idle = asyncio.Queue()
+        # Las conexiones se abren en paralelo: el arranque espera como mucho un call_timeout
+        results = await asyncio.gather(*(self._connect(conn) for conn in self._connections), return_exceptions=True)
+        for conn, result in zip(self._connections, results):
+            if isinstance(result, BaseException):
+                logger.warning(f"RPC pool: no se pudo abrir la conexion {conn.index} a {uri}: {result}")
+            self._idle.put_nowait(conn)
+        self._health_task = asyncio.create_task(self._health_loop())
+
+    async def wait_connected(self, timeout, interval=0.5):
+        """
+        Reintenta (con el backoff de cada conexión) hasta tener al menos una conexión abierta
+        o agotar `timeout`. Devuelve la cantidad de conexiones abiertas.
+        """
+        deadline = time.monotonic() + timeout
+        while not self.connected_count and time.monotonic() < deadline:
+            await self._check_idle()
+            await asyncio.sleep(interval)
+        return self.connected_count
+
+    async def close(self):
+        if self._health_task is not None:
+            self._health_task.cancel()
+            self._health_task = None
+        for conn in self._connections:
+            await self._disconnect(conn)
+
+    async def _connect(self, conn):
+        client = WebSocketRpcClient(
+            self.uri,
+            self.methods,
+            retry_config=False,
+            default_response_timeout=self.call_timeout,
+            serializing_socket_cls=self.serializing_socket_cls
+        )
+        try:
+            with stage("rpc_connect", "pool"):
+                await asyncio.wait_for(client.__aenter__(), self.call_timeout)
+        except BaseException:
+            conn.failures += 1
+            delay = min(self.backoff_max, self.backoff_base * (2 ** conn.failures))
+            conn.next_attempt = time.monotonic() + delay * random.uniform(0.5, 1.0)
+            raise
+        conn.client = client
+        conn.failures = 0
+        conn.next_attempt = 0.0
+
+    async def _disconnect(self, conn):
+        client, conn.client = conn.client, None
+        if client is not None:
+            try:
+                await client.close()
+            except Exception as e:
+                logger.debug(f"RPC pool: error cerrando la conexion {conn.index}: {e}")
+
+    async def _ensure_connected(self, conn):
+        if conn.connected:
+            return
+        await self._disconnect(conn)
+        if time.monotonic() < conn.next_attempt:
+            raise RpcUnavailableError("weather_loader no disponible (reintento de conexion en backoff)")
+        await self._connect(conn)
+
+    async def call(self, method, **kwargs):
+        if self._idle is None:
+            raise RpcUnavailableError("RPC pool no inicializado")
+        # El trace id del request viaja como argumento: weather_loader lo usa en sus logs
+        trace_id = current_trace_id()
+        if trace_id is not None:
+            kwargs["trace_id"] = trace_id
+        # La espera por una conexión libre sale del mismo presupuesto que la llamada: si weather_loader
+        # está trabado y todas están ocupadas, el request falla por timeout y el breaker lo cuenta
+        deadline = time.monotonic() + self.call_timeout
+        try:
+            with stage("rpc_wait", method):
+                conn = await asyncio.wait_for(self._idle.get(), self.call_timeout)
+        except asyncio.TimeoutError:
+            raise asyncio.TimeoutError(f"RPC pool: sin conexiones libres luego de {self.call_timeout}s") from None
+        try:
+            await self._ensure_connected(conn)
+            with stage("rpc_call", method):
+                response = await conn.client.call(method, kwargs, timeout=max(0, deadline - time.monotonic()))
+            return response.result
+        except BaseException:
+            # Ante cualquier error se descarta la conexion, la proxima llamada reconecta
+            await self._disconnect(conn)
+            raise
+        finally:
+            self._idle.put_nowait(conn)
+
+    # ---------------------------------------------------
+    # HEALTH CHECK Y RECONEXION EN BACKGROUND
+    # ---------------------------------------------------
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(self.health_interval)
+            await self._check_idle()
+
+    async def _check_idle(self):
+        # Solo se revisan las conexiones libres, las ocupadas se validan con su propio uso
+        for _ in range(self._idle.qsize()):
+            conn = self._idle.get_nowait()
+            try:
+                await self._check(conn)
+            finally:
+                self._idle.put_nowait(conn)
+
+    async def _check(self, conn):
+        try:
+            if conn.connected:
+                await asyncio.wait_for(conn.client.ping(), self.call_timeout)
+            elif time.monotonic() >= conn.next_attempt:
+                await self._disconnect(conn)
+                await self._connect(conn)
+                logger.info(f"RPC pool: conexion {conn.index} restablecida")
+        except Exception as e:
+            logger.warning(f"RPC pool: health check fallido en conexion {conn.index}: {e}")
+            await self._disconnect(conn)
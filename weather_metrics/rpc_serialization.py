@@ -0,0 +1,18 @@
+import msgpack
+from fastapi_websocket_rpc.simplewebsocket import JsonSerializingWebSocket
+
+
+# ---------------------------------------------------
+# CODIFICACIÓN DE LOS MENSAJES RPC
+# ---------------------------------------------------
+class MsgpackSerializingWebSocket(JsonSerializingWebSocket):
+    """
+    Mensajes RPC en frames binarios msgpack en lugar de texto JSON: más chicos y más rápidos
+    de codificar. Ambos extremos tienen que usar la misma codificación (ruta /ws/msgpack).
+    """
+
+    def _serialize(self, msg):
+        return msgpack.packb(msg.model_dump(mode="json"))
+
+    def _deserialize(self, buffer):
+        return msgpack.unpackb(buffer)
@@ -0,0 +1,105 @@
+import os
+import sqlite3
+import threading
+from config import CONFIG
+
+
+# ---------------------------------------------------
+# ESTADO COMPARTIDO ENTRE WORKERS (SQLite LOCAL)
+# ---------------------------------------------------
+BREAKER_FIELDS = ("state", "counter", "success_counter", "opened_at")
+
+
+class SharedStateUnavailable(Exception):
+    """
+    El SQLite no respondió dentro de `timeout` (lock de escritura de otro worker) o falló:
+    quien llama sigue con su estado local.
+    """
+
+
+class SharedState:
+    """
+    Archivo SQLite (modo WAL) compartido por los workers de weather_metrics en la misma máquina:
+    entradas del cache y estado de los circuit breakers. Cada proceso abre su propia conexión
+    la primera vez que la usa. La espera por el lock de otro worker es de a lo sumo `timeout`
+    segundos; el cache llama desde un thread (asyncio.to_thread) y el breaker, que es sincrónico,
+    desde el event loop, así que un lock tomado no frena al resto de los requests más que eso.
+    """
+
+    def __init__(self, path, timeout=0.05):
+        self.path = path
+        self.timeout = timeout
+        self._conn = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        if self._conn is None or self._pid != os.getpid():
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "namespace TEXT, key TEXT, value BLOB, stored_at REAL, PRIMARY KEY (namespace, key))"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS breaker ("
+                "name TEXT PRIMARY KEY, state TEXT, counter INTEGER, success_counter INTEGER, opened_at REAL)"
+            )
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            try:
+                return self._connection().execute(sql, params)
+            except sqlite3.Error as e:
+                raise SharedStateUnavailable(str(e)) from e
+
+    # -------------------- cache --------------------
+    def cache_get(self, namespace, key):
+        return self._execute(
+            "SELECT value, stored_at FROM cache WHERE namespace = ? AND key = ?", (namespace, key)
+        ).fetchone()
+
+    def cache_set(self, namespace, key, value, stored_at, max_size):
+        """
+        Guarda la entrada y desaloja las más viejas del namespace por encima de `max_size`.
+        Devuelve la cantidad de entradas desalojadas.
+        """
+        self._execute("INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)", (namespace, key, value, stored_at))
+        return self._execute(
+            "DELETE FROM cache WHERE namespace = ? AND key NOT IN "
+            "(SELECT key FROM cache WHERE namespace = ? ORDER BY stored_at DESC LIMIT ?)",
+            (namespace, namespace, max_size)
+        ).rowcount
+
+    def cache_delete(self, namespace, key=None):
+        if key is None:
+            self._execute("DELETE FROM cache WHERE namespace = ?", (namespace,))
+        else:
+            self._execute("DELETE FROM cache WHERE namespace = ? AND key = ?", (namespace, key))
+
+    # -------------------- circuit breakers --------------------
+    def breaker_init(self, name, state):
+        self._execute("INSERT OR IGNORE INTO breaker VALUES (?, ?, 0, 0, NULL)", (name, state))
+
+    def breaker_get(self, name, field):
+        assert field in BREAKER_FIELDS
+        row = self._execute(f"SELECT {field} FROM breaker WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def breaker_set(self, name, field, value):
+        assert field in BREAKER_FIELDS
+        self._execute(f"UPDATE breaker SET {field} = ? WHERE name = ?", (value, name))
+
+    def breaker_increment(self, name, field):
+        assert field in ("counter", "success_counter")
+        self._execute(f"UPDATE breaker SET {field} = {field} + 1 WHERE name = ?", (name,))
+
+
+# Instancia del proceso: None con un solo worker (cache y breakers en memoria del proceso)
+shared_store = SharedState(
+    os.path.join(CONFIG["shared_state_dir"], "shared_state.sqlite"), timeout=CONFIG["shared_state_timeout"]
+) if CONFIG["shared_state"] else None
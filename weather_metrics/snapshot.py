@@ -0,0 +1,124 @@
+import asyncio
+import logging
+import random
+import time
+from fastapi_websocket_rpc import RpcMethodsBase, WebSocketRpcClient
+from fastapi_websocket_rpc.simplewebsocket import JsonSerializingWebSocket
+from prometheus_client import Counter, Gauge
+from tracing import stage
+
+
+logger = logging.getLogger("snapshot")
+
+SNAPSHOT_SUBSCRIBED = Gauge('weather_snapshot_subscribed', 'Suscripción a snapshots de weather_loader activa (1) o caída (0)', multiprocess_mode='livemin')
+SNAPSHOT_RECEIVED = Counter('weather_snapshot_received', 'Snapshots recibidos por push desde weather_loader')
+
+
+# ---------------------------------------------------
+# SNAPSHOT EN MEMORIA
+# ---------------------------------------------------
+class SnapshotStore:
+    """
+    Último snapshot (current + promedios) por ciudad publicado por weather_loader.
+    Solo se usa mientras la suscripción está activa y el snapshot no supera `max_age` segundos.
+    """
+
+    def __init__(self, max_age):
+        self.max_age = max_age
+        self.live = False
+        self._snapshots = {}  # city -> (snapshot, received_at)
+
+    def update(self, snapshots):
+        now = time.monotonic()
+        for city, snapshot in snapshots.items():
+            self._snapshots[city] = (snapshot, now)
+
+    def get(self, city):
+        entry = self._snapshots.get(city)
+        if not self.live or entry is None:
+            return None
+        if time.monotonic() - entry[1] > self.max_age:
+            return None
+        return entry[0]
+
+
+class SnapshotMethods(RpcMethodsBase):
+    def __init__(self, store):
+        super().__init__()
+        self.store = store
+
+    async def publishSnapshots(self, snapshots: dict) -> bool:
+        SNAPSHOT_RECEIVED.inc()
+        self.store.update(snapshots)
+        return True
+
+
+# ---------------------------------------------------
+# SUSCRIPCIÓN PERSISTENTE A weather_loader
+# ---------------------------------------------------
+class SnapshotSubscriber:
+    """
+    Mantiene una conexión WebSocket RPC dedicada suscripta a los snapshots del loader.
+    Si la conexión se cae el store deja de estar `live` (los endpoints vuelven a consultar por RPC)
+    y se reintenta con backoff exponencial.
+    """
+
+    def __init__(self, store, call_timeout=10, backoff_base=0.5, backoff_max=30, serializing_socket_cls=JsonSerializingWebSocket):
+        self.store = store
+        self.call_timeout = call_timeout
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.serializing_socket_cls = serializing_socket_cls
+        self.uri = None
+        self._task = None
+
+    async def start(self, uri):
+        self.uri = uri
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self._set_live(False)
+
+    def _set_live(self, live):
+        self.store.live = live
+        SNAPSHOT_SUBSCRIBED.set(1 if live else 0)
+
+    async def _run(self):
+        failures = 0
+        while True:
+            disconnected = asyncio.Event()
+
+            async def on_disconnect(channel):
+                disconnected.set()
+
+            client = WebSocketRpcClient(
+                self.uri,
+                SnapshotMethods(self.store),
+                retry_config=False,
+                default_response_timeout=self.call_timeout,
+                serializing_socket_cls=self.serializing_socket_cls,
+                on_disconnect=[on_disconnect]
+            )
+            try:
+                with stage("rpc_connect", "subscribe"):
+                    await asyncio.wait_for(client.__aenter__(), self.call_timeout)
+                try:
+                    response = await client.other.subscribe()
+                    self.store.update(response.result)
+                    self._set_live(True)
+                    failures = 0
+                    logger.info("Suscripción a snapshots de weather_loader activa")
+                    await disconnected.wait()
+                finally:
+                    self._set_live(False)
+                    await client.close()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Suscripción a snapshots caída: {e}")
+            failures += 1
+            delay = min(self.backoff_max, self.backoff_base * (2 ** failures))
+            await asyncio.sleep(delay * random.uniform(0.5, 1.0))
@@ -0,0 +1,43 @@
+import math
+import re
+
+
+STATS_FIELDS = ("temperature", "humidity", "pressure")
+BUCKET_UNITS = {"m": ("minute", 60), "h": ("hour", 3600), "d": ("day", 24 * 3600)}
+BUCKET_PATTERN = re.compile(r"^(\d+)([mhd])$")
+
+
+# ---------------------------------------------------
+# PARÁMETROS DE /weather/stats
+# ---------------------------------------------------
+def parse_bucket(bucket):
+    """
+    "15m", "1h", "1d" -> (unidad, cantidad de unidades, segundos del bucket).
+    """
+    match = BUCKET_PATTERN.match(bucket.strip())
+    if not match or int(match.group(1)) < 1:
+        raise ValueError(f"Bucket inválido: {bucket} (ej: 15m, 1h, 1d)")
+    unit, seconds = BUCKET_UNITS[match.group(2)]
+    bin_size = int(match.group(1))
+    return unit, bin_size, bin_size * seconds
+
+
+def parse_fields(fields):
+    parsed = tuple(sorted({field.strip() for field in fields.split(",") if field.strip()}))
+    invalid = [field for field in parsed if field not in STATS_FIELDS]
+    if not parsed or invalid:
+        raise ValueError(f"Campos inválidos: {fields} (disponibles: {', '.join(STATS_FIELDS)})")
+    return parsed
+
+
+def normalize_window(start, end, bucket_seconds):
+    """
+    Alinea la ventana a los bordes de bucket para que consultas sobre el mismo rango
+    (ej: paneles de Grafana con un "now" levemente distinto) compartan la entrada de cache.
+    Los bordes son múltiplos de `bucket_seconds` desde el epoch, igual que los buckets de
+    weather_loader (repository._bucket_start).
+    """
+    return (
+        math.floor(start / bucket_seconds) * bucket_seconds,
+        math.ceil(end / bucket_seconds) * bucket_seconds
+    )